@@ -7,7 +7,7 @@ import {
 } from '@jupytergis/schema';
 import { useEffect, useState } from 'react';
 
-import { loadFile } from '@/src/tools';
+import { loadFile, loadGeoJSONBlob } from '@/src/tools';
 
 interface IUseGetPropertiesProps {
   layerId?: string;
@@ -32,7 +32,9 @@ async function getGeoJsonProperties({
   const result: Record<string, Set<any>> = {};
 
   const data = await (async () => {
-    if (source.parameters.path) {
+    if (sourceType === 'GeoJSONSource' && source.parameters.blob) {
+      return await loadGeoJSONBlob(source.parameters.blob, model);
+    } else if (source.parameters.path) {
       return await loadFile({
         filepath: source.parameters.path,
         type: sourceType,
@@ -11,15 +11,19 @@ import {
 } from '@jupytergis/schema';
 import { JupyterFrontEnd } from '@jupyterlab/application';
 import { Notification, showErrorMessage } from '@jupyterlab/apputils';
+import { PathExt, URLExt } from '@jupyterlab/coreutils';
 import { UUID } from '@lumino/coreutils';
 
 import { ProcessingFormDialog } from './ProcessingFormDialog';
 import { processingFormToParam } from './processingFormToParam';
 import {
+  IServerProcessingSource,
+  IServerProcessingStep,
   isServerProcessingEnabled,
-  runServerProcessing,
-  runServerProcessingUrl,
-  runServerProcessingUrlWithCutline,
+  runServerProcessingBinary,
+  runServerProcessingJob,
+  runServerProcessingPipeline,
+  runServerProcessingUpload,
 } from './serverProcessing';
 import { getGdal } from '../../gdal';
 import { getGeoJSONDataFromLayerSource } from '../../tools';
@@ -138,8 +142,14 @@ export async function processLayer(
     return;
   }
 
-  const geojsonString = await getLayerGeoJSON(selected, sources, model);
-  if (!geojsonString) {
+  // The server reads local files itself, so they are not serialized.
+  const serverSource = isServerProcessingEnabled()
+    ? getServerSourceReference(selected, sources, model)
+    : null;
+  const geojsonString = serverSource
+    ? null
+    : await getLayerGeoJSON(selected, sources, model);
+  if (!serverSource && !geojsonString) {
     return;
   }
 
@@ -196,24 +206,28 @@ export async function processLayer(
 
   // GDAL pre-processing
 
-  const fileBlob = new Blob([geojsonString], {
-    type: 'application/geo+json',
-  });
-  const geoFile = new File([fileBlob], 'data.geojson', {
-    type: 'application/geo+json',
-  });
+  // The server exposes referenced vector data as `data`.
+  let layerName = 'data';
+  if (geojsonString) {
+    const fileBlob = new Blob([geojsonString], {
+      type: 'application/geo+json',
+    });
+    const geoFile = new File([fileBlob], 'data.geojson', {
+      type: 'application/geo+json',
+    });
 
-  const Gdal = await getGdal();
-  const result = await Gdal.open(geoFile);
-  const dataset = result.datasets[0] as any;
-  const layerName = dataset.info.layers[0].name;
+    const Gdal = await getGdal();
+    const result = await Gdal.open(geoFile);
+    const dataset = result.datasets[0] as any;
+    layerName = dataset.info.layers[0].name;
+  }
 
   const sqlQuery = processingOptions.sqlQueryFn(layerName, processParam);
   const fullOptions = processingOptions.options(sqlQuery);
 
   await executeSQLProcessing(
     model,
-    geojsonString,
+    serverSource ?? (geojsonString as string),
     processingOptions.gdalFunction,
     fullOptions,
     outputLayerName,
@@ -361,20 +375,12 @@ export async function rasterizeLayer(
         `[JupyterGIS] Processing "${processingType}" via SERVER GDAL (${gdalFunction})`,
       );
       const t0 = performance.now();
-      const response = await runServerProcessing({
+      const bytes = await runServerProcessingBinary({
         operation: gdalFunction,
         options,
         geojson: geojsonString,
         outputName,
       });
-      if (response.format !== 'base64') {
-        throw new Error('Expected base64 response for raster output');
-      }
-      const binary = atob(response.result);
-      const bytes = new Uint8Array(binary.length);
-      for (let i = 0; i < binary.length; i++) {
-        bytes[i] = binary.charCodeAt(i);
-      }
       console.debug(
         `[JupyterGIS] SERVER GDAL "${processingType}" finished in ${(performance.now() - t0).toFixed(0)}ms`,
       );
@@ -731,20 +737,12 @@ export async function clipRasterByExtent(
         '[JupyterGIS] Clipping raster by extent via SERVER GDAL (vsicurl)',
       );
       const t0 = performance.now();
-      const response = await runServerProcessingUrl({
+      const bytes = await runServerProcessingBinary({
         operation: 'gdal_translate',
         options,
         url: rasterUrl,
         outputName,
       });
-      if (response.format !== 'base64') {
-        throw new Error('Expected base64 response for raster output');
-      }
-      const binary = atob(response.result);
-      const bytes = new Uint8Array(binary.length);
-      for (let i = 0; i < binary.length; i++) {
-        bytes[i] = binary.charCodeAt(i);
-      }
       console.debug(
         `[JupyterGIS] SERVER GDAL raster clip finished in ${(performance.now() - t0).toFixed(0)}ms`,
       );
@@ -1105,22 +1103,15 @@ export async function clipRasterByVector(
     if (isRemoteUrl && isServerProcessingEnabled()) {
       // {cutlinePath} is substituted by the server with the temp path of the
       // cutline file it writes from `cutlineGeojson`.
-      const response = await runServerProcessingUrlWithCutline({
+      // Warping a large remote raster can take minutes, so run it as a job
+      // rather than holding a request open.
+      return await runServerProcessingJob({
         operation: 'gdalwarp',
         options: buildOptions('{cutlinePath}'),
         url: rasterUrl,
         cutlineGeojson: clipGeoJSON,
         outputName,
       });
-      if (response.format !== 'base64') {
-        throw new Error('Expected base64 response for raster output');
-      }
-      const binary = atob(response.result);
-      const bytes = new Uint8Array(binary.length);
-      for (let i = 0; i < binary.length; i++) {
-        bytes[i] = binary.charCodeAt(i);
-      }
-      return bytes;
     } else {
       const tiffBytes = await getRasterBytes(source, model, app);
       if (!tiffBytes) {
@@ -1474,17 +1465,128 @@ export async function clipVectorByMaskLayer(
   );
 }
 
+/**
+ * Chain vector processing operations (e.g. buffer, then dissolve) on a layer
+ * on the server, adding only the final result to the document.
+ */
+export async function processLayerPipeline(
+  tracker: JupyterGISTracker,
+  app: JupyterFrontEnd,
+  steps: IServerProcessingStep[],
+  filePath?: string,
+  processingInputs?: Record<string, any>,
+) {
+  const widget = filePath
+    ? tracker.find(w => w.model.filePath === filePath)
+    : tracker.currentWidget;
+
+  if (!widget) {
+    return;
+  }
+
+  if (!isServerProcessingEnabled()) {
+    showErrorMessage(
+      'Processing chain',
+      'Processing chains require server-side processing.',
+    );
+    return;
+  }
+
+  const model = widget.model;
+  const sources = model.sharedModel.sources ?? {};
+  const layers = model.sharedModel.layers ?? {};
+  const selected = processingInputs?.inputLayer
+    ? layers[processingInputs.inputLayer]
+    : getSingleSelectedLayer(tracker);
+
+  if (!selected) {
+    return;
+  }
+
+  const serverSource = getServerSourceReference(selected, sources, model);
+  const geojsonString = serverSource
+    ? null
+    : await getLayerGeoJSON(selected, sources, model);
+  if (!serverSource && !geojsonString) {
+    return;
+  }
+
+  // GDAL names inline GeoJSON after its "name" member, as in `processLayer`.
+  const layerName = geojsonString
+    ? (JSON.parse(geojsonString).name ?? 'data')
+    : 'data';
+
+  await executeSQLProcessing(
+    model,
+    serverSource ?? (geojsonString as string),
+    'ogr2ogr',
+    ['-f', 'GeoJSON', '{outputName}'],
+    selected.name,
+    'pipeline',
+    processingInputs?.embedOutputLayer ?? true,
+    tracker,
+    app,
+    processingInputs?.outputLayerName,
+    { steps, layerName },
+  );
+}
+
+/**
+ * Source types whose data is a file the server can read with GDAL.
+ */
+const SERVER_SOURCE_TYPES = [
+  'GeoJSONSource',
+  'ShapefileSource',
+  'GeoPackageVectorSource',
+  'GeoParquetSource',
+];
+
+/**
+ * Reference the data of a layer for server-side processing, or return null
+ * if the server cannot read it directly (inline or remote data).
+ */
+export function getServerSourceReference(
+  layer: IJGISLayer,
+  sources: IDict,
+  model: IJupyterGISModel,
+): IServerProcessingSource | null {
+  const source = sources[layer.parameters?.source];
+  const path: string | undefined = source?.parameters?.path;
+  if (
+    !path ||
+    !model.filePath ||
+    !SERVER_SOURCE_TYPES.includes(source.type) ||
+    !URLExt.isLocal(path)
+  ) {
+    return null;
+  }
+
+  // Source paths are relative to the document, as in `loadFile`.
+  const reference: IServerProcessingSource = {
+    path: PathExt.join(PathExt.dirname(model.filePath), path),
+  };
+  const table = (source.parameters.tables ?? '')
+    .split(',')
+    .map((name: string) => name.trim())
+    .find((name: string) => name);
+  if (table) {
+    reference.layer = table;
+  }
+  return reference;
+}
+
 export async function executeSQLProcessing(
   model: IJupyterGISModel,
-  geojsonString: string,
+  input: string | IServerProcessingSource,
   gdalFunction: GdalFunctions,
   options: string[],
   layerNamePrefix: string,
-  processingType: ProcessingType,
+  processingType: ProcessingType | 'pipeline',
   embedOutputLayer: boolean,
   tracker: JupyterGISTracker,
   app: JupyterFrontEnd,
   exactLayerName?: string,
+  steps?: { steps: IServerProcessingStep[]; layerName: string },
 ) {
   const doProcessing = async (): Promise<string> => {
     if (isServerProcessingEnabled()) {
@@ -1493,23 +1595,42 @@ export async function executeSQLProcessing(
       );
       const t0 = performance.now();
       const outputName = 'output.geojson';
-      const response = await runServerProcessing({
-        operation: gdalFunction,
-        options,
-        geojson: geojsonString,
-        outputName,
-      });
+      const output = steps
+        ? await runServerProcessingPipeline({
+            operation: gdalFunction,
+            options,
+            ...steps,
+            ...(typeof input === 'string'
+              ? { geojson: input }
+              : { source: input }),
+            outputName,
+          })
+        : typeof input === 'string'
+          ? // Sent as the raw body so that the server can spool it to disk.
+            await runServerProcessingUpload(
+              { operation: gdalFunction, options, outputName },
+              new Blob([input], { type: 'application/geo+json' }),
+            )
+          : await runServerProcessingBinary({
+              operation: gdalFunction,
+              options,
+              source: input,
+              outputName,
+            });
       console.debug(
         `[JupyterGIS] SERVER GDAL "${processingType}" finished in ${(performance.now() - t0).toFixed(0)}ms`,
       );
-      return response.result;
+      return new TextDecoder().decode(output);
     } else {
       console.debug(
         `[JupyterGIS] Processing "${processingType}" via BROWSER WASM GDAL (${gdalFunction})`,
       );
+      if (typeof input !== 'string' || steps) {
+        throw new Error('Layer data can only be processed on the server.');
+      }
       const t0 = performance.now();
       const geoFile = new File(
-        [new Blob([geojsonString], { type: 'application/geo+json' })],
+        [new Blob([input], { type: 'application/geo+json' })],
         'data.geojson',
         { type: 'application/geo+json' },
       );
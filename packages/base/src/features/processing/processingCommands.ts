@@ -15,7 +15,9 @@ import {
   clipRasterByExtent,
   clipRasterByVector,
   clipVectorByMaskLayer,
+  processLayerPipeline,
 } from './index';
+import { IServerProcessingStep } from './serverProcessing';
 import { JupyterGISTracker } from '../../types';
 
 export function replaceInSql(
@@ -55,6 +57,64 @@ export function addProcessingCommands(
   formSchemaRegistry: IJGISFormSchemaRegistry,
   processingSchemas: Record<string, any>,
 ) {
+  commands.addCommand('jupytergis:processingPipeline', {
+    label: trans.__('Processing Chain'),
+    describedBy: {
+      args: {
+        type: 'object',
+        properties: {
+          filePath: {
+            type: 'string',
+            description: 'Path to the .jGIS file',
+          },
+          steps: {
+            type: 'array',
+            description:
+              'Vector operations to apply in order, e.g. {"name": "buffer", "params": {"bufferDistance": 10}}',
+            items: {
+              type: 'object',
+              properties: {
+                name: {
+                  type: 'string',
+                  enum: ProcessingMerge.filter(
+                    element => element.type === ProcessingLogicType.vector,
+                  ).map(element => element.name),
+                },
+                params: { type: 'object' },
+              },
+              required: ['name'],
+            },
+          },
+          processingInputs: {
+            type: 'object',
+            properties: {
+              inputLayer: { type: 'string' },
+              outputLayerName: { type: 'string' },
+              embedOutputLayer: { type: 'boolean' },
+            },
+          },
+        },
+        required: ['steps'],
+      },
+    },
+
+    isEnabled: () => selectedLayerIsOfType(['VectorLayer'], tracker),
+
+    execute: async (args?: {
+      filePath?: string;
+      steps?: IServerProcessingStep[];
+      processingInputs?: Record<string, any>;
+    }) => {
+      await processLayerPipeline(
+        tracker,
+        app,
+        args?.steps ?? [],
+        args?.filePath,
+        args?.processingInputs,
+      );
+    },
+  });
+
   for (const processingElement of ProcessingMerge) {
     const schemaKey = Object.keys(processingSchemas).find(
       k =>
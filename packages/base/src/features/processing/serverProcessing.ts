@@ -54,11 +54,22 @@ export function resetServerAvailabilityCache(): void {
   _serverAvailable = null;
 }
 
+/**
+ * Output format the server switches the driver to, giving the output the
+ * matching extension. FlatGeobuf outputs carry a spatial index.
+ */
+export type IServerProcessingOutputFormat =
+  | 'GeoJSON'
+  | 'FlatGeobuf'
+  | 'GeoParquet'
+  | 'COG';
+
 export interface IServerProcessingRequest {
   operation: string;
   options: string[];
   geojson: string;
   outputName: string;
+  outputFormat?: IServerProcessingOutputFormat;
 }
 
 export interface IServerProcessingUrlRequest {
@@ -66,6 +77,7 @@ export interface IServerProcessingUrlRequest {
   options: string[];
   url: string;
   outputName: string;
+  outputFormat?: IServerProcessingOutputFormat;
 }
 
 export interface IServerProcessingUrlWithCutlineRequest {
@@ -74,27 +86,48 @@ export interface IServerProcessingUrlWithCutlineRequest {
   url: string;
   cutlineGeojson: string;
   outputName: string;
+  outputFormat?: IServerProcessingOutputFormat;
 }
 
-export interface IServerProcessingResponse {
-  result: string;
-  format: 'text' | 'base64';
+/**
+ * Data the server reads directly instead of receiving it: a file below the
+ * server root, or a source of a saved `.jGIS` document. Vector data is
+ * exposed to GDAL as the layer `data`.
+ */
+export type IServerProcessingSource =
+  | { path: string; layer?: string }
+  | { document: string; sourceId: string; layer?: string };
+
+export interface IServerProcessingSourceRequest {
+  operation: string;
+  options: string[];
+  source: IServerProcessingSource;
+  outputName: string;
+  outputFormat?: IServerProcessingOutputFormat;
 }
 
 /**
- * Send a processing request to the server-side GDAL handler.
+ * Run a processing request and receive the output file as raw bytes.
+ *
+ * The server streams the file instead of embedding it base64-encoded in a
+ * JSON response, which keeps memory flat on both ends for large rasters.
  */
-export async function runServerProcessing(
-  request: IServerProcessingRequest,
-): Promise<IServerProcessingResponse> {
+export async function runServerProcessingBinary(
+  request:
+    | IServerProcessingRequest
+    | IServerProcessingUrlRequest
+    | IServerProcessingUrlWithCutlineRequest
+    | IServerProcessingSourceRequest,
+): Promise<Uint8Array<ArrayBuffer>> {
   const settings = ServerConnection.makeSettings();
-  const url = `${settings.baseUrl}${PROCESSING_ENDPOINT.slice(1)}`;
+  const endpoint = `${settings.baseUrl}${PROCESSING_ENDPOINT.slice(1)}`;
 
   const response = await ServerConnection.makeRequest(
-    url,
+    endpoint,
     {
       method: 'POST',
       body: JSON.stringify(request),
+      headers: { Accept: 'application/octet-stream' },
     },
     settings,
   );
@@ -106,25 +139,51 @@ export async function runServerProcessing(
     );
   }
 
-  return await response.json();
+  return new Uint8Array(await response.arrayBuffer());
 }
 
 /**
- * Send a URL-based processing request — the server uses /vsicurl/ so GDAL
- * issues HTTP range requests instead of downloading the full file.
- * Ideal for Cloud-Optimized GeoTIFFs (COGs).
+ * A pipeline step: an SQL statement, or a vector processing operation (e.g.
+ * `buffer`, `dissolve`) and its parameters, as in its processing form.
  */
-export async function runServerProcessingUrl(
-  request: IServerProcessingUrlRequest,
-): Promise<IServerProcessingResponse> {
+export type IServerProcessingStep =
+  | string
+  | { name: string; params?: Record<string, unknown> };
+
+export type IServerProcessingPipelineRequest = (
+  | { geojson: string }
+  | { url: string }
+  | { source: IServerProcessingSource }
+) & {
+  operation: string;
+  options: string[];
+  steps: IServerProcessingStep[];
+  layerName?: string;
+  outputName: string;
+  outputFormat?: IServerProcessingOutputFormat;
+};
+
+/**
+ * Apply a chain of steps (e.g. buffer, then dissolve) on the server and
+ * receive only the final output, as raw bytes.
+ *
+ * `{layerName}` in an SQL step stands for the layer it reads: `layerName`
+ * (by default `data`) for the first step, the previous result afterwards.
+ * The steps run in a single GDAL invocation, so intermediate results never
+ * travel back to the browser.
+ */
+export async function runServerProcessingPipeline(
+  request: IServerProcessingPipelineRequest,
+): Promise<Uint8Array<ArrayBuffer>> {
   const settings = ServerConnection.makeSettings();
-  const endpoint = `${settings.baseUrl}${PROCESSING_ENDPOINT.slice(1)}`;
+  const endpoint = `${settings.baseUrl}${PROCESSING_ENDPOINT.slice(1)}/pipeline`;
 
   const response = await ServerConnection.makeRequest(
     endpoint,
     {
       method: 'POST',
       body: JSON.stringify(request),
+      headers: { Accept: 'application/octet-stream' },
     },
     settings,
   );
@@ -136,25 +195,43 @@ export async function runServerProcessingUrl(
     );
   }
 
-  return await response.json();
+  return new Uint8Array(await response.arrayBuffer());
+}
+
+export interface IServerProcessingUploadRequest {
+  operation: string;
+  options: string[];
+  outputName: string;
+  outputFormat?: IServerProcessingOutputFormat;
 }
 
 /**
- * Run a GDAL operation that needs both a remote raster URL and a vector
- * cutline (e.g. `gdalwarp -cutline`). The server writes the cutline GeoJSON
- * to a temp file and substitutes `{cutlinePath}` in the options list.
+ * Run a processing request on a dataset sent as the raw request body and
+ * receive the output file as raw bytes.
+ *
+ * The server writes the body to disk as it arrives instead of decoding it
+ * from a JSON document, so large layers are processed with bounded memory.
+ * `data.type` must be a media type the server accepts (GeoJSON, GeoJSON
+ * text sequences, FlatGeobuf, GeoPackage, Parquet or GeoTIFF); GDAL sees
+ * the dataset as `data`.
  */
-export async function runServerProcessingUrlWithCutline(
-  request: IServerProcessingUrlWithCutlineRequest,
-): Promise<IServerProcessingResponse> {
+export async function runServerProcessingUpload(
+  request: IServerProcessingUploadRequest,
+  data: Blob,
+): Promise<Uint8Array<ArrayBuffer>> {
   const settings = ServerConnection.makeSettings();
-  const endpoint = `${settings.baseUrl}${PROCESSING_ENDPOINT.slice(1)}`;
+  const endpoint = `${settings.baseUrl}${PROCESSING_ENDPOINT.slice(1)}/upload`;
+  const params = new URLSearchParams({ request: JSON.stringify(request) });
 
   const response = await ServerConnection.makeRequest(
-    endpoint,
+    `${endpoint}?${params}`,
     {
       method: 'POST',
-      body: JSON.stringify(request),
+      body: data,
+      headers: {
+        'Content-Type': data.type,
+        Accept: 'application/octet-stream',
+      },
     },
     settings,
   );
@@ -166,5 +243,83 @@ export async function runServerProcessingUrlWithCutline(
     );
   }
 
-  return await response.json();
+  return new Uint8Array(await response.arrayBuffer());
+}
+
+export interface IServerProcessingJob {
+  id: string;
+  operation: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+  progress: number;
+  error: string | null;
+  created: number;
+  started: number | null;
+  finished: number | null;
+}
+
+/**
+ * Run a long processing request as a server-side job and receive its
+ * output as raw bytes.
+ *
+ * Unlike a synchronous request, no HTTP request stays open while GDAL runs,
+ * so browser and proxy timeouts do not apply. The job is cancelled when
+ * `signal` aborts, and discarded on the server once its output is fetched.
+ */
+export async function runServerProcessingJob(
+  request:
+    | IServerProcessingRequest
+    | IServerProcessingUrlRequest
+    | IServerProcessingUrlWithCutlineRequest
+    | IServerProcessingSourceRequest,
+  options: {
+    onProgress?: (fraction: number) => void;
+    signal?: AbortSignal;
+    pollInterval?: number;
+  } = {},
+): Promise<Uint8Array<ArrayBuffer>> {
+  const settings = ServerConnection.makeSettings();
+  const jobsUrl = `${settings.baseUrl}${PROCESSING_ENDPOINT.slice(1)}/jobs`;
+
+  const call = async (url: string, init: RequestInit = {}) => {
+    const response = await ServerConnection.makeRequest(url, init, settings);
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(
+        error.error || `Server processing failed: ${response.status}`,
+      );
+    }
+    return response;
+  };
+
+  let job: IServerProcessingJob = await (
+    await call(jobsUrl, { method: 'POST', body: JSON.stringify(request) })
+  ).json();
+  const jobUrl = `${jobsUrl}/${job.id}`;
+
+  try {
+    while (job.status === 'queued' || job.status === 'running') {
+      if (options.signal?.aborted) {
+        await call(jobUrl, { method: 'DELETE' });
+        throw new Error('Server processing cancelled');
+      }
+      await new Promise(resolve =>
+        setTimeout(resolve, options.pollInterval ?? 1000),
+      );
+      job = await (await call(jobUrl)).json();
+      options.onProgress?.(job.progress);
+    }
+
+    if (job.status !== 'succeeded') {
+      throw new Error(job.error || `Server processing ${job.status}`);
+    }
+    const response = await call(`${jobUrl}/result`, {
+      headers: { Accept: 'application/octet-stream' },
+    });
+    return new Uint8Array(await response.arrayBuffer());
+  } finally {
+    // Free the job's output on the server; it may already have expired.
+    ServerConnection.makeRequest(jobUrl, { method: 'DELETE' }, settings).catch(
+      () => undefined,
+    );
+  }
 }
@@ -4,6 +4,7 @@ import {
   IAnnotation,
   IAnnotationModel,
   IDict,
+  IGeoJSONSource,
   IGeoTiffSource,
   IGeoZarrSource,
   IHillshadeLayer,
@@ -150,6 +151,7 @@ import {
   isJupyterLite,
   isLightTheme,
   loadFile,
+  loadGeoJSONBlob,
   throttle,
 } from '@/src/tools';
 import StatusBar from '@/src/workspace/statusbar/StatusBar';
@@ -1167,13 +1169,16 @@ export class MainView extends React.Component<IMainViewProps, IStates> {
         }
 
         case 'GeoJSONSource': {
+          const blob = (source.parameters as IGeoJSONSource).blob;
           const data =
             source.parameters?.data ||
-            (await loadFile({
-              filepath: source.parameters?.path,
-              type: 'GeoJSONSource',
-              model: this._model,
-            }));
+            (blob
+              ? await loadGeoJSONBlob(blob, this._model)
+              : await loadFile({
+                  filepath: source.parameters?.path,
+                  type: 'GeoJSONSource',
+                  model: this._model,
+                }));
 
           const format = new GeoJSON({
             featureProjection: this._Map.getView().getProjection(),
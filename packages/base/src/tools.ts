@@ -1,5 +1,6 @@
 import {
   IDict,
+  IGeoJSONSource,
   IJGISLayerBrowserRegistry,
   IJGISOptions,
   IJGISSource,
@@ -943,6 +944,59 @@ const validateImage = async (blob: Blob): Promise<void> => {
   });
 };
 
+export const BLOB_BASE = '/jupytergis_core/blobs';
+
+/**
+ * Load the GeoJSON data a source stores in a blob beside its document.
+ *
+ * The server sends the compressed blob as it is, and the browser inflates
+ * it; in JupyterLite the blob is read through the contents manager.
+ *
+ * @param blob The reference held by the source.
+ * @param model The model of the document.
+ * @returns The GeoJSON data.
+ */
+export const loadGeoJSONBlob = async (
+  blob: NonNullable<IGeoJSONSource['blob']>,
+  model: IJupyterGISModel,
+): Promise<any> => {
+  if (!model.filePath) {
+    throw new Error('filePath is not initialized.');
+  }
+  const path = PathExt.resolve(PathExt.dirname(model.filePath), blob.path);
+
+  if (isJupyterLite()) {
+    if (!model.contentsManager) {
+      throw new Error('ContentsManager is not initialized.');
+    }
+    const file = await model.contentsManager.get(path, {
+      content: true,
+      format: 'base64',
+    });
+    const bytes = Uint8Array.from(atob(file.content), c => c.charCodeAt(0));
+    const stream = new Blob([bytes])
+      .stream()
+      .pipeThrough(new DecompressionStream('gzip'));
+    return JSON.parse(await new Response(stream).text());
+  }
+
+  const settings = ServerConnection.makeSettings();
+  const requestUrl = URLExt.join(
+    settings.baseUrl,
+    BLOB_BASE,
+    URLExt.encodeParts(path),
+  );
+  const response = await ServerConnection.makeRequest(
+    requestUrl,
+    { method: 'GET' },
+    settings,
+  );
+  if (!response.ok) {
+    throw new ServerConnection.ResponseError(response);
+  }
+  return response.json();
+};
+
 /**
  * Converts a base64-encoded string to a Blob.
  *
@@ -1228,7 +1282,11 @@ export async function getGeoJSONDataFromLayerSource(
     return null;
   }
 
-  if (source.parameters.path) {
+  if (source.type === 'GeoJSONSource' && source.parameters.blob) {
+    return JSON.stringify(
+      await loadGeoJSONBlob(source.parameters.blob, model),
+    );
+  } else if (source.parameters.path) {
     const fileContent = await loadFile({
       filepath: source.parameters.path,
       type: source.type,
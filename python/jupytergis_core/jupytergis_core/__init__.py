@@ -1,3 +1,5 @@
+import atexit
+
 try:
     from ._version import __version__
 except ImportError:
@@ -33,5 +35,24 @@ def _load_jupyter_server_extension(server_app):
     from .handler import setup_handlers
 
     setup_handlers(server_app.web_app)
+    # jupyter_server only runs the shutdown hooks of extension applications.
+    atexit.register(_unload_jupyter_server_extension, server_app)
     name = "jupytergis_core"
     print(f"Registered {name} server extension")
+
+
+def _unload_jupyter_server_extension(server_app):
+    """Stops the processing workers, closes the proxy connections and writes
+    the document store.
+
+    Parameters
+    ----------
+    server_app: jupyterlab.labapp.LabApp
+        JupyterLab application instance
+
+    """
+    from .handler import teardown_handlers
+    from .ydoc_store import close_store
+
+    teardown_handlers(server_app.web_app)
+    close_store()
@@ -0,0 +1,103 @@
+"""Content-addressed storage for large source data, next to a document.
+
+A ``GeoJSONSource`` normally embeds its data, which then travels with every
+save and sync of the document. Instead, the data can be written once to a
+gzip-compressed blob in the ``.jgis_blobs`` directory beside the document,
+named by the SHA-256 of its content, with the source holding only a
+reference: the blob path relative to the document, the digest and a summary
+(feature count and bounding box) of the data.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any
+
+# Directory of the blobs, beside the document.
+BLOB_DIR = ".jgis_blobs"
+
+_BLOB_NAME = re.compile(r"^[0-9a-f]{64}\.geojson\.gz$")
+
+
+def is_blob_path(path: str) -> bool:
+    """Whether ``path`` names a blob file, whatever directory it is in."""
+    blob = Path(path)
+    return blob.parent.name == BLOB_DIR and _BLOB_NAME.match(blob.name) is not None
+
+
+def _positions(coordinates: Any) -> list[list[float]]:
+    if not isinstance(coordinates, list) or not coordinates:
+        return []
+    if isinstance(coordinates[0], int | float):
+        return [coordinates]
+    return [position for item in coordinates for position in _positions(item)]
+
+
+def _geometries(data: Any) -> list[dict[str, Any]]:
+    if not isinstance(data, dict):
+        return []
+    kind = data.get("type")
+    if kind == "FeatureCollection":
+        return [g for f in data.get("features") or [] for g in _geometries(f)]
+    if kind == "Feature":
+        return _geometries(data.get("geometry"))
+    if kind == "GeometryCollection":
+        return [g for item in data.get("geometries") or [] for g in _geometries(item)]
+    return [data]
+
+
+def summarize(data: Any) -> tuple[int, list[float] | None]:
+    """Return the feature count and the bounding box of GeoJSON data."""
+    if isinstance(data, dict) and data.get("type") == "FeatureCollection":
+        count = len(data.get("features") or [])
+    else:
+        count = 1
+    positions = [
+        position
+        for geometry in _geometries(data)
+        for position in _positions(geometry.get("coordinates"))
+        if len(position) >= 2
+    ]
+    if not positions:
+        return count, None
+    xs = [position[0] for position in positions]
+    ys = [position[1] for position in positions]
+    return count, [min(xs), min(ys), max(xs), max(ys)]
+
+
+def write_blob(directory: str | Path, data: Any) -> dict[str, Any]:
+    """Store GeoJSON data as a blob beside the documents of ``directory``.
+
+    Identical data is stored once. Returns the reference to put in the
+    ``blob`` parameter of the source.
+    """
+    content = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(content).hexdigest()
+    name = f"{digest}.geojson.gz"
+    blob_dir = Path(directory) / BLOB_DIR
+    blob_path = blob_dir / name
+    if not blob_path.exists():
+        blob_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=blob_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                # No timestamp, so that the same data gives the same file.
+                f.write(gzip.compress(content, mtime=0))
+            Path(tmp_path).replace(blob_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+    feature_count, bbox = summarize(data)
+    reference: dict[str, Any] = {
+        "path": f"{BLOB_DIR}/{name}",
+        "sha256": digest,
+        "size": len(content),
+        "featureCount": feature_count,
+    }
+    if bbox is not None:
+        reference["bbox"] = bbox
+    return reference
@@ -0,0 +1,329 @@
+"""In-process GDAL execution through the ``osgeo`` Python bindings.
+
+Launching ``ogr2ogr`` or ``gdalwarp`` for every operation costs a process
+start plus GDAL driver registration, which dominates small operations such
+as centroids or bounding boxes. ``GdalEngine`` runs the same utilities
+through ``gdal.VectorTranslate``, ``gdal.Warp`` and friends in a bounded pool
+of worker processes that stay warm between requests. Workers are separate
+processes so that a GDAL crash cannot take the server down and so that
+long operations can run in parallel without holding the GIL.
+"""
+
+import importlib.util
+import logging
+import multiprocessing
+import os
+import subprocess
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# CLI tool -> name of the equivalent osgeo.gdal utility function.
+_UTILITIES = {
+    "ogr2ogr": "VectorTranslate",
+    "gdalwarp": "Warp",
+    "gdal_translate": "Translate",
+    "gdal_rasterize": "Rasterize",
+}
+
+
+# How often a running operation reports its progress, in seconds.
+PROGRESS_INTERVAL = 0.25
+
+# How long past its timeout an operation may run before its worker is killed,
+# in seconds. Workers only stop by themselves when GDAL reports progress.
+KILL_GRACE = 5.0
+
+
+class OperationCancelledError(Exception):
+    """Raised when a GDAL operation is stopped by its progress callback."""
+
+
+def bindings_available() -> bool:
+    """Whether the GDAL Python bindings are installed.
+
+    Only looks the package up, so the server process never loads GDAL itself.
+    """
+    return importlib.util.find_spec("osgeo") is not None
+
+
+def _init_worker(config: dict[str, str] | None = None) -> None:
+    from osgeo import gdal
+
+    gdal.UseExceptions()
+    for key, value in (config or {}).items():
+        gdal.SetConfigOption(key, value)
+    gdal.AllRegister()
+
+
+def _worker_version() -> str:
+    from osgeo import gdal
+
+    return gdal.VersionInfo("--version").strip()
+
+
+def _worker_drivers() -> list[str]:
+    from osgeo import gdal
+
+    return [gdal.GetDriver(i).ShortName for i in range(gdal.GetDriverCount())]
+
+
+def _worker_info(path: str) -> dict[str, Any]:
+    from osgeo import gdal
+
+    return gdal.Info(path, format="json")
+
+
+def _worker_layer_names(path: str) -> list[str]:
+    from osgeo import gdal
+
+    dataset = gdal.OpenEx(path, gdal.OF_VECTOR | gdal.OF_READONLY)
+    return [
+        dataset.GetLayerByIndex(i).GetName() for i in range(dataset.GetLayerCount())
+    ]
+
+
+def _worker_run(
+    operation: str,
+    options: list[str],
+    source: str,
+    destination: str,
+    *,
+    cwd: str,
+    timeout: float,
+    state: Any = None,
+    config: dict[str, str] | None = None,
+) -> None:
+    from osgeo import gdal
+
+    deadline = time.monotonic() + timeout
+    last_report = 0.0
+
+    def progress(complete: float, *_args) -> bool:
+        # Returning False makes GDAL abort the operation.
+        nonlocal last_report
+        now = time.monotonic()
+        if state is not None and now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            state["progress"] = complete
+            if state["cancel"]:
+                return False
+        return now < deadline
+
+    # Each worker runs one operation at a time, so changing directory is safe.
+    os.chdir(cwd)
+    utility = getattr(gdal, _UTILITIES[operation])
+    previous = {key: gdal.GetConfigOption(key) for key in config or {}}
+    for key, value in (config or {}).items():
+        gdal.SetConfigOption(key, value)
+    try:
+        dataset = utility(destination, source, options=options, callback=progress)
+    except RuntimeError:
+        if state is not None and state["cancel"]:
+            raise OperationCancelledError from None
+        if time.monotonic() >= deadline:
+            raise TimeoutError from None
+        raise
+    finally:
+        for key, value in previous.items():
+            gdal.SetConfigOption(key, value)
+    if dataset is None:
+        raise RuntimeError(gdal.GetLastErrorMsg() or f"{operation} failed")
+    # Dropping the last reference flushes and closes the output.
+    del dataset
+
+
+class GdalEngine:
+    """A pool of warm worker processes running GDAL utilities in-process.
+
+    Args:
+        max_workers: Maximum number of worker processes
+        config: GDAL configuration options set in every worker
+
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        config: dict[str, str] | None = None,
+    ) -> None:
+        self.max_workers = max_workers
+        self.config = config
+        self._executor: ProcessPoolExecutor | None = None
+        # Relays progress and cancellation between workers and the server.
+        self._manager: Any = None
+        self._lock = Lock()
+        self._version: str | None = None
+        self._drivers: frozenset[str] | None = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Created on first use; workers are then started as load requires
+        # and kept alive between operations.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    # Forking a multi-threaded server is unsafe.
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.config,),
+                )
+            return self._executor
+
+    def _shared_state(self) -> Any:
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+            return self._manager.dict(progress=0.0, cancel=False)
+
+    def _discard_pool(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _kill_pool(self, executor: ProcessPoolExecutor) -> None:
+        # A worker cannot be stopped alone: the pool is replaced on next use.
+        kill = getattr(executor, "kill_workers", None)
+        if kill is not None:
+            # Python 3.14+
+            kill()
+        else:
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.kill()
+        self._discard_pool(executor)
+
+    def version(self) -> str:
+        """Return the GDAL version string, probed once in a worker."""
+        if self._version is None:
+            executor = self._pool()
+            try:
+                self._version = executor.submit(_worker_version).result()
+            except BrokenProcessPool:
+                self._discard_pool(executor)
+                raise
+        return self._version
+
+    def drivers(self) -> frozenset[str]:
+        """Return the short names of the GDAL drivers, probed once in a worker."""
+        if self._drivers is None:
+            executor = self._pool()
+            try:
+                self._drivers = frozenset(executor.submit(_worker_drivers).result())
+            except BrokenProcessPool:
+                self._discard_pool(executor)
+                raise
+        return self._drivers
+
+    def layer_names(self, path: str) -> list[str]:
+        """Return the names of the vector layers of a dataset.
+
+        Failures are reported like those of ``ogrinfo``, as
+        ``subprocess.CalledProcessError``.
+        """
+        return self._query(["ogrinfo", "-ro", "-q", path], _worker_layer_names, path)
+
+    def info(self, path: str) -> dict[str, Any]:
+        """Return the description of a raster, as ``gdalinfo -json`` prints it.
+
+        Failures are reported like those of ``gdalinfo``, as
+        ``subprocess.CalledProcessError``.
+        """
+        return self._query(["gdalinfo", "-json", path], _worker_info, path)
+
+    def _query(self, cmd: list[str], func: Callable[..., Any], *args: Any) -> Any:
+        """Run ``func`` in a worker, reporting failures as ``cmd`` would."""
+        executor = self._pool()
+        try:
+            return executor.submit(func, *args).result()
+        except BrokenProcessPool as e:
+            self._discard_pool(executor)
+            raise subprocess.CalledProcessError(
+                1,
+                cmd,
+                "",
+                "GDAL worker process terminated unexpectedly",
+            ) from e
+        except RuntimeError as e:
+            raise subprocess.CalledProcessError(1, cmd, "", str(e)) from None
+
+    def run(
+        self,
+        operation: str,
+        options: list[str],
+        source: str,
+        destination: str,
+        *,
+        cwd: str,
+        timeout: float,
+        progress: Callable[[float], bool] | None = None,
+        config: dict[str, str] | None = None,
+    ) -> None:
+        """Run a GDAL utility and block until it has written ``destination``.
+
+        ``options`` use the CLI syntax without the positional dataset names;
+        ``config`` holds GDAL configuration options set for this run only.
+        ``progress`` is called periodically with the completed fraction and
+        cancels the operation by returning False. Failures are reported like
+        those of the CLI tools, as ``subprocess.CalledProcessError`` and
+        ``subprocess.TimeoutExpired``; cancellation as
+        ``OperationCancelledError``. An operation still running
+        ``KILL_GRACE`` seconds past its timeout, for instance stalled on a
+        remote read, is stopped by killing the worker pool.
+        """
+        cmd = [operation, *options, source, destination]
+        state = self._shared_state() if progress is not None else None
+        executor = self._pool()
+        future = executor.submit(
+            _worker_run,
+            operation,
+            options,
+            source,
+            destination,
+            cwd=cwd,
+            timeout=timeout,
+            state=state,
+            config=config,
+        )
+        deadline = time.monotonic() + timeout + KILL_GRACE
+        try:
+            if progress is not None:
+                while (
+                    not wait([future], timeout=PROGRESS_INTERVAL).done
+                    and time.monotonic() < deadline
+                ):
+                    if not state["cancel"] and not progress(state["progress"]):
+                        state["cancel"] = True
+            future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            if not future.done():
+                logger.error("GDAL worker stalled running %s, killing it", operation)
+                self._kill_pool(executor)
+            raise subprocess.TimeoutExpired(cmd, timeout) from None
+        except BrokenProcessPool as e:
+            # A worker died (e.g. a GDAL crash); start afresh next time.
+            logger.error("GDAL worker pool broke while running %s", operation)
+            self._discard_pool(executor)
+            raise subprocess.CalledProcessError(
+                1,
+                cmd,
+                "",
+                "GDAL worker process terminated unexpectedly",
+            ) from e
+        except RuntimeError as e:
+            raise subprocess.CalledProcessError(1, cmd, "", str(e)) from None
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            manager, self._manager = self._manager, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if manager is not None:
+            manager.shutdown()
@@ -1,24 +1,61 @@
+import asyncio
+import contextlib
+import hashlib
 import json
 import logging
+import math
 import os
 import subprocess
+import tempfile
 import time
-from dataclasses import dataclass
-from typing import Any
-from urllib.parse import urlparse
+from collections.abc import Awaitable, Callable, Iterator
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, BinaryIO
+from urllib.parse import quote, urlparse
 
 import tornado
 from jupyter_server.base.handlers import APIHandler
 from jupyter_server.utils import url_path_join
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPResponse
+from tornado.httputil import HTTPHeaders
+from tornado.iostream import StreamClosedError
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
 
+from . import metrics
+from .blobs import is_blob_path
+from .gdal_engine import PROGRESS_INTERVAL, GdalEngine, bindings_available
 from .processing import (
-    ALLOWED_OPERATIONS,
+    ProcessingOutput,
+    ProcessingRequest,
+    SourceError,
+    TileSettings,
+    accepted_output_formats,
+    describe_error,
     gdal_available,
-    run_gdal,
-    run_gdal_url,
-    run_gdal_url_with_cutline,
+    gdal_config,
+    gdal_drivers,
+    gdal_version,
+    set_gdal_config,
 )
+from .processing_cache import ProcessingCache
+from .processing_jobs import FINISHED, SUCCEEDED, Job, JobLimitError, JobQueue
+from .processing_sources import resolve_path, resolve_source
+from .proxy_cache import CacheEntry, CacheWriter, ProxyCache, is_storable
+from .proxy_encoding import (
+    UPSTREAM_ACCEPT_ENCODING,
+    BodyTranscoder,
+    accepted_encodings,
+    negotiate,
+)
+from .proxy_flight import SharedResponse, SingleFlight
+from .proxy_range import (
+    RangeCoalescer,
+    RangeNotSatisfiableError,
+    parse_byte_range,
+)
+from .proxy_ratelimit import TokenBucketLimiter
 
 
 @dataclass
@@ -30,8 +67,30 @@ class ProxyConfig:
     max_body_size: int
     rate_limit_requests: int
     rate_limit_window: int
+    rate_limit_burst: int
     cors_origin: str
     exempt_domains: str | set[str]
+    max_clients: int
+    max_connections_per_host: int
+    http2: bool
+    cache_dir: str
+    cache_size: int
+    cache_max_entries: int
+    streaming: bool
+    stream_buffer_size: int
+    range_coalesce_window: float
+    range_coalesce_gap: int
+    single_flight_max_size: int
+    compress: bool
+    compress_min_size: int
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean feature flag from the environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
 def load_config() -> ProxyConfig:
@@ -42,6 +101,14 @@ def load_config() -> ProxyConfig:
         max_body_size=int(os.environ.get("JGIS_MAX_BODY_SIZE", str(10 * 1024 * 1024))),
         rate_limit_requests=int(os.environ.get("JGIS_RATE_LIMIT_REQUESTS", "100")),
         rate_limit_window=int(os.environ.get("JGIS_RATE_LIMIT_WINDOW", "60")),
+        # Requests allowed at once before the sustained rate applies; defaults
+        # to a whole window's worth.
+        rate_limit_burst=int(
+            os.environ.get(
+                "JGIS_RATE_LIMIT_BURST",
+                os.environ.get("JGIS_RATE_LIMIT_REQUESTS", "100"),
+            ),
+        ),
         cors_origin=os.environ.get("JGIS_CORS_ORIGIN", "*"),
         exempt_domains=os.environ.get(
             "JGIS_EXEMPT_DOMAINS",
@@ -51,6 +118,117 @@ def load_config() -> ProxyConfig:
                 "https://geodes-portal.cnes.fr/api/stac/",
             },
         ),
+        max_clients=int(os.environ.get("JGIS_PROXY_MAX_CLIENTS", "50")),
+        max_connections_per_host=int(
+            os.environ.get("JGIS_PROXY_MAX_CONNECTIONS_PER_HOST", "8"),
+        ),
+        http2=_env_flag("JGIS_PROXY_HTTP2"),
+        cache_dir=os.environ.get(
+            "JGIS_PROXY_CACHE_DIR",
+            os.path.join(
+                os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                "jupytergis",
+                "proxy",
+            ),
+        ),
+        # Set JGIS_PROXY_CACHE_SIZE=0 to disable the response cache.
+        cache_size=int(os.environ.get("JGIS_PROXY_CACHE_SIZE", str(256 * 1024 * 1024))),
+        cache_max_entries=int(os.environ.get("JGIS_PROXY_CACHE_MAX_ENTRIES", "10000")),
+        streaming=_env_flag("JGIS_PROXY_STREAMING", default=True),
+        stream_buffer_size=int(
+            os.environ.get("JGIS_PROXY_STREAM_BUFFER_SIZE", str(1024 * 1024)),
+        ),
+        # Milliseconds; set JGIS_PROXY_RANGE_COALESCE_WINDOW=0 to forward every
+        # range request on its own.
+        range_coalesce_window=float(
+            os.environ.get("JGIS_PROXY_RANGE_COALESCE_WINDOW", "5"),
+        )
+        / 1000,
+        range_coalesce_gap=int(
+            os.environ.get("JGIS_PROXY_RANGE_COALESCE_GAP", str(64 * 1024)),
+        ),
+        # Set JGIS_PROXY_SINGLE_FLIGHT_MAX_SIZE=0 to disable request coalescing.
+        single_flight_max_size=int(
+            os.environ.get("JGIS_PROXY_SINGLE_FLIGHT_MAX_SIZE", str(8 * 1024 * 1024)),
+        ),
+        compress=_env_flag("JGIS_PROXY_COMPRESS"),
+        compress_min_size=int(os.environ.get("JGIS_PROXY_COMPRESS_MIN_SIZE", "1024")),
+    )
+
+
+@dataclass
+class ProcessingConfig:
+    """Configuration for the processing handler."""
+
+    # "auto" (bindings when installed), "bindings" or "cli".
+    engine: str
+    workers: int
+    job_concurrency: int
+    job_user_concurrency: int
+    job_max_queued: int
+    job_ttl: float
+    cache_dir: str
+    cache_size: int
+    cache_max_entries: int
+    max_upload_size: int
+    # Tiles of a large raster output computed at once; 0 disables tiling.
+    tile_workers: int
+    tile_size: int
+    # Remote data kept in memory by each GDAL process, and read-ahead
+    # cache per open file, in bytes.
+    vsicurl_cache_size: int
+    vsi_cache_size: int
+
+
+def load_processing_config() -> ProcessingConfig:
+    """Load processing configuration from environment variables with defaults."""
+    workers = int(
+        os.environ.get("JGIS_PROCESSING_WORKERS", str(min(4, os.cpu_count() or 1))),
+    )
+    return ProcessingConfig(
+        engine=os.environ.get("JGIS_PROCESSING_ENGINE", "auto").strip().lower(),
+        workers=workers,
+        job_concurrency=int(
+            os.environ.get("JGIS_PROCESSING_JOB_CONCURRENCY", str(max(1, workers))),
+        ),
+        job_user_concurrency=int(
+            os.environ.get("JGIS_PROCESSING_JOB_USER_CONCURRENCY", "2"),
+        ),
+        job_max_queued=int(os.environ.get("JGIS_PROCESSING_JOB_MAX_QUEUED", "20")),
+        # Seconds a finished job and its output are kept.
+        job_ttl=float(os.environ.get("JGIS_PROCESSING_JOB_TTL", "3600")),
+        cache_dir=os.environ.get(
+            "JGIS_PROCESSING_CACHE_DIR",
+            os.path.join(
+                os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                "jupytergis",
+                "processing",
+            ),
+        ),
+        # Set JGIS_PROCESSING_CACHE_SIZE=0 to disable the result cache.
+        cache_size=int(
+            os.environ.get("JGIS_PROCESSING_CACHE_SIZE", str(1024 * 1024 * 1024)),
+        ),
+        cache_max_entries=int(
+            os.environ.get("JGIS_PROCESSING_CACHE_MAX_ENTRIES", "1000"),
+        ),
+        max_upload_size=int(
+            os.environ.get(
+                "JGIS_PROCESSING_MAX_UPLOAD_SIZE",
+                str(4 * 1024 * 1024 * 1024),
+            ),
+        ),
+        tile_workers=int(os.environ.get("JGIS_PROCESSING_TILE_WORKERS", "0")),
+        tile_size=int(os.environ.get("JGIS_PROCESSING_TILE_SIZE", "4096")),
+        vsicurl_cache_size=int(
+            os.environ.get(
+                "JGIS_PROCESSING_VSICURL_CACHE_SIZE",
+                str(256 * 1024 * 1024),
+            ),
+        ),
+        vsi_cache_size=int(
+            os.environ.get("JGIS_PROCESSING_VSI_CACHE_SIZE", str(64 * 1024 * 1024)),
+        ),
     )
 
 
@@ -58,6 +236,251 @@ def load_config() -> ProxyConfig:
 logger = logging.getLogger(__name__)
 
 
+def create_http_client(config: ProxyConfig) -> AsyncHTTPClient:
+    """Create the upstream HTTP client used by the proxy.
+
+    libcurl is used when ``pycurl`` is installed (the ``proxy`` extra): it
+    keeps upstream connections alive between requests, caps the number of
+    connections per host and can negotiate HTTP/2. Otherwise Tornado's
+    pure-Python client is used, which opens a new connection for every
+    request.
+
+    Args:
+        config: The proxy configuration
+
+    Returns:
+        A dedicated (non-singleton) AsyncHTTPClient instance
+
+    """
+    defaults: dict[str, Any] = {
+        "connect_timeout": config.default_timeout,
+        "request_timeout": config.default_timeout,
+        "max_redirects": config.max_redirects,
+        "max_body_size": config.max_body_size,
+    }
+
+    try:
+        import pycurl
+        from tornado.curl_httpclient import CurlAsyncHTTPClient
+    except ImportError:
+        logger.warning(
+            "pycurl is not installed, so proxy connections will not be reused; "
+            "install jupytergis_core[proxy] to pool them",
+        )
+        return SimpleAsyncHTTPClient(
+            force_instance=True,
+            max_clients=config.max_clients,
+            defaults=defaults,
+        )
+
+    if config.http2:
+
+        def _prefer_http2(curl: Any) -> None:
+            # Falls back to HTTP/1.1 when the upstream does not offer h2 via ALPN.
+            curl.setopt(pycurl.HTTP_VERSION, pycurl.CURL_HTTP_VERSION_2TLS)
+
+        defaults["prepare_curl_callback"] = _prefer_http2
+
+    client = CurlAsyncHTTPClient(
+        force_instance=True,
+        max_clients=config.max_clients,
+        defaults=defaults,
+    )
+    # Tornado does not expose its curl multi handle; leave libcurl's
+    # defaults if a Tornado release renames it.
+    multi = getattr(client, "_multi", None)
+    if multi is None:
+        logger.warning("Cannot limit the proxy connections per host")
+        return client
+    multi.setopt(pycurl.M_MAX_HOST_CONNECTIONS, config.max_connections_per_host)
+    if config.http2:
+        multi.setopt(pycurl.M_PIPELINING, pycurl.PIPE_MULTIPLEX)
+    return client
+
+
+class ProxyContext:
+    """State shared by all proxy requests for the lifetime of the extension.
+
+    Tornado instantiates a new handler for every request, so anything that
+    must outlive a single request (configuration, pooled connections) lives
+    here and is handed to each handler through ``initialize``.
+    """
+
+    def __init__(self, config: ProxyConfig) -> None:
+        self.config = config
+        self._http_client: AsyncHTTPClient | None = None
+        self.cache: ProxyCache | None = None
+        if config.cache_size > 0 and config.cache_max_entries > 0:
+            try:
+                self.cache = ProxyCache(
+                    config.cache_dir,
+                    max_size=config.cache_size,
+                    max_entries=config.cache_max_entries,
+                )
+            except OSError as e:
+                logger.warning(
+                    "Proxy response cache disabled, cannot use %s: %s",
+                    config.cache_dir,
+                    e,
+                )
+        self.rate_limiter: TokenBucketLimiter | None = None
+        if config.rate_limit_requests > 0 and config.rate_limit_window > 0:
+            self.rate_limiter = TokenBucketLimiter(
+                config.rate_limit_requests / config.rate_limit_window,
+                burst=max(1, config.rate_limit_burst),
+            )
+        self.single_flight: SingleFlight | None = None
+        if config.single_flight_max_size > 0:
+            self.single_flight = SingleFlight()
+        self.range_coalescer: RangeCoalescer | None = None
+        if config.range_coalesce_window > 0:
+            self.range_coalescer = RangeCoalescer(
+                config.range_coalesce_window,
+                max_gap=config.range_coalesce_gap,
+                max_span=config.max_body_size,
+            )
+
+    @property
+    def http_client(self) -> AsyncHTTPClient:
+        """The pooled upstream client, created on first use.
+
+        Creation is deferred so that the client binds to the IOLoop that
+        actually serves requests rather than the one active at load time.
+        """
+        if self._http_client is None:
+            self._http_client = create_http_client(self.config)
+        return self._http_client
+
+    def close(self) -> None:
+        """Release pooled upstream connections and finish the cache writes."""
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+        if self.cache is not None:
+            self.cache.close()
+
+
+class ProcessingContext:
+    """State shared by all processing requests, such as the GDAL worker pool."""
+
+    def __init__(self, config: ProcessingConfig, root_dir: str | None = None) -> None:
+        self.config = config
+        # Source references are resolved below this directory.
+        self.root_dir = root_dir or str(Path.cwd())
+        self._engine: GdalEngine | None = None
+        self._engine_checked = False
+        self.gdal_config = gdal_config(
+            config.vsicurl_cache_size,
+            config.vsi_cache_size,
+        )
+        set_gdal_config(self.gdal_config)
+        self.tiles = None
+        if config.tile_workers > 1:
+            self.tiles = TileSettings(config.tile_workers, max(256, config.tile_size))
+        self.jobs = JobQueue(
+            config.job_concurrency,
+            max_running_per_user=config.job_user_concurrency,
+            max_queued_per_user=config.job_max_queued,
+            result_ttl=config.job_ttl,
+        )
+        self.cache: ProcessingCache | None = None
+        if config.cache_size > 0 and config.cache_max_entries > 0:
+            try:
+                self.cache = ProcessingCache(
+                    config.cache_dir,
+                    max_size=config.cache_size,
+                    max_entries=config.cache_max_entries,
+                )
+            except OSError as e:
+                logger.warning(
+                    "Processing result cache disabled, cannot use %s: %s",
+                    config.cache_dir,
+                    e,
+                )
+        if config.engine not in {"auto", "bindings", "cli"}:
+            logger.warning(
+                "Unknown JGIS_PROCESSING_ENGINE %r, using 'auto'",
+                config.engine,
+            )
+        if config.engine != "cli" and config.workers > 0:
+            if bindings_available():
+                self._engine = GdalEngine(config.workers, config=self.gdal_config)
+            elif config.engine == "bindings":
+                logger.warning(
+                    "GDAL Python bindings are not installed, using the CLI tools",
+                )
+
+    @property
+    def available(self) -> bool:
+        """Whether processing can run at all."""
+        return self._engine is not None or gdal_available()
+
+    def engine(self) -> GdalEngine | None:
+        """Return the worker pool, or None to run the CLI tools.
+
+        The first call checks that the workers can load GDAL and falls back
+        to the CLI tools for good if they cannot. Blocks, so it must be
+        called from an executor thread.
+        """
+        if self._engine is not None and not self._engine_checked:
+            try:
+                self._engine.version()
+            except Exception:
+                logger.exception("GDAL worker pool unusable, using the CLI tools")
+                self._engine.close()
+                self._engine = None
+            self._engine_checked = True
+        return self._engine
+
+    def version(self) -> str | None:
+        """Return the GDAL version string; probed once, so this is cheap."""
+        engine = self.engine()
+        if engine is not None:
+            return engine.version()
+        return gdal_version()
+
+    def drivers(self) -> frozenset[str]:
+        """Return the GDAL driver names; probed once, so this is cheap."""
+        engine = self.engine()
+        if engine is not None:
+            return engine.drivers()
+        return gdal_drivers()
+
+    def run(
+        self,
+        request: ProcessingRequest,
+        progress: Callable[[float], bool] | None = None,
+    ) -> ProcessingOutput:
+        """Run a request, answering from the result cache when possible.
+
+        Blocks, so it must be called from an executor thread.
+        """
+        request = resolve_source(request, self.root_dir)
+        if request.accepted_formats:
+            request = request.negotiate(self.drivers())
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(request)
+            if key is not None:
+                output = self.cache.get(key)
+                if output is not None:
+                    return output
+        output = request.run(
+            engine=self.engine(),
+            progress=progress,
+            tiles=self.tiles,
+        )
+        if key is not None:
+            self.cache.put(key, output)
+        return output
+
+    def close(self) -> None:
+        """Stop the jobs and the worker pool."""
+        self.jobs.close()
+        if self._engine is not None:
+            self._engine.close()
+
+
 class ProxyError(Exception):
     """Base exception for proxy-related errors."""
 
@@ -69,42 +492,256 @@ class ValidationError(ProxyError):
 class RateLimitError(ProxyError):
     """Raised when rate limit is exceeded."""
 
+    def __init__(self, message: str, retry_after: float = 0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _UpstreamStream:
+    """Forward an upstream response body to the client while it downloads.
+
+    The status line and headers are collected through ``header_callback``
+    and the client response is only started on the first body chunk, so
+    redirects and upstream errors never reach the client half-written.
+
+    Flow control: every chunk is flushed to the client immediately. When the
+    client reads slower than the upstream sends and the unflushed backlog
+    exceeds ``high_water_mark``, a libcurl transfer is paused until half of
+    the backlog has drained. The pure-Python client cannot be paused, so the
+    backlog is then only bounded by ``JGIS_MAX_BODY_SIZE``.
+    """
+
+    def __init__(
+        self,
+        handler: "ProxyHandler",
+        high_water_mark: int,
+        open_cache_writer: Callable[[int, HTTPHeaders], CacheWriter | None]
+        | None = None,
+    ) -> None:
+        self.handler = handler
+        self.high_water_mark = high_water_mark
+        self.open_cache_writer = open_cache_writer
+        self.code = 200
+        self.headers = HTTPHeaders()
+        self.started = False
+        self.client_gone = False
+        self.writer: CacheWriter | None = None
+        self.transcoder: BodyTranscoder | None = None
+        self._headers_done = False
+        self._early_chunks: list[bytes] = []
+        self._pending = 0
+        self._curl: Any = None
+        self._paused = False
+
+    def on_header_line(self, line: str) -> None:
+        if line.startswith("HTTP/"):
+            # A new response starts (after a redirect or "100 Continue").
+            # Not parsed with parse_response_start_line, which rejects HTTP/2.
+            parts = line.strip().split(" ", 2)
+            self.code = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+            self.headers = HTTPHeaders()
+            self._headers_done = False
+        elif line.strip():
+            self.headers.parse_line(line)
+        else:
+            self._headers_done = True
+            self._replay_early_chunks()
+
+    def on_chunk(self, chunk: bytes) -> None:
+        if not self._headers_done:
+            # libcurl queues header lines on the IOLoop but may hand over
+            # the body of a short transfer synchronously when it completes,
+            # so chunks can overtake the headers they belong to.
+            self._early_chunks.append(chunk)
+            return
+        if not 200 <= self.code < 300:
+            # Error bodies are dropped; the failure is reported once the
+            # fetch raises.
+            return
+        if not self.started:
+            self.start()
+        if self.writer is not None:
+            self._to_cache(self.writer.write, chunk)
+        if self.client_gone:
+            return
+        if self.transcoder is not None:
+            chunk = self._transcode(self.transcoder.process, chunk)
+            if not chunk:
+                return
+        self.handler.write(chunk)
+        size = len(chunk)
+        self._pending += size
+        self.handler.flush().add_done_callback(
+            lambda future: self._on_flushed(size, future),
+        )
+        if self._pending > self.high_water_mark:
+            self._pause()
+
+    def prepare_curl(self, curl: Any) -> None:
+        default = self.handler.http_client.defaults.get("prepare_curl_callback")
+        if default is not None:
+            default(curl)
+        self._curl = curl
+
+    def start(self) -> None:
+        """Send the upstream status and headers to the client."""
+        self.started = True
+        if self.code == 206:
+            self.handler.set_status(206)
+        self.handler._set_response_headers(self.headers)
+        self.transcoder = self.handler._negotiate_encoding(self.headers, self.code)
+        length = self.headers.get("Content-Length")
+        if length is not None and self.transcoder is None:
+            self.handler.set_header("Content-Length", length)
+        if self.open_cache_writer is not None:
+            self.writer = self.open_cache_writer(self.code, self.headers)
+
+    def finish(self, code: int) -> None:
+        self._headers_done = True
+        self._replay_early_chunks()
+        if not self.started:
+            # Empty body: nothing triggered start() yet.
+            self.start()
+        if self.transcoder is not None and not self.client_gone:
+            tail = self._transcode(self.transcoder.flush)
+            if tail:
+                self.handler.write(tail)
+        if self.writer is not None:
+            self._to_cache(self.writer.commit, code, self.headers)
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            self._to_cache(self.writer.abort)
+        self._resume()
+
+    def _to_cache(self, func: Callable[..., Any], *args: Any) -> None:
+        # Queued on the cache thread, which runs the writes in order.
+        self.handler.context.cache.executor.submit(func, *args)
+
+    def _transcode(self, step: Callable[..., bytes], *args: bytes) -> bytes:
+        try:
+            return step(*args)
+        except Exception:
+            # A corrupt upstream body: cut the client connection rather than
+            # let it take the truncated body for a complete one.
+            logger.warning("Failed to transcode the upstream body", exc_info=True)
+            self.client_gone = True
+            self.handler.request.connection.close()
+            return b""
+
+    def _replay_early_chunks(self) -> None:
+        chunks, self._early_chunks = self._early_chunks, []
+        for chunk in chunks:
+            self.on_chunk(chunk)
+
+    def _on_flushed(self, size: int, future: asyncio.Future) -> None:
+        self._pending -= size
+        if future.exception() is not None:
+            # The client went away; keep draining the upstream (it may still
+            # fill the cache) without writing to the closed connection.
+            self.client_gone = True
+        if self.client_gone or self._pending <= self.high_water_mark // 2:
+            self._resume()
+
+    def _owns_curl(self) -> bool:
+        # Tornado recycles curl handles once a transfer completes and clears
+        # ``info`` first; never touch a handle serving another request.
+        info = getattr(self._curl, "info", None)
+        return bool(info) and info["request"].streaming_callback == self.on_chunk
+
+    def _pause(self) -> None:
+        if self._paused or not self._owns_curl():
+            return
+        import pycurl
+
+        try:
+            self._curl.pause(pycurl.PAUSE_RECV)
+        except pycurl.error:
+            return
+        self._paused = True
+
+    def _resume(self) -> None:
+        if not self._paused:
+            return
+        self._paused = False
+        if not self._owns_curl():
+            return
+        import pycurl
+
+        # If the transfer failed while paused, the fetch reports the error.
+        with contextlib.suppress(pycurl.error):
+            self._curl.pause(pycurl.PAUSE_CONT)
+
 
 class ProxyHandler(APIHandler):
     """Secure proxy handler with enhanced validation and async processing."""
 
-    def initialize(self) -> None:
-        """Initialize the handler with configuration and HTTP client."""
-        self.proxy_config = load_config()
-        self._request_timestamps: list[float] = []
-        self.http_client = AsyncHTTPClient(
-            defaults={
-                "connect_timeout": self.proxy_config.default_timeout,
-                "request_timeout": self.proxy_config.default_timeout,
-                "max_redirects": self.proxy_config.max_redirects,
-                "max_body_size": self.proxy_config.max_body_size,
-            },
+    # Label of this handler's requests in the metrics.
+    metrics_endpoint = "proxy"
+
+    def initialize(self, context: ProxyContext) -> None:
+        """Initialize the handler with the shared configuration and HTTP client.
+
+        Args:
+            context: State shared across requests, created in ``setup_handlers``
+
+        """
+        self.context = context
+        self.proxy_config = context.config
+        self.http_client = context.http_client
+        # Body written so far, kept while leading a single-flight request.
+        self._recording: list[bytes] | None = None
+        self._recorded_size = 0
+        self._bytes_written = 0
+
+    def write(self, chunk: str | bytes | dict) -> None:
+        """Write to the client, recording the body for single-flight followers."""
+        super().write(chunk)
+        if isinstance(chunk, bytes):
+            self._bytes_written += len(chunk)
+        if self._recording is None:
+            return
+        if not isinstance(chunk, bytes):
+            # Recording only covers proxied bodies, which are always bytes.
+            self._recording = None
+            return
+        self._recorded_size += len(chunk)
+        if self._recorded_size > self.proxy_config.single_flight_max_size:
+            self._recording = None
+        else:
+            self._recording.append(chunk)
+
+    def on_finish(self) -> None:
+        """Record the request in the metrics."""
+        status = self.get_status()
+        metrics.REQUESTS.labels(self.metrics_endpoint, str(status)).inc()
+        metrics.REQUEST_DURATION.labels(self.metrics_endpoint).observe(
+            self.request.request_time(),
         )
+        if status < 400:
+            metrics.RESPONSE_SIZE.observe(self._bytes_written)
 
-    def _check_rate_limit(self) -> None:
+    def _check_rate_limit(self, url: str) -> None:
         """Check if the current request exceeds rate limits.
 
+        Limits apply per user and per upstream host, and are shared by all
+        requests through the limiter in the proxy context.
+
+        Args:
+            url: The validated target URL
+
         Raises:
             RateLimitError: If rate limit is exceeded
 
         """
-        current_time = time.time()
-        window_start = current_time - self.proxy_config.rate_limit_window
-
-        # Remove old timestamps
-        self._request_timestamps = [
-            ts for ts in self._request_timestamps if ts > window_start
-        ]
-
-        if len(self._request_timestamps) >= self.proxy_config.rate_limit_requests:
-            raise RateLimitError("Rate limit exceeded")
-
-        self._request_timestamps.append(current_time)
+        limiter = self.context.rate_limiter
+        if limiter is None:
+            return
+        user = self.current_user
+        username = getattr(user, "username", user)
+        retry_after = limiter.acquire((username, urlparse(url).hostname))
+        if retry_after > 0:
+            raise RateLimitError("Rate limit exceeded", retry_after)
 
     @tornado.web.authenticated
     async def get(self) -> None:
@@ -138,6 +775,16 @@ class ProxyHandler(APIHandler):
             parsed = json.loads(raw)
         except json.JSONDecodeError as exc:
             raise ValidationError("Invalid JSON in 'headers' parameter") from exc
+        return self._validate_headers(parsed)
+
+    @staticmethod
+    def _validate_headers(parsed: Any) -> dict[str, str]:
+        """Check decoded forwarded headers and drop the blocked ones.
+
+        Raises:
+            ValidationError: If ``parsed`` is not a flat string→string mapping.
+
+        """
         if not isinstance(parsed, dict) or not all(
             isinstance(k, str) and isinstance(v, str) for k, v in parsed.items()
         ):
@@ -148,6 +795,32 @@ class ProxyHandler(APIHandler):
         blocked = {"host", "content-length", "transfer-encoding", "connection"}
         return {k: v for k, v in parsed.items() if k.lower() not in blocked}
 
+    def _range_headers(self, extra_headers: dict[str, str]) -> dict[str, str]:
+        """Collect the ``Range`` and ``If-Range`` headers to forward upstream.
+
+        Byte-range readers (COG, GeoParquet) set them on their request to the
+        proxy; they are also accepted through the ``headers`` parameter, from
+        which they are removed so that a ranged request never shares a cache
+        key with a full one.
+
+        Args:
+            extra_headers: Headers parsed from the ``headers`` parameter,
+                modified in place
+
+        Returns:
+            The range headers, with canonical names
+
+        """
+        range_headers = {}
+        for name in list(extra_headers):
+            if name.lower() in {"range", "if-range"}:
+                range_headers[name.title()] = extra_headers.pop(name)
+        for name in ("Range", "If-Range"):
+            value = self.request.headers.get(name)
+            if value is not None:
+                range_headers[name] = value
+        return range_headers
+
     async def _handle_request(self, method: str) -> None:
         """Central request handling method.
 
@@ -159,26 +832,32 @@ class ProxyHandler(APIHandler):
 
         """
         try:
-            # Check rate limit
-            self._check_rate_limit()
-
             # Validate and parse input
             url = self._validate_url(self.get_argument("url"))
+
+            # Check rate limit
+            self._check_rate_limit(url)
+
             body = await self._validate_body(method)
             extra_headers = self._parse_headers()
+            range_headers = self._range_headers(extra_headers)
 
             logger.info("Proxying %s request to: %s", method, url)
 
-            # Make async HTTP request
-            response = await self._make_request(url, method, body, extra_headers)
+            if method == "GET" and "Range" in range_headers:
+                await self._handle_range_get(url, extra_headers, range_headers)
+            elif method == "GET":
+                await self._handle_shared_get(url, extra_headers)
+            else:
+                await self._forward_upstream(url, method, body, extra_headers)
 
-            # Forward response
-            self._set_response_headers(response)
-            self.finish(response.body)
+        except StreamClosedError:
+            logger.debug("Client closed the connection while proxying")
 
         except RateLimitError as e:
             logger.warning("Rate limit exceeded: %s", e)
             self.set_status(429)
+            self.set_header("Retry-After", str(math.ceil(e.retry_after)))
             self.finish(
                 json.dumps(
                     {
@@ -210,6 +889,319 @@ class ProxyHandler(APIHandler):
             logger.exception("Proxy request failed")
             self._handle_error_response(e)
 
+    async def _handle_shared_get(
+        self,
+        url: str,
+        extra_headers: dict[str, str],
+    ) -> None:
+        """Handle a GET request, sharing one upstream fetch between duplicates.
+
+        The first request for a given URL and set of forwarded headers leads:
+        it is processed normally while its response is recorded. Identical
+        requests arriving before it completes wait and are answered with a
+        copy. Responses larger than ``JGIS_PROXY_SINGLE_FLIGHT_MAX_SIZE``
+        are not recorded; the waiting requests then fetch on their own.
+
+        Args:
+            url: The validated target URL
+            extra_headers: Headers forwarded to the upstream server
+
+        """
+        flights = self.context.single_flight
+        if flights is None:
+            await self._handle_get(url, extra_headers)
+            return
+
+        # Responses are encoded for the leader's client, so only clients
+        # accepting the same encodings can share them.
+        accepted = accepted_encodings(self.request.headers.get("Accept-Encoding", ""))
+        key = ProxyCache.make_key(
+            "GET",
+            url,
+            {**extra_headers, "Accept-Encoding": ",".join(sorted(accepted))},
+        )
+        leader = flights.join(key)
+        if leader is not None:
+            shared = await leader
+            if shared is not None:
+                self._finish_shared(shared)
+                return
+            # Nothing recorded; the cache may have the response by now.
+            await self._handle_get(url, extra_headers)
+            return
+
+        flights.lead(key)
+        self._recording = []
+        try:
+            await self._handle_get(url, extra_headers)
+        except StreamClosedError:
+            flights.land(key)
+            raise
+        except Exception as e:
+            flights.land(key, error=e)
+            raise
+        finally:
+            recording, self._recording = self._recording, None
+            shared = None
+            if recording is not None:
+                shared = SharedResponse(
+                    self.get_status(),
+                    HTTPHeaders(self._headers),
+                    b"".join(recording),
+                )
+            flights.land(key, shared)
+
+    def _finish_shared(self, shared: SharedResponse) -> None:
+        """Answer a single-flight follower with the leader's response."""
+        self.set_status(shared.code)
+        for name, value in shared.headers.get_all():
+            self.set_header(name, value)
+        self._finish_proxied(shared.body)
+
+    async def _handle_get(self, url: str, extra_headers: dict[str, str]) -> None:
+        """Handle a GET request through the response cache, if enabled."""
+        if self.context.cache is not None:
+            await self._handle_cached_get(url, extra_headers)
+            return
+        code, headers = await self._forward_upstream(url, "GET", None, extra_headers)
+        if code == 304:
+            self._relay_not_modified(headers)
+
+    async def _handle_cached_get(
+        self,
+        url: str,
+        extra_headers: dict[str, str],
+    ) -> None:
+        """Serve a GET request from the response cache when possible.
+
+        Fresh entries are returned without contacting the upstream server.
+        Stale entries carrying a validator are revalidated with a conditional
+        request, and replaced if the upstream returns a new representation.
+
+        Args:
+            url: The validated target URL
+            extra_headers: Headers forwarded to the upstream server
+
+        """
+        cache = self.context.cache
+        key = cache.make_key("GET", url, extra_headers)
+        entry = await self._cache_io(cache.get, key)
+
+        if entry is not None and entry.is_fresh():
+            cache.record_hit()
+            await self._finish_from_cache(entry, "HIT")
+            return
+
+        request_headers = dict(extra_headers)
+        if entry is not None:
+            request_headers.update(entry.conditional_headers())
+
+        def open_cache_writer(code: int, headers: HTTPHeaders) -> CacheWriter | None:
+            if is_storable(code, headers, extra_headers):
+                return cache.open_writer(key, url)
+            cache.executor.submit(cache.invalidate, key)
+            return None
+
+        self.set_header("X-JupyterGIS-Cache", "MISS")
+        code, headers = await self._forward_upstream(
+            url,
+            "GET",
+            None,
+            request_headers,
+            open_cache_writer,
+        )
+
+        if code == 304 and entry is not None:
+            refreshed = await self._cache_io(cache.refresh, key, headers)
+            if refreshed is not None:
+                cache.record_hit()
+                await self._finish_from_cache(refreshed, "REVALIDATED")
+                return
+            # Dropped by a concurrent request meanwhile: fetch it again.
+            code, headers = await self._forward_upstream(
+                url,
+                "GET",
+                None,
+                extra_headers,
+                open_cache_writer,
+            )
+        cache.record_miss()
+        if code == 304:
+            # Validators sent by the client itself matched.
+            self._relay_not_modified(headers)
+
+    async def _handle_range_get(
+        self,
+        url: str,
+        extra_headers: dict[str, str],
+        range_headers: dict[str, str],
+    ) -> None:
+        """Forward a byte-range request, merged with concurrent ones if possible.
+
+        Single ``bytes=start-end`` ranges are handed to the shared
+        ``RangeCoalescer``. Other forms (suffix, open-ended, multiple ranges)
+        and conditional ``If-Range`` requests are forwarded as they are, and
+        the upstream answer (206, or 200 if it ignores ranges) passed through.
+
+        Args:
+            url: The validated target URL
+            extra_headers: Headers forwarded to the upstream server
+            range_headers: The ``Range`` and optional ``If-Range`` headers
+
+        """
+        coalescer = self.context.range_coalescer
+        byte_range = parse_byte_range(range_headers["Range"])
+        if coalescer is None or byte_range is None or "If-Range" in range_headers:
+            await self._forward_upstream(
+                url,
+                "GET",
+                None,
+                {**extra_headers, **range_headers},
+            )
+            return
+
+        async def fetch_span(start: int, end: int) -> HTTPResponse:
+            return await self._make_request(
+                url,
+                "GET",
+                None,
+                {**extra_headers, "Range": f"bytes={start}-{end}"},
+            )
+
+        try:
+            result = await coalescer.fetch(
+                ProxyCache.make_key("GET", url, extra_headers),
+                *byte_range,
+                fetch_span,
+            )
+        except RangeNotSatisfiableError as e:
+            self.set_status(416)
+            self.set_header("Content-Range", f"bytes */{e.total}")
+            self.finish()
+            return
+
+        self._set_response_headers(result.headers)
+        self.set_status(206)
+        self.set_header("Content-Range", result.content_range)
+        self.set_header("Accept-Ranges", "bytes")
+        self._finish_proxied(result.body)
+
+    def _cache_io(self, func: Callable[..., Any], *args: Any) -> Awaitable[Any]:
+        """Run a file operation of the response cache on its thread."""
+        return tornado.ioloop.IOLoop.current().run_in_executor(
+            self.context.cache.executor,
+            func,
+            *args,
+        )
+
+    def _relay_not_modified(self, headers: HTTPHeaders) -> None:
+        """Answer the client with the upstream ``304 Not Modified``."""
+        self.set_status(304)
+        self._set_response_headers(headers)
+        for name in ("ETag", "Last-Modified", "Cache-Control", "Expires", "Date"):
+            if name in headers:
+                self.set_header(name, headers[name])
+        self._finish_proxied()
+
+    async def _finish_from_cache(self, entry: CacheEntry, status: str) -> None:
+        """Send a stored response to the client, one block at a time."""
+        self._set_response_headers(entry.headers)
+        self.set_header("X-JupyterGIS-Cache", status)
+        self.set_header("Age", str(int(entry.age())))
+        transcoder = self._negotiate_encoding(entry.headers)
+        if transcoder is None:
+            self.set_header("Content-Length", str(entry.size))
+        chunks = entry.iter_body()
+        try:
+            while chunk := await self._cache_io(next, chunks, b""):
+                if transcoder is not None:
+                    chunk = transcoder.process(chunk)
+                if chunk:
+                    self.write(chunk)
+                    await self.flush()
+        finally:
+            chunks.close()
+        if transcoder is not None:
+            self.write(transcoder.flush())
+        await self._finish_proxied()
+
+    async def _forward_upstream(
+        self,
+        url: str,
+        method: str,
+        body: str | None,
+        request_headers: dict[str, str],
+        open_cache_writer: Callable[[int, HTTPHeaders], CacheWriter | None]
+        | None = None,
+    ) -> tuple[int, HTTPHeaders]:
+        """Fetch a URL and send the upstream response to the client.
+
+        In streaming mode (``JGIS_PROXY_STREAMING``, on by default) the body is
+        forwarded chunk by chunk as it arrives; otherwise it is buffered and
+        sent in one piece. A ``304 Not Modified`` answer is not forwarded but
+        returned for the caller to handle.
+
+        Args:
+            url: The validated target URL
+            method: The HTTP method to use
+            body: Optional request body
+            request_headers: Headers to send to the upstream server
+            open_cache_writer: Called with the upstream status and headers
+                before the body is forwarded; may return a writer receiving a
+                copy of the body for the response cache.
+
+        Returns:
+            The upstream status code and headers
+
+        """
+        if not self.proxy_config.streaming:
+            response = await self._make_request(url, method, body, request_headers)
+            if response.code != 304:
+                if open_cache_writer is not None:
+                    writer = open_cache_writer(response.code, response.headers)
+                    if writer is not None:
+                        await self._cache_io(writer.write, response.body)
+                        await self._cache_io(
+                            writer.commit,
+                            response.code,
+                            response.headers,
+                        )
+                if response.code == 206:
+                    self.set_status(206)
+                self._set_response_headers(response.headers)
+                transcoder = self._negotiate_encoding(response.headers, response.code)
+                self._finish_proxied(
+                    response.body
+                    if transcoder is None
+                    else transcoder.transcode(response.body),
+                )
+            return response.code, response.headers
+
+        stream = _UpstreamStream(
+            self,
+            self.proxy_config.stream_buffer_size,
+            open_cache_writer,
+        )
+        try:
+            response = await self._make_request(
+                url,
+                method,
+                body,
+                request_headers,
+                stream=stream,
+            )
+        except Exception:
+            stream.abort()
+            raise
+
+        if response.code == 304 and not stream.started:
+            return response.code, stream.headers
+
+        stream.finish(response.code)
+        if not self._finished:
+            await self._finish_proxied()
+        return response.code, stream.headers
+
     def _validate_url(self, url: str) -> str:
         """Validate and sanitize target URL.
 
@@ -223,6 +1215,9 @@ class ProxyHandler(APIHandler):
             ValidationError: If the URL is invalid
 
         """
+        if not isinstance(url, str):
+            raise ValidationError("'url' must be a string")
+
         parsed = urlparse(url)
 
         if parsed.scheme not in ("http", "https"):
@@ -266,6 +1261,7 @@ class ProxyHandler(APIHandler):
         method: str,
         body: str | None = None,
         extra_headers: dict[str, str] | None = None,
+        stream: _UpstreamStream | None = None,
     ) -> HTTPResponse:
         """Execute proxy request with safety controls.
 
@@ -275,6 +1271,8 @@ class ProxyHandler(APIHandler):
             body: Optional request body
             extra_headers: Optional headers to forward to the upstream server
                 (e.g. Authorization, X-API-Key).
+            stream: If given, receives the response headers and body as they
+                arrive; the returned response then has neither.
 
         Returns:
             The HTTP response
@@ -296,6 +1294,14 @@ class ProxyHandler(APIHandler):
                 headers["Content-Type"] = "application/json"
             if extra_headers:
                 headers.update(extra_headers)
+            # Bodies are fetched (and cached) as the upstream encodes them,
+            # and only decoded for clients that do not accept the encoding.
+            # Byte ranges refer to the unencoded body.
+            for name in [k for k in headers if k.lower() == "accept-encoding"]:
+                del headers[name]
+            headers["Accept-Encoding"] = (
+                "identity" if "Range" in headers else UPSTREAM_ACCEPT_ENCODING
+            )
 
             request = HTTPRequest(
                 url=url,
@@ -304,12 +1310,28 @@ class ProxyHandler(APIHandler):
                 headers=headers or None,
                 validate_cert=validate_cert,
                 allow_nonstandard_methods=False,
-                decompress_response=True,
+                decompress_response=False,
             )
+            if stream is not None:
+                request.header_callback = stream.on_header_line
+                request.streaming_callback = stream.on_chunk
+                request.prepare_curl_callback = stream.prepare_curl
 
-            return await self.http_client.fetch(request)
+            started = time.monotonic()
+            try:
+                response = await self.http_client.fetch(request)
+            except tornado.httpclient.HTTPError as e:
+                metrics.UPSTREAM_RESPONSES.labels(str(e.code)).inc()
+                raise
+            finally:
+                metrics.UPSTREAM_DURATION.observe(time.monotonic() - started)
+            metrics.UPSTREAM_RESPONSES.labels(str(response.code)).inc()
+            return response
 
         except tornado.httpclient.HTTPClientError as e:
+            if e.code == 304 and e.response is not None:
+                # Answer to a cache revalidation, handled by the caller.
+                return e.response
             logger.error("Upstream error: %d %s", e.code, e.message)
             raise tornado.web.HTTPError(e.code, "Upstream service error") from e
 
@@ -317,23 +1339,75 @@ class ProxyHandler(APIHandler):
             logger.error("Network error: %s", str(e))
             raise tornado.web.HTTPError(503, "Service unavailable") from e
 
-    def _set_response_headers(self, response: HTTPResponse) -> None:
+    def _set_response_headers(self, headers: HTTPHeaders) -> None:
         """Set secure CORS and content headers.
 
         Args:
-            response: The HTTP response to get headers from
+            headers: The upstream (or cached) response headers
 
         """
         self.set_header("Access-Control-Allow-Origin", self.proxy_config.cors_origin)
         self.set_header("Access-Control-Allow-Methods", "GET, POST")
         self.set_header(
             "Access-Control-Allow-Headers",
-            "Content-Type, Authorization, X-Requested-With",
+            "Content-Type, Authorization, X-Requested-With, Range, If-Range",
         )
         self.set_header("Content-Security-Policy", "default-src 'none'")
         self.set_header(
             "Content-Type",
-            response.headers.get("Content-Type", "application/json"),
+            headers.get("Content-Type", "application/json"),
+        )
+        for name in ("Accept-Ranges", "Content-Range"):
+            if name in headers:
+                self.set_header(name, headers[name])
+
+    def _negotiate_encoding(
+        self,
+        headers: HTTPHeaders,
+        code: int = 200,
+    ) -> BodyTranscoder | None:
+        """Pick the Content-Encoding of the response sent to the client.
+
+        Bodies the client can take as they are pass through untouched;
+        otherwise they are decoded, and with ``JGIS_PROXY_COMPRESS`` text
+        payloads of at least ``JGIS_PROXY_COMPRESS_MIN_SIZE`` bytes are
+        (re)compressed with the best encoding the client accepts.
+
+        Args:
+            headers: The upstream (or cached) response headers
+            code: The upstream status code; partial content is never
+                transcoded.
+
+        Returns:
+            The transcoder to pass the body through, or None to send it as is.
+
+        """
+        if code == 206:
+            negotiation = negotiate(headers.get("Content-Encoding"), "*")
+        else:
+            length = headers.get("Content-Length", "")
+            negotiation = negotiate(
+                headers.get("Content-Encoding"),
+                self.request.headers.get("Accept-Encoding", ""),
+                headers.get("Content-Type", ""),
+                int(length) if length.isdigit() else None,
+                self.proxy_config.compress_min_size
+                if self.proxy_config.compress
+                else None,
+            )
+        if negotiation.content_encoding is not None:
+            self.set_header("Content-Encoding", negotiation.content_encoding)
+        self.set_header("Vary", "Accept-Encoding")
+        return negotiation.transcoder
+
+    def _finish_proxied(self, body: bytes | None = None) -> Awaitable[None]:
+        """Finish a proxied response, keeping the Content-Type already set.
+
+        ``APIHandler.finish`` would otherwise label every response as JSON.
+        """
+        return self.finish(
+            body,
+            set_content_type=self._headers.get("Content-Type", "application/json"),
         )
 
     def _handle_error_response(self, error: Exception) -> None:
@@ -362,26 +1436,129 @@ class ProcessingHandler(APIHandler):
     POST — runs a GDAL CLI operation and returns the result.
     """
 
+    # Label of the requests in the metrics.
+    metrics_endpoint = "processing"
+
+    def initialize(self, context: ProcessingContext) -> None:
+        """Receive the shared processing state."""
+        self.context = context
+
+    def on_finish(self) -> None:
+        """Record the request in the metrics."""
+        metrics.REQUESTS.labels(self.metrics_endpoint, str(self.get_status())).inc()
+        metrics.REQUEST_DURATION.labels(self.metrics_endpoint).observe(
+            self.request.request_time(),
+        )
+
+    def _send_error(self, status: int, message: str) -> None:
+        self.set_status(status)
+        self.finish(json.dumps({"error": message}))
+
+    def _parse_request(
+        self,
+        data: bytes | str | None = None,
+        input_path: str | None = None,
+    ) -> ProcessingRequest | None:
+        """Validate the request; answers the client and returns None if invalid.
+
+        Args:
+            data: The JSON description of the request, by default the body
+            input_path: An uploaded dataset to process
+
+        """
+        try:
+            body = json.loads(self.request.body if data is None else data)
+        except json.JSONDecodeError:
+            body = None
+        if not isinstance(body, dict):
+            self._send_error(400, "Invalid JSON body")
+            return None
+
+        try:
+            request = ProcessingRequest.from_json(body, input_path)
+        except ValueError as e:
+            self._send_error(400, str(e))
+            return None
+
+        if not self.context.available:
+            self._send_error(503, "GDAL is not installed on the server")
+            return None
+        return request
+
+    async def _run_timed(
+        self,
+        operation: str,
+        func: Callable[[], ProcessingOutput],
+    ) -> ProcessingOutput:
+        """Run a GDAL operation in the executor, timing queueing and execution."""
+        submitted = time.monotonic()
+
+        def timed() -> ProcessingOutput:
+            started = time.monotonic()
+            metrics.QUEUE_WAIT.observe(started - submitted)
+            try:
+                return func()
+            finally:
+                metrics.GDAL_DURATION.labels(operation).observe(
+                    time.monotonic() - started,
+                )
+
+        return await tornado.ioloop.IOLoop.current().run_in_executor(None, timed)
+
+    def _accepted_formats(self) -> tuple[str, ...]:
+        """The binary output formats the client advertises, preferred first."""
+        return accepted_output_formats(self.request.headers.get("Accept", ""))
+
+    def _wants_stream(self) -> bool:
+        """Whether the client asked for the raw output instead of JSON."""
+        accept = self.request.headers.get("Accept", "")
+        media_types = {
+            item.partition(";")[0].strip().lower() for item in accept.split(",")
+        }
+        return "application/octet-stream" in media_types or bool(
+            self._accepted_formats(),
+        )
+
+    async def _send_output(self, output: ProcessingOutput) -> None:
+        """Send the output as requested by the client: raw or wrapped in JSON."""
+        if self.context.cache is not None:
+            self.set_header("X-JupyterGIS-Cache", "HIT" if output.cached else "MISS")
+        if self._wants_stream():
+            await self._stream_output(output)
+            return
+        (
+            result_content,
+            result_format,
+        ) = await tornado.ioloop.IOLoop.current().run_in_executor(None, output.read)
+        self.finish(json.dumps({"result": result_content, "format": result_format}))
+
+    async def _stream_output(self, output: ProcessingOutput) -> None:
+        """Send the output file as the response body, one block at a time."""
+        self.set_header("Content-Type", output.media_type)
+        self.set_header("Content-Length", str(output.size))
+        self.set_header(
+            "Content-Disposition",
+            f"attachment; filename*=UTF-8''{quote(output.name)}",
+        )
+        try:
+            for chunk in output.iter_chunks():
+                self.write(chunk)
+                await self.flush()
+        except StreamClosedError:
+            logger.debug("Client went away while receiving %s", output.name)
+            return
+        await self.finish(set_content_type=output.media_type)
+
     @tornado.web.authenticated
     async def get(self):
         """Return GDAL availability status."""
-        available = gdal_available()
+        available = self.context.available
         version = None
         if available:
-            try:
-                result = await tornado.ioloop.IOLoop.current().run_in_executor(
-                    None,
-                    lambda: subprocess.run(
-                        ["ogr2ogr", "--version"],
-                        capture_output=True,
-                        text=True,
-                        timeout=5,
-                        check=False,
-                    ),
-                )
-                version = result.stdout.strip()
-            except (subprocess.SubprocessError, OSError) as e:
-                logger.warning("Failed to read GDAL version: %s", e)
+            version = await tornado.ioloop.IOLoop.current().run_in_executor(
+                None,
+                self.context.version,
+            )
 
         self.finish(json.dumps({"available": available, "version": version}))
 
@@ -397,134 +1574,434 @@ class ProcessingHandler(APIHandler):
             "outputName": "output.geojson"
         }
 
+        Instead of "geojson", the input can be a remote "url" or a "source"
+        already on the server: {"path": "<path below the server root>"} or
+        {"document": "<.jGIS path>", "sourceId": "<source id>"}.
+
         Returns:
         {
             "result": "<output content>",
             "format": "text" | "base64"
         }
 
+        or, when the request has ``Accept: application/octet-stream``, the
+        output file itself, streamed with its media type as Content-Type.
+
+        "outputFormat" ("FlatGeobuf", "GeoParquet", "COG" or "GeoJSON")
+        switches the driver of the output. Without it, a GeoJSON or GeoTIFF
+        output is written as FlatGeobuf, GeoParquet or COG instead when the
+        Accept header lists ``application/flatgeobuf``,
+        ``application/vnd.apache.parquet`` or ``image/tiff;
+        profile=cloud-optimized`` and GDAL has the driver; the response is
+        then the streamed file.
+
         """
-        try:
-            body = json.loads(self.request.body)
-        except json.JSONDecodeError:
-            self.set_status(400)
-            self.finish(json.dumps({"error": "Invalid JSON body"}))
+        request = self._parse_request()
+        if request is None:
             return
 
-        operation = body.get("operation")
-        options = body.get("options", [])
-        geojson = body.get("geojson")
-        url = body.get("url")
-        cutline_geojson = body.get("cutlineGeojson")
-        output_name = body.get("outputName", "output.geojson")
+        output = await self._run_request(request)
+        if output is None:
+            return
+        try:
+            await self._send_output(output)
+        finally:
+            output.close()
 
-        if operation not in ALLOWED_OPERATIONS:
-            self.set_status(400)
-            self.finish(
-                json.dumps(
-                    {
-                        "error": f"Unsupported operation: {operation}. "
-                        f"Allowed: {sorted(ALLOWED_OPERATIONS)}",
-                    },
-                ),
+    async def _run_request(self, request: ProcessingRequest) -> ProcessingOutput | None:
+        """Run a request; answers the client and returns None if it failed.
+
+        The output format is negotiated from the Accept header, unless the
+        request names one.
+        """
+        self.set_header("Vary", "Accept")
+        request = replace(request, accepted_formats=self._accepted_formats())
+        try:
+            return await self._run_timed(
+                request.operation,
+                lambda: self.context.run(request),
             )
+        except subprocess.CalledProcessError as e:
+            logger.error("GDAL %s failed: %s", request.operation, e.stderr)
+            self._send_error(*describe_error(e))
+        except (subprocess.TimeoutExpired, SourceError) as e:
+            self._send_error(*describe_error(e))
+        except Exception as e:
+            logger.exception("Processing error")
+            self._send_error(*describe_error(e))
+        return None
+
+
+class ProcessingPipelineHandler(ProcessingHandler):
+    """Run a chain of steps on one input and return only the final result.
+
+    POST — takes the body of a synchronous processing request plus
+           "steps", the processing operations (e.g. buffer, then dissolve)
+           or SQL statements to apply in order before the operation. The
+           steps run as stages of a single GDAL invocation, so no
+           intermediate result is sent back to the browser or written to
+           disk. Jobs and uploads accept "steps" too.
+    """
+
+    SUPPORTED_METHODS = ("POST",)
+    metrics_endpoint = "processing_pipeline"
+
+    def _parse_request(
+        self,
+        data: bytes | str | None = None,
+        input_path: str | None = None,
+    ) -> ProcessingRequest | None:
+        request = super()._parse_request(data, input_path)
+        if request is not None and not request.steps:
+            self._send_error(400, "Missing 'steps' field")
+            return None
+        return request
+
+
+class ProcessingJobsHandler(ProcessingHandler):
+    """Submit and list asynchronous processing jobs.
+
+    POST — queues the operation described by the same body as a
+           synchronous processing request and returns the new job.
+    GET  — lists the current user's jobs.
+    """
+
+    SUPPORTED_METHODS = ("GET", "POST")
+    metrics_endpoint = "processing_jobs"
+
+    @tornado.web.authenticated
+    def get(self) -> None:
+        """Return the current user's jobs."""
+        jobs = self.context.jobs.jobs(self._username())
+        self.finish(json.dumps({"jobs": [job.to_json() for job in jobs]}))
+
+    @tornado.web.authenticated
+    def post(self) -> None:
+        """Queue a processing job and return it with status 202."""
+        request = self._parse_request()
+        if request is None:
             return
+        self._submit_job(request, self.request.path)
 
-        if geojson and url:
-            self.set_status(400)
-            self.finish(
-                json.dumps({"error": "Provide either 'geojson' or 'url', not both"}),
+    def _submit_job(
+        self,
+        request: ProcessingRequest,
+        jobs_path: str,
+        cleanup: Callable[[], None] | None = None,
+    ) -> bool:
+        """Queue a request and answer with the new job, or with 429.
+
+        Returns whether the job was queued; ``cleanup`` is only owned by the
+        job if it was.
+        """
+        try:
+            job = self.context.jobs.submit(
+                self._username(),
+                request.operation,
+                lambda progress: self.context.run(request, progress),
+                cleanup=cleanup,
             )
+        except JobLimitError as e:
+            self._send_error(429, str(e))
+            return False
+
+        self.set_status(202)
+        self.set_header("Location", url_path_join(jobs_path, job.id))
+        self.finish(json.dumps(job.to_json()))
+        return True
+
+    def _username(self) -> str:
+        user = self.current_user
+        return getattr(user, "username", user)
+
+    def _get_job(self, job_id: str) -> Job | None:
+        """Look up a job of the current user; answers 404 if there is none."""
+        job = self.context.jobs.get(job_id, self._username())
+        if job is None:
+            self._send_error(404, f"Unknown processing job: {job_id}")
+        return job
+
+
+class ProcessingJobHandler(ProcessingJobsHandler):
+    """Follow or cancel one processing job.
+
+    GET    — returns the job state; with ``Accept: text/event-stream``,
+             streams it as server-sent events until the job has finished.
+    DELETE — cancels the job, or discards it and its output once finished.
+    """
+
+    SUPPORTED_METHODS = ("GET", "DELETE")
+
+    @tornado.web.authenticated
+    async def get(self, job_id: str) -> None:
+        """Return the state of a job."""
+        job = self._get_job(job_id)
+        if job is None:
+            return
+        if "text/event-stream" in self.request.headers.get("Accept", ""):
+            await self._stream_events(job)
             return
+        self.finish(json.dumps(job.to_json()))
 
-        if not geojson and not url:
-            self.set_status(400)
-            self.finish(json.dumps({"error": "Missing 'geojson' or 'url' field"}))
+    @tornado.web.authenticated
+    def delete(self, job_id: str) -> None:
+        """Cancel a job, or remove it if it has finished."""
+        job = self._get_job(job_id)
+        if job is None:
+            return
+        if job.status in FINISHED:
+            self.context.jobs.remove(job)
+        else:
+            self.context.jobs.cancel(job)
+        self.finish(json.dumps(job.to_json()))
+
+    async def _stream_events(self, job: Job) -> None:
+        """Send the job state whenever it changes, until the job has finished."""
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        sent = None
+        try:
+            while True:
+                state = job.to_json()
+                if state != sent:
+                    self.write(f"data: {json.dumps(state)}\n\n")
+                    await self.flush()
+                    sent = state
+                if job.status in FINISHED:
+                    break
+                await asyncio.sleep(PROGRESS_INTERVAL)
+        except StreamClosedError:
             return
+        await self.finish(set_content_type="text/event-stream")
 
-        if url is not None and not isinstance(url, str):
-            self.set_status(400)
-            self.finish(json.dumps({"error": "'url' must be a string"}))
+
+class ProcessingJobResultHandler(ProcessingJobsHandler):
+    """Fetch the output of a finished job, as for a synchronous request."""
+
+    SUPPORTED_METHODS = ("GET",)
+
+    @tornado.web.authenticated
+    async def get(self, job_id: str) -> None:
+        """Return the job output, raw or wrapped in JSON."""
+        job = self._get_job(job_id)
+        if job is None:
             return
+        if job.status not in FINISHED:
+            self._send_error(409, "Processing job has not finished")
+        elif job.status != SUCCEEDED:
+            self._send_error(job.error_code or 409, job.error or f"Job {job.status}")
+        else:
+            await self._send_output(job.output)
+
+
+# Media types accepted by ``ProcessingUploadHandler`` -> extension of the
+# spooled file, from which GDAL picks the driver.
+UPLOAD_EXTENSIONS = {
+    "application/geo+json": ".geojson",
+    "application/json": ".geojson",
+    "application/geo+json-seq": ".geojsonl",
+    "application/x-ndjson": ".geojsonl",
+    "application/flatgeobuf": ".fgb",
+    "application/x-flatgeobuf": ".fgb",
+    "application/geopackage+sqlite3": ".gpkg",
+    "application/vnd.apache.parquet": ".parquet",
+    "image/tiff": ".tif",
+}
+
+
+@tornado.web.stream_request_body
+class ProcessingUploadHandler(ProcessingJobsHandler):
+    """Run a processing operation on a dataset sent as the request body.
+
+    POST — the body is the input dataset, of one of the
+           ``UPLOAD_EXTENSIONS`` media types. It is written to disk as it
+           arrives, so layers of several gigabytes are processed with
+           bounded memory, up to ``JGIS_PROCESSING_MAX_UPLOAD_SIZE`` bytes.
+           The ``request`` query argument holds the JSON description of the
+           operation without ``geojson`` or ``url``; GDAL sees the dataset
+           as ``data``. The response is that of a synchronous processing
+           request, or with ``job=1`` that of a job submission.
+    """
 
-        if cutline_geojson is not None and not isinstance(cutline_geojson, str):
-            self.set_status(400)
-            self.finish(
-                json.dumps({"error": "'cutlineGeojson' must be a string"}),
-            )
+    SUPPORTED_METHODS = ("POST",)
+    metrics_endpoint = "processing_upload"
+
+    def initialize(self, context: ProcessingContext) -> None:
+        """Receive the shared processing state."""
+        super().initialize(context)
+        self._input_dir: tempfile.TemporaryDirectory | None = None
+        self._input: BinaryIO | None = None
+        self._processing_request: ProcessingRequest | None = None
+        self._digest = hashlib.sha256()
+
+    async def prepare(self) -> None:
+        """Validate the request before the body is received."""
+        await super().prepare()
+        if self.current_user is None:
+            raise tornado.web.HTTPError(403)
+        self.request.connection.set_max_body_size(self.context.config.max_upload_size)
+
+        content_type = self.request.headers.get("Content-Type", "")
+        content_type = content_type.partition(";")[0].strip().lower()
+        extension = UPLOAD_EXTENSIONS.get(content_type)
+        if extension is None:
+            self._send_error(415, f"Unsupported upload type: {content_type!r}")
+            return
+        description = self.get_query_argument("request", None)
+        if description is None:
+            self._send_error(400, "Missing 'request' query argument")
             return
 
-        # A cutline only makes sense alongside a raster URL (gdalwarp -cutline).
-        if cutline_geojson and not url:
-            self.set_status(400)
-            self.finish(
-                json.dumps(
-                    {"error": "'cutlineGeojson' requires a raster 'url'"},
-                ),
-            )
+        self._input_dir = tempfile.TemporaryDirectory()
+        input_path = Path(self._input_dir.name, f"data{extension}")
+        self._processing_request = self._parse_request(description, str(input_path))
+        if self._processing_request is None:
             return
+        # Creating the empty file does not block for long.
+        self._input = input_path.open("wb")  # noqa: ASYNC230
 
-        if not gdal_available():
-            self.set_status(503)
-            self.finish(
-                json.dumps({"error": "GDAL CLI tools are not installed on the server"}),
-            )
+    def data_received(self, chunk: bytes) -> None:
+        """Append a chunk of the body to the spooled dataset."""
+        if self._input is None:
             return
+        self._input.write(chunk)
+        self._digest.update(chunk)
 
-        if not isinstance(options, list) or not all(
-            isinstance(o, str) for o in options
-        ):
-            self.set_status(400)
-            self.finish(json.dumps({"error": "'options' must be a list of strings"}))
+    @tornado.web.authenticated
+    async def post(self) -> None:
+        """Run the operation on the uploaded dataset."""
+        request = self._processing_request
+        self._input.close()
+        self._input = None
+        input_dir, self._input_dir = self._input_dir, None
+        extension = Path(request.input_path).suffix
+        request.input_digest = f"{extension}:{self._digest.hexdigest()}"
+
+        if self.get_query_argument("job", "") in {"1", "true"}:
+            jobs_path = url_path_join(self.request.path.rpartition("/")[0], "jobs")
+            if not self._submit_job(request, jobs_path, cleanup=input_dir.cleanup):
+                input_dir.cleanup()
             return
 
         try:
-            if url and cutline_geojson:
-                (
-                    result_content,
-                    result_format,
-                ) = await tornado.ioloop.IOLoop.current().run_in_executor(
-                    None,
-                    lambda: run_gdal_url_with_cutline(
-                        operation,
-                        options,
-                        url,
-                        cutline_geojson,
-                        output_name,
-                    ),
-                )
-            elif url:
-                (
-                    result_content,
-                    result_format,
-                ) = await tornado.ioloop.IOLoop.current().run_in_executor(
-                    None,
-                    lambda: run_gdal_url(operation, options, url, output_name),
-                )
-            else:
-                (
-                    result_content,
-                    result_format,
-                ) = await tornado.ioloop.IOLoop.current().run_in_executor(
-                    None,
-                    lambda: run_gdal(operation, options, geojson, output_name),
-                )
-        except subprocess.TimeoutExpired:
-            self.set_status(504)
-            self.finish(json.dumps({"error": "GDAL operation timed out"}))
+            output = await self._run_request(request)
+        finally:
+            input_dir.cleanup()
+        if output is None:
             return
-        except subprocess.CalledProcessError as e:
-            logger.error("GDAL %s failed: %s", operation, e.stderr)
-            self.set_status(500)
-            self.finish(json.dumps({"error": f"GDAL error: {e.stderr.strip()}"}))
+        try:
+            await self._send_output(output)
+        finally:
+            output.close()
+
+    def on_finish(self) -> None:
+        """Record the request and delete the dataset unless a job owns it."""
+        super().on_finish()
+        self._discard_input()
+
+    def on_connection_close(self) -> None:
+        """Delete the partial dataset of an interrupted upload."""
+        super().on_connection_close()
+        self._discard_input()
+
+    def _discard_input(self) -> None:
+        if self._input is not None:
+            self._input.close()
+            self._input = None
+        if self._input_dir is not None:
+            self._input_dir.cleanup()
+            self._input_dir = None
+
+
+def _locate_file(root_dir: str, path: str) -> tuple[str, int]:
+    """Return the absolute path and the size of a file below ``root_dir``."""
+    resolved = resolve_path(root_dir, path)
+    return resolved, Path(resolved).stat().st_size
+
+
+def _iter_file(
+    path: str,
+    start: int,
+    length: int,
+    chunk_size: int = 64 * 1024,
+) -> Iterator[bytes]:
+    """Read ``length`` bytes of a file from ``start``, in blocks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0 and (chunk := f.read(min(length, chunk_size))):
+            length -= len(chunk)
+            yield chunk
+
+
+class BlobHandler(APIHandler):
+    """Serve the blobs holding the data of sources, as stored.
+
+    Blobs are gzip-compressed GeoJSON named by the digest of their content,
+    so they are sent with ``Content-Encoding: gzip`` and cached for good.
+    A single ``bytes=start-end`` range of the stored file is answered with
+    a 206; other range forms get the whole blob.
+    """
+
+    def initialize(self, root_dir: str) -> None:
+        self.root_dir = root_dir
+
+    @tornado.web.authenticated
+    async def get(self, path: str) -> None:
+        """Return the blob at ``path``, below the server root."""
+        if not is_blob_path(path):
+            raise tornado.web.HTTPError(404)
+        try:
+            resolved, size = await tornado.ioloop.IOLoop.current().run_in_executor(
+                None,
+                _locate_file,
+                self.root_dir,
+                path,
+            )
+        except SourceError as e:
+            raise tornado.web.HTTPError(e.status) from None
+        etag = f'"{Path(resolved).name.split(".")[0]}"'
+        self.set_header("ETag", etag)
+        self.set_header("Cache-Control", "private, max-age=31536000, immutable")
+        if self.request.headers.get("If-None-Match") == etag:
+            self.set_status(304)
+            self.finish()
             return
-        except Exception as e:
-            logger.exception("Processing error")
-            self.set_status(500)
-            self.finish(json.dumps({"error": str(e)}))
+
+        start, end = 0, size - 1
+        byte_range = parse_byte_range(self.request.headers.get("Range", ""))
+        if byte_range is not None:
+            if byte_range[0] >= size:
+                self.set_status(416)
+                self.set_header("Content-Range", f"bytes */{size}")
+                self.finish()
+                return
+            start, end = byte_range[0], min(byte_range[1], size - 1)
+            self.set_status(206)
+            self.set_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.set_header("Accept-Ranges", "bytes")
+        self.set_header("Content-Type", "application/geo+json")
+        self.set_header("Content-Encoding", "gzip")
+        self.set_header("Content-Length", str(end - start + 1))
+        try:
+            for chunk in _iter_file(resolved, start, end - start + 1):
+                self.write(chunk)
+                await self.flush()
+        except StreamClosedError:
+            logger.debug("Client went away while receiving %s", path)
             return
+        await self.finish(set_content_type="application/geo+json")
 
-        self.finish(json.dumps({"result": result_content, "format": result_format}))
+
+class MetricsHandler(APIHandler):
+    """Serve the JupyterGIS metrics in the Prometheus text format."""
+
+    @tornado.web.authenticated
+    def get(self) -> None:
+        """Return the current metrics."""
+        self.finish(
+            generate_latest(metrics.REGISTRY),
+            set_content_type=CONTENT_TYPE_LATEST,
+        )
 
 
 def setup_handlers(web_app: Any) -> None:
@@ -543,9 +2020,60 @@ def setup_handlers(web_app: Any) -> None:
     # Configure processing route
     processing_route = url_path_join(base_url, "jupytergis_core", "processing")
 
+    # Configure processing job routes
+    processing_jobs_route = url_path_join(processing_route, "jobs")
+    processing_job_route = url_path_join(processing_jobs_route, "([0-9a-f]+)")
+    processing_job_result_route = url_path_join(processing_job_route, "result")
+    processing_upload_route = url_path_join(processing_route, "upload")
+    processing_pipeline_route = url_path_join(processing_route, "pipeline")
+
+    # Configure blob route
+    blob_route = url_path_join(base_url, "jupytergis_core", "blobs", "(.+)")
+
+    # Configure metrics route
+    metrics_route = url_path_join(base_url, "jupytergis_core", "metrics")
+
+    # Configuration is read once; the upstream client is shared by all requests.
+    proxy_context = ProxyContext(load_config())
+    web_app.settings["jupytergis_proxy_context"] = proxy_context
+    metrics.register_proxy_context(proxy_context)
+    processing_context = ProcessingContext(
+        load_processing_config(),
+        root_dir=web_app.settings.get("server_root_dir"),
+    )
+    web_app.settings["jupytergis_processing_context"] = processing_context
+    metrics.register_processing_context(processing_context)
+
     handlers = [
-        (proxy_route, ProxyHandler),
-        (processing_route, ProcessingHandler),
+        (proxy_route, ProxyHandler, {"context": proxy_context}),
+        (processing_route, ProcessingHandler, {"context": processing_context}),
+        (
+            processing_pipeline_route,
+            ProcessingPipelineHandler,
+            {"context": processing_context},
+        ),
+        (
+            processing_jobs_route,
+            ProcessingJobsHandler,
+            {"context": processing_context},
+        ),
+        (
+            processing_job_route,
+            ProcessingJobHandler,
+            {"context": processing_context},
+        ),
+        (
+            processing_job_result_route,
+            ProcessingJobResultHandler,
+            {"context": processing_context},
+        ),
+        (
+            processing_upload_route,
+            ProcessingUploadHandler,
+            {"context": processing_context},
+        ),
+        (blob_route, BlobHandler, {"root_dir": processing_context.root_dir}),
+        (metrics_route, MetricsHandler),
     ]
 
     # Add feature flags
@@ -556,3 +2084,19 @@ def setup_handlers(web_app: Any) -> None:
     web_app.add_handlers(host_pattern, handlers)
     logger.info("JupyterGIS proxy endpoint initialized at: %s", proxy_route)
     logger.info("JupyterGIS processing endpoint initialized at: %s", processing_route)
+
+
+def teardown_handlers(web_app: Any) -> None:
+    """Release what ``setup_handlers`` started.
+
+    Stops the GDAL worker processes and the jobs, and closes the pooled
+    upstream connections. Calling it again does nothing.
+
+    Args:
+        web_app: The Jupyter web application instance
+
+    """
+    for key in ("jupytergis_proxy_context", "jupytergis_processing_context"):
+        context = web_app.settings.pop(key, None)
+        if context is not None:
+            context.close()
@@ -1,13 +1,110 @@
+import base64
+import hashlib
 import json
+import zlib
 from collections.abc import Callable
+from difflib import SequenceMatcher
 from functools import partial
 from typing import Any
 
 from jupyter_ydoc.ybasedoc import YBaseDoc
-from pycrdt import Array, Map
+from pycrdt import Array, Map, MapEvent, TransactionEvent
 
+from .jgisz import (
+    JGISArchive,
+    encode_member,
+    section_member,
+    source_member,
+    write_archive,
+)
 from .migrations import migrate
 from .schema import SCHEMA_VERSION
+from .ydoc_store import get_store
+
+
+def _dump_section(value: Any) -> str:
+    """Serialize a top-level entry as ``json.dumps`` indents it in the document."""
+    return json.dumps(value, sort_keys=True, indent=2).replace("\n", "\n  ")
+
+
+def _same(current: Any, new: Any) -> bool:
+    """Whether a value read from a shared type equals a new JSON value.
+
+    Numbers read back as floats, so ``1`` and ``1.0`` are the same, but
+    booleans differ from numbers.
+    """
+    if isinstance(current, dict):
+        return (
+            isinstance(new, dict)
+            and current.keys() == new.keys()
+            and all(_same(current[key], new[key]) for key in current)
+        )
+    if isinstance(current, list):
+        return (
+            isinstance(new, list)
+            and len(current) == len(new)
+            and all(_same(c, n) for c, n in zip(current, new, strict=True))
+        )
+    if isinstance(current, bool) or isinstance(new, bool):
+        return current is new
+    if isinstance(current, (int, float)) and isinstance(new, (int, float)):
+        return current == new
+    return type(current) is type(new) and current == new
+
+
+def _item_key(value: Any) -> str:
+    """A hashable key of an array item, equal for items ``_same`` matches."""
+
+    def normalize(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [normalize(item) for item in value]
+        if isinstance(value, int) and not isinstance(value, bool):
+            return float(value)
+        return value
+
+    return json.dumps(normalize(value), sort_keys=True)
+
+
+# Stands for an entry absent from a map, whose values can be None.
+_MISSING = object()
+
+
+def _sync_map(ymap: Map, new: dict[str, Any]) -> None:
+    """Turn ``ymap`` into ``new``, only writing the entries that differ."""
+    for key in [key for key in ymap if key not in new]:
+        del ymap[key]
+    for key, value in new.items():
+        _sync_entry(ymap, key, value)
+
+
+def _sync_entry(ymap: Map, key: str, value: Any) -> None:
+    """Turn the entry ``key`` of ``ymap`` into ``value``."""
+    current = ymap.get(key) if key in ymap else _MISSING
+    if isinstance(current, Map) and isinstance(value, dict):
+        _sync_map(current, value)
+    elif isinstance(current, Array) and isinstance(value, list):
+        _sync_array(current, value)
+    elif current is _MISSING or not _same(
+        current.to_py() if isinstance(current, Map | Array) else current,
+        value,
+    ):
+        ymap[key] = value
+
+
+def _sync_array(yarray: Array, new: list[Any]) -> None:
+    """Turn ``yarray`` into ``new`` with the fewest insertions and deletions."""
+    current = [_item_key(item) for item in yarray.to_py()]
+    matcher = SequenceMatcher(None, current, [_item_key(item) for item in new], False)
+    # From the end, so that earlier indices stay valid.
+    for tag, start, end, new_start, new_end in reversed(matcher.get_opcodes()):
+        if tag == "equal":
+            continue
+        if end > start:
+            del yarray[start:end]
+        for offset, item in enumerate(new[new_start:new_end]):
+            yarray.insert(start + offset, item)
 
 
 class YJGIS(YBaseDoc):
@@ -22,76 +119,172 @@ class YJGIS(YBaseDoc):
         self._ydoc["annotations"] = self._yannotations = Map()
         self._ydoc["presets"] = self._ypresets = Map()
         self._ydoc["metadata"] = self._ymetadata = Map()
+        # Serialized sections, dropped whenever their shared type changes so
+        # that saving only re-encodes what changed since the last save.
+        self._fragments: dict[str, str] = {}
+        self._fragment_subscriptions = [
+            ytype.observe_deep(partial(self._invalidate, name))
+            for name, ytype in self._sections().items()
+        ]
+        # Hash of the content the document was last loaded from or saved as,
+        # dropped whenever a section changes.
+        self._content_hash: str | None = None
+        # Persists the CRDT state between rooms, when enabled.
+        self._store = get_store()
+        self._logging = True
+        # Whether the store holds a state of this room, which updates extend.
+        self._stored = False
+        # Updates made since the last save, handed to the store when saving.
+        self._unsaved: list[bytes] = []
+        # The path of the document, which logging cannot read from the state
+        # while a transaction commits.
+        self._store_path: str | None = None
+        if self._store is not None:
+            self._store_subscriptions = [
+                self._ystate.observe(self._track_path),
+                self._ydoc.observe(self._log_update),
+            ]
 
     @property
     def version(self) -> str:
         return SCHEMA_VERSION
 
+    def _sections(self) -> dict[str, Map | Array]:
+        """The shared types holding the document, by their key in the file."""
+        return {
+            "layers": self._ylayers,
+            "sources": self._ysources,
+            "stories": self._ystories,
+            "viewState": self._yviewState,
+            "options": self._yoptions,
+            "layerTree": self._ylayerTree,
+            "annotations": self._yannotations,
+            "presets": self._ypresets,
+            "metadata": self._ymetadata,
+        }
+
+    def _invalidate(self, name: str, _events: Any) -> None:
+        self._fragments.pop(name, None)
+        self._content_hash = None
+
     def get(self) -> str:
         """Returns the content of the document.
+
+        The same as dumping the whole document with ``sort_keys=True`` and
+        ``indent=2``, but sections unchanged since the previous call reuse
+        their serialization.
+
         :return: Document's content.
         :rtype: Any
         """
-        layers = self._ylayers.to_py()
-        sources = self._ysources.to_py()
-        stories = self._ystories.to_py()
-        viewState = self._yviewState.to_py()
-        options = self._yoptions.to_py()
-        annotations = self._yannotations.to_py()
-        presets = self._ypresets.to_py()
-        meta = self._ymetadata.to_py()
-        layers_tree = self._ylayerTree.to_py()
-        return json.dumps(
-            dict(
-                schemaVersion=SCHEMA_VERSION,
-                layers=layers,
-                sources=sources,
-                stories=stories,
-                viewState=viewState,
-                options=options,
-                layerTree=layers_tree,
-                annotations=annotations,
-                presets=presets,
-                metadata=meta,
-            ),
-            sort_keys=True,
-            indent=2,
+        content = self._dump()
+        if self._store is not None and self._store_path:
+            content_hash = self._content_key(content)
+            if not self._stored:
+                self._reset_store(content_hash)
+            else:
+                if self._unsaved:
+                    self._store.append(self._store_path, self._unsaved)
+                    self._unsaved = []
+                if content_hash != self._content_hash:
+                    # The content is about to be saved as the state logged so far.
+                    self._store.saved(self._store_path, content_hash)
+            self._content_hash = content_hash
+        return content
+
+    def _dump(self) -> str:
+        """Serialize the document."""
+        parts = {"schemaVersion": json.dumps(SCHEMA_VERSION)}
+        for name, ytype in self._sections().items():
+            fragment = self._fragments.get(name)
+            if fragment is None:
+                fragment = self._fragments[name] = _dump_section(ytype.to_py())
+            parts[name] = fragment
+        entries = ",\n".join(
+            f"  {json.dumps(name)}: {parts[name]}" for name in sorted(parts)
         )
+        return f"{{\n{entries}\n}}"
 
     def set(self, value: str) -> None:
         """Sets the content of the document.
+
+        Only the entries that differ from the current content are written:
+        a layer, source or layer tree node edited outside of the room
+        produces an update of that entry alone, which is all connected
+        clients receive and re-render.
+
+        When the document store is enabled and holds the state this content
+        was saved from, a new room loads that state instead of parsing the
+        content.
+
         :param value: The content of the document.
         :type value: Any
         """
-        valueDict = migrate(json.loads(value))
-
-        with self._ydoc.transaction():
-            self._ylayers.clear()
-            self._ylayers.update(valueDict.get("layers", {}))
+        content_hash = self._content_key(value)
+        if content_hash == self._content_hash:
+            # Loaded or saved as this content, and not changed since.
+            return
+        if not self._restore(content_hash):
+            self._logging = False
+            try:
+                self._load(value)
+            finally:
+                self._logging = True
+            if self._store is not None and self._store_path:
+                self._reset_store(content_hash)
+        self._content_hash = content_hash
 
-            self._ysources.clear()
-            self._ysources.update(valueDict.get("sources", {}))
+    def _load(self, value: str) -> None:
+        """Turn the shared types into the content of a file."""
+        self._sync(migrate(json.loads(value)))
 
-            self._ystories.clear()
-            self._ystories.update(valueDict.get("stories", {}))
+    def _content_key(self, value: str) -> str:
+        """Identify the content of a file."""
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
 
-            self._yviewState.clear()
-            self._yviewState.update(valueDict.get("viewState", {}))
+    def _restore(self, content_hash: str) -> bool:
+        """Load the stored state this content was saved from, into a new room."""
+        if self._store is None or not self._store_path:
+            return False
+        if any(len(ytype) for ytype in self._sections().values()):
+            # Merging another history into a loaded document would duplicate
+            # the items of its arrays.
+            return False
+        state = self._store.load(self._store_path, content_hash)
+        if state is None:
+            return False
+        self._logging = False
+        try:
+            self._ydoc.apply_update(state)
+        finally:
+            self._logging = True
+        self._stored = True
+        return True
 
-            self._yoptions.clear()
-            self._yoptions.update(valueDict.get("options", {}))
+    def _reset_store(self, content_hash: str) -> None:
+        """Store the whole state of the room as that of this content."""
+        self._store.reset(self._store_path, content_hash, self._ydoc.get_update())
+        self._stored = True
+        self._unsaved = []
 
-            self._ylayerTree.clear()
-            self._ylayerTree.extend(valueDict.get("layerTree", []))
+    def _track_path(self, event: MapEvent) -> None:
+        change = event.keys.get("path")
+        if change is not None:
+            self._store_path = change.get("newValue")
 
-            self._yannotations.clear()
-            self._yannotations.update(valueDict.get("annotations", {}))
+    def _log_update(self, event: TransactionEvent) -> None:
+        # Only buffered here: the store writes them when the document is saved.
+        if self._logging and self._store_path:
+            self._unsaved.append(event.update)
 
-            self._ypresets.clear()
-            self._ypresets.update(valueDict.get("presets", {}))
-
-            self._ymetadata.clear()
-            self._ymetadata.update(valueDict.get("metadata", {}))
+    def _sync(self, content: dict[str, Any]) -> None:
+        """Turn the shared types into ``content``, in one transaction."""
+        with self._ydoc.transaction():
+            for name, ytype in self._sections().items():
+                if isinstance(ytype, Array):
+                    _sync_array(ytype, content.get(name, []))
+                else:
+                    _sync_map(ytype, content.get(name, {}))
 
     def observe(self, callback: Callable[[str, Any], None]):
         self.unobserve()
@@ -125,3 +318,101 @@ class YJGIS(YBaseDoc):
         self._subscriptions[self._ymetadata] = self._ymetadata.observe_deep(
             partial(callback, "meta"),
         )
+
+
+class YJGISZ(YJGIS):
+    """A JupyterGIS document in the binary ``.jgisz`` format.
+
+    The content is exchanged base64-encoded, as for other binary documents.
+    Saving only re-encodes the sections and sources that changed since the
+    previous save or load, and loading only decodes the members whose CRC
+    differs from the one they had then.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Serialized members with their CRC, dropped whenever what they hold
+        # changes; set before the base class starts observing the sections.
+        self._members: dict[str, tuple[bytes, int]] = {}
+        super().__init__(*args, **kwargs)
+
+    def _invalidate(self, name: str, events: Any) -> None:
+        super()._invalidate(name, events)
+        if name != "sources":
+            self._members.pop(section_member(name), None)
+            return
+        for event in events:
+            # A change inside a source, or sources added, replaced or removed.
+            source_ids = event.path[:1] or getattr(event, "keys", {})
+            for source_id in source_ids:
+                self._members.pop(source_member(str(source_id)), None)
+
+    def _member(self, member: str, ytype: Any) -> bytes:
+        cached = self._members.get(member)
+        if cached is None:
+            data = encode_member(
+                ytype.to_py() if isinstance(ytype, Map | Array) else ytype,
+            )
+            cached = self._members[member] = (data, zlib.crc32(data))
+        return cached[0]
+
+    def _unchanged(self, archive: JGISArchive, member: str) -> bool:
+        cached = self._members.get(member)
+        return cached is not None and cached[1] == archive.crc(member)
+
+    def _dump(self) -> str:
+        """Serialize the document as a base64-encoded archive."""
+        members = {}
+        for name, ytype in self._sections().items():
+            if name == "sources":
+                for source_id, source in ytype.items():
+                    member = source_member(source_id)
+                    members[member] = self._member(member, source)
+            else:
+                member = section_member(name)
+                members[member] = self._member(member, ytype)
+        archive = write_archive(SCHEMA_VERSION, members)
+        return base64.b64encode(archive).decode("ascii")
+
+    def _content_key(self, value: str) -> str:
+        # Whatever line breaks the base64 encoding has.
+        return hashlib.sha256(base64.b64decode(value)).hexdigest()
+
+    def _load(self, value: str) -> None:
+        """Turn the shared types into a base64-encoded archive."""
+        data = base64.b64decode(value)
+        if not data:
+            # A new, empty file.
+            self._sync({})
+            return
+        archive = JGISArchive(data)
+        if archive.schema_version != SCHEMA_VERSION:
+            self._sync(migrate(archive.to_dict()))
+            return
+
+        loaded = []
+        with self._ydoc.transaction():
+            for name, ytype in self._sections().items():
+                if name == "sources":
+                    for source_id in [
+                        key for key in ytype if key not in archive.source_ids
+                    ]:
+                        del ytype[source_id]
+                    for source_id in archive.source_ids:
+                        member = source_member(source_id)
+                        if source_id in ytype and self._unchanged(archive, member):
+                            continue
+                        _sync_entry(ytype, source_id, archive.source(source_id))
+                        loaded.append(member)
+                    continue
+                member = section_member(name)
+                if self._unchanged(archive, member):
+                    continue
+                if isinstance(ytype, Array):
+                    _sync_array(ytype, archive.section(name, []))
+                else:
+                    _sync_map(ytype, archive.section(name, {}))
+                loaded.append(member)
+        # After the transaction, whose changes dropped the previous members.
+        for member in loaded:
+            if archive.crc(member) is not None:
+                self._members[member] = (archive.read(member), archive.crc(member))
@@ -0,0 +1,182 @@
+"""The ``.jgisz`` format: a ``.jGIS`` document in a compressed archive.
+
+A ``.jGIS`` file is a single pretty-printed JSON text, which has to be
+encoded and parsed whole on every save and load. A ``.jgisz`` file is a zip
+archive holding each top-level section of the document as a compact JSON
+member, and each source as a member of its own, all deflated. A section is
+only decoded when it is read, and a member whose CRC did not change since it
+was last loaded does not have to be decoded at all.
+
+Layout::
+
+    manifest.json           {"format": "jgisz", "version": 1, "schemaVersion": ...}
+    sections/<name>.json    every section but the sources
+    sources/<id>.json       one per source, the id percent-encoded
+"""
+
+import io
+import json
+import zipfile
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote, unquote
+
+FORMAT = "jgisz"
+
+# Version of the archive layout, independent of the schema version.
+FORMAT_VERSION = 1
+
+MANIFEST = "manifest.json"
+
+_SECTION_PREFIX = "sections/"
+_SOURCE_PREFIX = "sources/"
+_SUFFIX = ".json"
+
+# A fixed timestamp, so that the same document gives the same archive.
+_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def encode_member(value: Any) -> bytes:
+    """Serialize the value of a member."""
+    return json.dumps(
+        value,
+        separators=(",", ":"),
+        sort_keys=True,
+        ensure_ascii=False,
+    ).encode()
+
+
+def section_member(name: str) -> str:
+    """Return the name of the member holding a section."""
+    return f"{_SECTION_PREFIX}{name}{_SUFFIX}"
+
+
+def source_member(source_id: str) -> str:
+    """Return the name of the member holding a source."""
+    return f"{_SOURCE_PREFIX}{quote(source_id, safe='')}{_SUFFIX}"
+
+
+def write_archive(schema_version: str, members: dict[str, bytes]) -> bytes:
+    """Build an archive from the serialized members of a document."""
+    manifest = {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "schemaVersion": schema_version,
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in [
+            (MANIFEST, encode_member(manifest)),
+            *sorted(members.items()),
+        ]:
+            info = zipfile.ZipInfo(name, date_time=_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, data)
+    return buffer.getvalue()
+
+
+class JGISArchive:
+    """A ``.jgisz`` archive, decoding its members as they are read.
+
+    Args:
+        data: The content of the file
+
+    Raises:
+        ValueError: If ``data`` is not a ``.jgisz`` archive, or a newer
+            version of the format
+
+    """
+
+    def __init__(self, data: bytes) -> None:
+        try:
+            self._zip = zipfile.ZipFile(io.BytesIO(data))
+            manifest = json.loads(self._zip.read(MANIFEST))
+        except (zipfile.BadZipFile, KeyError, ValueError) as e:
+            raise ValueError(f"Not a {FORMAT} archive: {e}") from e
+        if not isinstance(manifest, dict) or manifest.get("format") != FORMAT:
+            raise ValueError(f"Not a {FORMAT} archive")
+        if manifest.get("version", 0) > FORMAT_VERSION:
+            raise ValueError(
+                f"Cannot read {FORMAT} version {manifest['version']} "
+                f"(current: {FORMAT_VERSION})",
+            )
+        self.schema_version: str = manifest.get("schemaVersion", "0.5.0")
+        names = self._zip.namelist()
+        self.sections = [
+            name[len(_SECTION_PREFIX) : -len(_SUFFIX)]
+            for name in names
+            if name.startswith(_SECTION_PREFIX) and name.endswith(_SUFFIX)
+        ]
+        self.source_ids = [
+            unquote(name[len(_SOURCE_PREFIX) : -len(_SUFFIX)])
+            for name in names
+            if name.startswith(_SOURCE_PREFIX) and name.endswith(_SUFFIX)
+        ]
+
+    def crc(self, member: str) -> int | None:
+        """Return the CRC of a member without decoding it, or None if absent."""
+        try:
+            return self._zip.getinfo(member).CRC
+        except KeyError:
+            return None
+
+    def read(self, member: str) -> bytes:
+        """Return the serialized value of a member."""
+        return self._zip.read(member)
+
+    def section(self, name: str, default: Any = None) -> Any:
+        """Decode a section; ``sources`` gathers the source members."""
+        if name == "sources":
+            return {source_id: self.source(source_id) for source_id in self.source_ids}
+        if name not in self.sections:
+            return default
+        return json.loads(self.read(section_member(name)))
+
+    def source(self, source_id: str) -> Any:
+        """Decode a source."""
+        return json.loads(self.read(source_member(source_id)))
+
+    def to_dict(self) -> dict[str, Any]:
+        """Decode the whole document, as a ``.jGIS`` file holds it."""
+        content = {name: self.section(name) for name in self.sections}
+        content["sources"] = self.section("sources")
+        content["schemaVersion"] = self.schema_version
+        return content
+
+
+def dumps(content: dict[str, Any]) -> bytes:
+    """Serialize a document, as a ``.jGIS`` file holds it, to an archive."""
+    members = {
+        section_member(name): encode_member(value)
+        for name, value in content.items()
+        if name not in {"schemaVersion", "sources"}
+    }
+    for source_id, source in (content.get("sources") or {}).items():
+        members[source_member(source_id)] = encode_member(source)
+    return write_archive(content.get("schemaVersion", "0.5.0"), members)
+
+
+def loads(data: bytes) -> dict[str, Any]:
+    """Deserialize an archive to a document, as a ``.jGIS`` file holds it."""
+    return JGISArchive(data).to_dict()
+
+
+def jgis_to_jgisz(path: str | Path, destination: str | Path | None = None) -> Path:
+    """Convert a ``.jGIS`` file to ``.jgisz``, by default beside it."""
+    path = Path(path)
+    destination = Path(destination or path.with_suffix(".jgisz"))
+    content = json.loads(path.read_text(encoding="utf-8"))
+    destination.write_bytes(dumps(content))
+    return destination
+
+
+def jgisz_to_jgis(path: str | Path, destination: str | Path | None = None) -> Path:
+    """Convert a ``.jgisz`` file to ``.jGIS``, by default beside it."""
+    path = Path(path)
+    destination = Path(destination or path.with_suffix(".jGIS"))
+    content = loads(path.read_bytes())
+    destination.write_text(
+        json.dumps(content, sort_keys=True, indent=2),
+        encoding="utf-8",
+    )
+    return destination
@@ -0,0 +1,176 @@
+"""Prometheus metrics for the proxy and processing endpoints.
+
+Metrics live in a dedicated registry served at ``/jupytergis_core/metrics``,
+separate from the Jupyter server's own ``/metrics``. Counters kept by the
+shared components (response and result caches, request coalescing) are
+read when the registry is scraped rather than tracked twice.
+"""
+
+from collections.abc import Iterator
+from typing import Any
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+REGISTRY = CollectorRegistry()
+
+# Bucket boundaries in bytes, from small tiles to large rasters.
+_SIZE_BUCKETS = tuple(4**n * 1024 for n in range(9))
+# GDAL operations take from milliseconds to many minutes.
+_GDAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+REQUESTS = Counter(
+    "jupytergis_requests",
+    "Requests handled, by endpoint and response status code.",
+    ["endpoint", "code"],
+    registry=REGISTRY,
+)
+REQUEST_DURATION = Histogram(
+    "jupytergis_request_duration_seconds",
+    "Time to handle a request, by endpoint.",
+    ["endpoint"],
+    registry=REGISTRY,
+)
+RESPONSE_SIZE = Histogram(
+    "jupytergis_proxy_response_size_bytes",
+    "Size of proxied response bodies sent to the client.",
+    buckets=_SIZE_BUCKETS,
+    registry=REGISTRY,
+)
+UPSTREAM_DURATION = Histogram(
+    "jupytergis_proxy_upstream_duration_seconds",
+    "Time from sending an upstream request until its body is received.",
+    registry=REGISTRY,
+)
+UPSTREAM_RESPONSES = Counter(
+    "jupytergis_proxy_upstream_responses",
+    "Upstream responses by status code (599 for network errors).",
+    ["code"],
+    registry=REGISTRY,
+)
+GDAL_DURATION = Histogram(
+    "jupytergis_processing_gdal_duration_seconds",
+    "Wall time of GDAL processing runs, by operation.",
+    ["operation"],
+    buckets=_GDAL_BUCKETS,
+    registry=REGISTRY,
+)
+QUEUE_WAIT = Histogram(
+    "jupytergis_processing_queue_wait_seconds",
+    "Time processing runs wait for a worker before starting.",
+    registry=REGISTRY,
+)
+
+
+class ProxyContextCollector(Collector):
+    """Expose the statistics of a ``ProxyContext`` at scrape time."""
+
+    def __init__(self, context: Any) -> None:
+        self.context = context
+
+    def collect(self) -> Iterator[Any]:
+        """Yield the current cache, coalescing and rate-limiting metrics."""
+        cache = self.context.cache
+        if cache is not None:
+            stats = cache.stats()
+            lookups = CounterMetricFamily(
+                "jupytergis_proxy_cache_lookups",
+                "Response cache lookups by result.",
+                labels=["result"],
+            )
+            # Revalidated responses are counted among the hits.
+            lookups.add_metric(
+                ["hit"],
+                max(0, stats["hits"] - stats["revalidations"]),
+            )
+            lookups.add_metric(["revalidated"], stats["revalidations"])
+            lookups.add_metric(["miss"], stats["misses"])
+            yield lookups
+            yield GaugeMetricFamily(
+                "jupytergis_proxy_cache_entries",
+                "Entries in the response cache.",
+                value=stats["entries"],
+            )
+            yield GaugeMetricFamily(
+                "jupytergis_proxy_cache_size_bytes",
+                "Size of the cached response bodies.",
+                value=stats["size"],
+            )
+
+        flights = self.context.single_flight
+        if flights is not None:
+            yield CounterMetricFamily(
+                "jupytergis_proxy_deduplicated_requests",
+                "Requests answered with the response of an identical one.",
+                value=flights.stats()["deduplicated"],
+            )
+
+        coalescer = self.context.range_coalescer
+        if coalescer is not None:
+            yield CounterMetricFamily(
+                "jupytergis_proxy_coalesced_ranges",
+                "Range requests merged into another upstream request.",
+                value=coalescer.stats()["coalesced"],
+            )
+
+        limiter = self.context.rate_limiter
+        if limiter is not None:
+            yield GaugeMetricFamily(
+                "jupytergis_proxy_rate_limit_buckets",
+                "Rate-limit buckets currently tracked.",
+                value=len(limiter),
+            )
+
+
+class ProcessingContextCollector(Collector):
+    """Expose the statistics of a ``ProcessingContext`` at scrape time."""
+
+    def __init__(self, context: Any) -> None:
+        self.context = context
+
+    def collect(self) -> Iterator[Any]:
+        """Yield the current result cache metrics."""
+        cache = self.context.cache
+        if cache is not None:
+            stats = cache.stats()
+            lookups = CounterMetricFamily(
+                "jupytergis_processing_cache_lookups",
+                "Processing result cache lookups by result.",
+                labels=["result"],
+            )
+            lookups.add_metric(["hit"], stats["hits"])
+            lookups.add_metric(["miss"], stats["misses"])
+            yield lookups
+            yield GaugeMetricFamily(
+                "jupytergis_processing_cache_entries",
+                "Entries in the processing result cache.",
+                value=stats["entries"],
+            )
+            yield GaugeMetricFamily(
+                "jupytergis_processing_cache_size_bytes",
+                "Size of the cached processing results.",
+                value=stats["size"],
+            )
+
+
+_collectors: dict[type[Collector], Collector] = {}
+
+
+def _register(collector: Collector) -> None:
+    """Register ``collector``, replacing any previous one of the same type."""
+    previous = _collectors.pop(type(collector), None)
+    if previous is not None:
+        REGISTRY.unregister(previous)
+    _collectors[type(collector)] = collector
+    REGISTRY.register(collector)
+
+
+def register_proxy_context(context: Any) -> None:
+    """Report the statistics of ``context``, replacing any previous one."""
+    _register(ProxyContextCollector(context))
+
+
+def register_processing_context(context: Any) -> None:
+    """Report the statistics of ``context``, replacing any previous one."""
+    _register(ProcessingContextCollector(context))
@@ -1,90 +1,1142 @@
+import functools
+import hashlib
+import json
 import logging
+import math
 import os
+import re
 import shutil
 import subprocess
 import tempfile
+import threading
+import time
 from base64 import b64encode
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from pathlib import Path
+from typing import Any
 from urllib.parse import urlparse
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape
+
+from .gdal_engine import PROGRESS_INTERVAL, GdalEngine, OperationCancelledError
 
 logger = logging.getLogger(__name__)
 
 # GDAL CLI tools we support
 ALLOWED_OPERATIONS = {"ogr2ogr", "gdal_rasterize", "gdalwarp", "gdal_translate"}
 
+# Operations whose input is a vector dataset.
+VECTOR_OPERATIONS = {"ogr2ogr", "gdal_rasterize"}
+
+# Maximum number of steps in a pipeline.
+MAX_PIPELINE_STEPS = 16
+
+
+class SourceError(ValueError):
+    """Raised when a reference to server-side data cannot be resolved."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
 
+
+@functools.cache
 def gdal_available() -> bool:
-    """Check if GDAL CLI tools are available on the system."""
+    """Check if GDAL CLI tools are available on the system.
+
+    The result is probed once per server process.
+    """
     return shutil.which("ogr2ogr") is not None
 
 
+@functools.cache
+def gdal_version() -> str | None:
+    """Return the version reported by ``ogr2ogr --version``, probed once."""
+    if not gdal_available():
+        return None
+    try:
+        result = subprocess.run(
+            ["ogr2ogr", "--version"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            check=False,
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning("Failed to read GDAL version: %s", e)
+        return None
+    return result.stdout.strip() or None
+
+
+# GDAL configuration options of every processing run; see ``set_gdal_config``.
+_GDAL_CONFIG: dict[str, str] = {}
+
+
+def gdal_config(vsicurl_cache_size: int, vsi_cache_size: int) -> dict[str, str]:
+    """Return the GDAL configuration options processing runs with.
+
+    Tuned for reading remote rasters through ``/vsicurl/``: remote blocks
+    stay in memory between operations of a GDAL worker, HTTP/2 carries
+    concurrent range requests over one connection, adjacent ranges are
+    fetched together, and opening a file does not list its directory to
+    look for sidecars. Options set in the server environment are left out,
+    so that they keep precedence.
+
+    Args:
+        vsicurl_cache_size: Bytes of remote data a process keeps, shared by
+            all the files it reads
+        vsi_cache_size: Bytes of read-ahead cache per open file
+
+    """
+    config = {
+        "CPL_VSIL_CURL_CACHE_SIZE": str(vsicurl_cache_size),
+        "VSI_CACHE": "TRUE",
+        "VSI_CACHE_SIZE": str(vsi_cache_size),
+        "GDAL_HTTP_VERSION": "2",
+        "GDAL_HTTP_MULTIPLEX": "YES",
+        "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+        "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    }
+    return {key: value for key, value in config.items() if key not in os.environ}
+
+
+def set_gdal_config(config: dict[str, str]) -> None:
+    """Set the GDAL configuration options of the CLI tools run from now on.
+
+    They are passed in the environment of the tools only, so that they do
+    not leak into other processes of the server, such as kernels.
+    """
+    _GDAL_CONFIG.clear()
+    _GDAL_CONFIG.update(config)
+
+
+def _gdal_env() -> dict[str, str] | None:
+    """Return the environment of a GDAL CLI tool, or None to inherit ours."""
+    if not _GDAL_CONFIG:
+        return None
+    return {**os.environ, **_GDAL_CONFIG}
+
+
+# A driver in the output of ``--formats``: "  FlatGeobuf -vector- (rw+v): ...".
+_FORMATS_LINE = re.compile(r"^\s+(.+?) -[a-z, ]+- \(", re.MULTILINE)
+
+
+@functools.cache
+def gdal_drivers() -> frozenset[str]:
+    """Return the short names of the drivers of the GDAL CLI tools, probed once."""
+    if not gdal_available():
+        return frozenset()
+    drivers: set[str] = set()
+    for tool in ("ogrinfo", "gdalinfo"):
+        try:
+            result = subprocess.run(
+                [tool, "--formats"],
+                capture_output=True,
+                text=True,
+                timeout=10,
+                check=False,
+            )
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.warning("Failed to list GDAL drivers: %s", e)
+            continue
+        drivers.update(_FORMATS_LINE.findall(result.stdout))
+    return frozenset(drivers)
+
+
+# A step of GDAL's terminal progress output: "0...10...20...", where each
+# dot stands for 2.5%.
+_PROGRESS_STEP = re.compile(r"(?:^|(?<=\.))(\d{1,3})(\.*)", re.MULTILINE)
+
+
+class GdalProgressParser:
+    """Track the progress printed by a GDAL command-line tool."""
+
+    def __init__(self) -> None:
+        self._text = ""
+        self.fraction = 0.0
+
+    def feed(self, text: str) -> None:
+        """Parse the next piece of the tool's output."""
+        self._text += text
+        steps = _PROGRESS_STEP.findall(self._text)
+        if steps:
+            percent, dots = steps[-1]
+            self.fraction = min(100.0, int(percent) + 2.5 * len(dots)) / 100
+        # Only the current progress line matters.
+        self._text = self._text[self._text.rfind("\n") + 1 :]
+
+
+def _run_with_progress(
+    cmd: list[str],
+    *,
+    cwd: str,
+    timeout: float,
+    progress: Callable[[float], bool],
+) -> None:
+    """Run a CLI tool like ``subprocess.run``, reporting its progress."""
+    parser = GdalProgressParser()
+    stdout: list[bytes] = []
+    stderr: list[bytes] = []
+
+    with subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        env=_gdal_env(),
+    ) as proc:
+
+        def read_stdout() -> None:
+            while data := proc.stdout.read1(4096):
+                stdout.append(data)
+                parser.feed(data.decode("ascii", "replace"))
+
+        readers = [
+            threading.Thread(target=read_stdout, daemon=True),
+            threading.Thread(
+                target=lambda: stderr.append(proc.stderr.read()),
+                daemon=True,
+            ),
+        ]
+        for reader in readers:
+            reader.start()
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                proc.wait(timeout=PROGRESS_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if not progress(parser.fraction):
+                proc.kill()
+                raise OperationCancelledError
+            if time.monotonic() >= deadline:
+                proc.kill()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+        for reader in readers:
+            reader.join()
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(
+            proc.returncode,
+            cmd,
+            b"".join(stdout).decode(errors="replace"),
+            b"".join(stderr).decode(errors="replace"),
+        )
+
+
+@dataclass(frozen=True)
+class TileSettings:
+    """How raster outputs are split into tiles computed in parallel."""
+
+    # Tiles computed at once.
+    workers: int
+    # Width and height of a tile, in pixels.
+    size: int = 4096
+
+    @property
+    def threads(self) -> int:
+        """GDAL threads per tile, so that all tiles together use every core."""
+        return max(1, (os.cpu_count() or 1) // self.workers)
+
+
+def _execute(
+    operation: str,
+    options: list[str],
+    input_path: str,
+    output_path: str,
+    *,
+    cwd: str,
+    timeout: float,
+    engine: GdalEngine | None,
+    progress: Callable[[float], bool] | None = None,
+    steps: list[str] | None = None,
+    config: dict[str, str] | None = None,
+    tiles: TileSettings | None = None,
+) -> None:
+    """Run a GDAL tool on ``input_path``, writing ``output_path``.
+
+    ``options`` are CLI options with placeholders already resolved; for
+    ogr2ogr they contain the output path as a positional argument. Runs in
+    the ``engine`` worker pool if one is given, otherwise as a subprocess.
+    ``progress`` receives the completed fraction and cancels the operation,
+    raising ``OperationCancelledError``, by returning False. ``steps`` are
+    SQL statements applied to the input first, see ``_write_pipeline``.
+    ``config`` holds GDAL configuration options for this run. With
+    ``tiles``, large raster outputs are computed in parallel, see
+    ``_run_tiled``.
+    """
+    if steps:
+        input_path = _write_pipeline(input_path, steps, cwd)
+
+    if tiles is not None and _tileable(operation, options, output_path):
+        _run_tiled(
+            operation,
+            options,
+            input_path,
+            output_path,
+            cwd=cwd,
+            timeout=timeout,
+            engine=engine,
+            progress=progress,
+            tiles=tiles,
+        )
+        return
+
+    if engine is not None:
+        engine.run(
+            operation,
+            # The bindings take the dataset names as separate arguments.
+            [o for o in options if o != output_path],
+            input_path,
+            output_path,
+            cwd=cwd,
+            timeout=timeout,
+            progress=progress,
+            config=config,
+        )
+        return
+
+    # ogr2ogr embeds the output path inside options (via {outputName}).
+    # gdal_rasterize, gdalwarp, and gdal_translate require the destination
+    # dataset as a separate trailing positional argument.
+    config_args = [a for k, v in (config or {}).items() for a in ("--config", k, v)]
+    cmd = [operation, *config_args, *options, input_path]
+    if operation in {"gdal_rasterize", "gdalwarp", "gdal_translate"}:
+        cmd.append(output_path)
+
+    if progress is not None:
+        if operation == "ogr2ogr" and "-progress" not in options:
+            # ogr2ogr only reports progress when asked to.
+            cmd.insert(1, "-progress")
+        _run_with_progress(cmd, cwd=cwd, timeout=timeout, progress=progress)
+        return
+
+    result = subprocess.run(
+        cmd,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        cwd=cwd,
+        env=_gdal_env(),
+        check=False,
+    )
+
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(
+            result.returncode,
+            cmd,
+            result.stdout,
+            result.stderr,
+        )
+
+
+# Options that pick the output driver or its creation options, with the
+# number of values each takes.
+_OUTPUT_FLAGS = {"-of": 1, "-f": 1, "-co": 1}
+
+
+def _tileable(operation: str, options: list[str], output_path: str) -> bool:
+    """Whether an operation writes a GeoTIFF, which tiling can produce."""
+    if operation not in {"gdalwarp", "gdal_translate"}:
+        return False
+    driver = _output_driver(operation, options, Path(output_path).name)
+    return driver.lower() in {"gtiff", "cog"}
+
+
+def _tile_windows(
+    width: int,
+    height: int,
+    size: int,
+) -> Iterator[tuple[int, int, int, int]]:
+    """Split a raster into windows (x offset, y offset, width, height)."""
+    for y in range(0, height, size):
+        for x in range(0, width, size):
+            yield x, y, min(size, width - x), min(size, height - y)
+
+
+def _split_output_options(options: list[str]) -> tuple[list[str], list[str]]:
+    """Separate the driver and creation options from the other options.
+
+    Returns the other options and the values of the ``-co`` options.
+    """
+    rest: list[str] = []
+    creation: list[str] = []
+    index = 0
+    while index < len(options):
+        option = options[index]
+        if option in _OUTPUT_FLAGS and index + 1 < len(options):
+            if option == "-co":
+                creation.append(options[index + 1])
+            index += 1 + _OUTPUT_FLAGS[option]
+            continue
+        rest.append(option)
+        index += 1
+    return rest, creation
+
+
+def _write_mosaic(
+    plan_path: str,
+    tiles: list[tuple[tuple[int, int, int, int], str]],
+    mosaic_path: str,
+) -> None:
+    """Write a VRT assembling tiles into the raster described by ``plan_path``.
+
+    ``tiles`` pairs the window of each tile with its file, relative to the
+    VRT. The georeferencing and band types come from the plan.
+    """
+    plan = ET.parse(plan_path).getroot()
+    mosaic = ET.Element(
+        "VRTDataset",
+        rasterXSize=plan.get("rasterXSize"),
+        rasterYSize=plan.get("rasterYSize"),
+    )
+    for tag in ("SRS", "GeoTransform", "Metadata"):
+        mosaic.extend(plan.findall(tag))
+    for plan_band in plan.findall("VRTRasterBand"):
+        band = ET.SubElement(
+            mosaic,
+            "VRTRasterBand",
+            dataType=plan_band.get("dataType", "Byte"),
+            band=plan_band.get("band"),
+        )
+        for tag in ("Description", "NoDataValue", "ColorInterp", "ColorTable"):
+            band.extend(plan_band.findall(tag))
+        for (x, y, width, height), name in tiles:
+            source = ET.SubElement(band, "SimpleSource")
+            ET.SubElement(
+                source,
+                "SourceFilename",
+                relativeToVRT="1",
+            ).text = name
+            ET.SubElement(source, "SourceBand").text = plan_band.get("band")
+            ET.SubElement(
+                source,
+                "SrcRect",
+                xOff="0",
+                yOff="0",
+                xSize=str(width),
+                ySize=str(height),
+            )
+            ET.SubElement(
+                source,
+                "DstRect",
+                xOff=str(x),
+                yOff=str(y),
+                xSize=str(width),
+                ySize=str(height),
+            )
+    ET.ElementTree(mosaic).write(mosaic_path, encoding="unicode")
+
+
+def _run_tiled(
+    operation: str,
+    options: list[str],
+    input_path: str,
+    output_path: str,
+    *,
+    cwd: str,
+    timeout: float,
+    engine: GdalEngine | None,
+    progress: Callable[[float], bool] | None,
+    tiles: TileSettings,
+) -> None:
+    """Run a raster operation tile by tile on all cores, writing a COG.
+
+    The operation is first run with the VRT driver, which only describes
+    the output grid (and, for gdalwarp, how to warp into it) without
+    reading any pixels. Windows of that plan are then computed in parallel
+    in the ``engine`` workers or as subprocesses, each reading only the
+    blocks of the source it covers, and assembled into a COG. Outputs that
+    fit in one tile are computed directly.
+    """
+    tiles_dir = os.path.join(cwd, "tiles")
+    Path(tiles_dir).mkdir()
+    try:
+        plan_path = os.path.join(tiles_dir, "plan.vrt")
+        plan_options, creation_options = _split_output_options(options)
+        plan_options = [*plan_options, "-of", "VRT"]
+        if operation == "gdalwarp":
+            # Kept in the plan, so each tile warps with several threads.
+            plan_options += ["-wo", f"NUM_THREADS={tiles.threads}"]
+        _execute(
+            operation,
+            plan_options,
+            input_path,
+            plan_path,
+            cwd=cwd,
+            timeout=timeout,
+            engine=engine,
+        )
+
+        plan = ET.parse(plan_path).getroot()
+        windows = list(
+            _tile_windows(
+                int(plan.get("rasterXSize")),
+                int(plan.get("rasterYSize")),
+                tiles.size,
+            ),
+        )
+        if len(windows) == 1:
+            _execute(
+                operation,
+                options,
+                input_path,
+                output_path,
+                cwd=cwd,
+                timeout=timeout,
+                engine=engine,
+                progress=progress,
+            )
+            return
+
+        logger.info("Computing %s in %d tiles", Path(output_path).name, len(windows))
+        config = {"GDAL_NUM_THREADS": str(tiles.threads)}
+        fractions = [0.0] * len(windows)
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def run_tile(index: int) -> None:
+            x, y, width, height = windows[index]
+
+            def tile_progress(fraction: float) -> bool:
+                with lock:
+                    fractions[index] = fraction
+                    # The final COG conversion takes the remaining 10%.
+                    if progress is not None and not progress(
+                        0.9 * sum(fractions) / len(fractions),
+                    ):
+                        stop.set()
+                return not stop.is_set()
+
+            _execute(
+                "gdal_translate",
+                [
+                    "-of",
+                    "GTiff",
+                    "-co",
+                    "TILED=YES",
+                    "-srcwin",
+                    str(x),
+                    str(y),
+                    str(width),
+                    str(height),
+                ],
+                plan_path,
+                os.path.join(tiles_dir, f"tile{index}.tif"),
+                cwd=cwd,
+                timeout=timeout,
+                engine=engine,
+                progress=tile_progress,
+                config=config,
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=tiles.workers,
+            thread_name_prefix="jupytergis-tile",
+        ) as executor:
+            futures = [executor.submit(run_tile, i) for i in range(len(windows))]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # Stop the running tiles and skip the others.
+                stop.set()
+                for future in futures:
+                    future.cancel()
+                raise
+
+        mosaic_path = os.path.join(tiles_dir, "mosaic.vrt")
+        _write_mosaic(
+            plan_path,
+            [(window, f"tile{i}.tif") for i, window in enumerate(windows)],
+            mosaic_path,
+        )
+        _execute(
+            "gdal_translate",
+            ["-of", "COG", *(o for c in creation_options for o in ("-co", c))],
+            mosaic_path,
+            output_path,
+            cwd=cwd,
+            timeout=timeout,
+            engine=engine,
+            progress=None
+            if progress is None
+            else lambda fraction: progress(0.9 + 0.1 * fraction),
+            config={"GDAL_NUM_THREADS": "ALL_CPUS"},
+        )
+    finally:
+        # The tiles are as large as the output itself.
+        shutil.rmtree(tiles_dir, ignore_errors=True)
+
+
+# Media types of the outputs GDAL commonly writes, by file extension.
+_MEDIA_TYPES = {
+    ".geojson": "application/geo+json",
+    ".json": "application/json",
+    ".csv": "text/csv",
+    ".gpkg": "application/geopackage+sqlite3",
+    ".kml": "application/vnd.google-earth.kml+xml",
+    ".gml": "application/gml+xml",
+    ".shp": "application/octet-stream",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".fgb": "application/flatgeobuf",
+    ".parquet": "application/vnd.apache.parquet",
+}
+
+# Outputs returned base64-encoded by ``ProcessingOutput.read``.
+_BINARY_EXTENSIONS = {
+    ".tif",
+    ".tiff",
+    ".gpkg",
+    ".shp",
+    ".png",
+    ".jpg",
+    ".fgb",
+    ".parquet",
+}
+
+
+@dataclass(frozen=True)
+class OutputFormat:
+    """An output format a request can ask for, or the server can negotiate."""
+
+    driver: str
+    extension: str
+    media_type: str
+    operations: frozenset[str]
+    # Creation options, passed as "-lco" (vector) or "-co" (raster).
+    creation_options: tuple[str, ...] = ()
+
+    @property
+    def vector(self) -> bool:
+        return "ogr2ogr" in self.operations
+
+
+OUTPUT_FORMATS = {
+    "GeoJSON": OutputFormat(
+        driver="GeoJSON",
+        extension=".geojson",
+        media_type="application/geo+json",
+        operations=frozenset({"ogr2ogr"}),
+    ),
+    "FlatGeobuf": OutputFormat(
+        driver="FlatGeobuf",
+        extension=".fgb",
+        media_type="application/flatgeobuf",
+        operations=frozenset({"ogr2ogr"}),
+        # Lets clients read only the features of a bounding box.
+        creation_options=("SPATIAL_INDEX=YES",),
+    ),
+    "GeoParquet": OutputFormat(
+        driver="Parquet",
+        extension=".parquet",
+        media_type="application/vnd.apache.parquet",
+        operations=frozenset({"ogr2ogr"}),
+    ),
+    "COG": OutputFormat(
+        driver="COG",
+        extension=".tif",
+        media_type="image/tiff; application=geotiff; profile=cloud-optimized",
+        # The COG driver cannot be written feature by feature, as
+        # gdal_rasterize does.
+        operations=frozenset({"gdalwarp", "gdal_translate"}),
+    ),
+}
+
+# Formats negotiated from the Accept header, most efficient first.
+NEGOTIATED_FORMATS = ("FlatGeobuf", "GeoParquet", "COG")
+
+# Media types clients advertise for the negotiated formats.
+_ACCEPTED_MEDIA_TYPES = {
+    "application/flatgeobuf": "FlatGeobuf",
+    "application/vnd.flatgeobuf": "FlatGeobuf",
+    "application/vnd.apache.parquet": "GeoParquet",
+    "application/x-parquet": "GeoParquet",
+}
+
+
+def accepted_output_formats(accept: str) -> tuple[str, ...]:
+    """Return the negotiable formats an Accept header lists, preferred first.
+
+    GeoTIFF only counts as COG with ``profile=cloud-optimized``; formats
+    the client weighs equally are ordered as in ``NEGOTIATED_FORMATS``.
+    """
+    weights: dict[str, float] = {}
+    for item in accept.split(","):
+        media_type, *parameters = (part.strip() for part in item.split(";"))
+        params = {
+            name.strip().lower(): value.strip().strip('"')
+            for name, _, value in (p.partition("=") for p in parameters)
+        }
+        media_type = media_type.lower()
+        if media_type == "image/tiff":
+            name = "COG" if params.get("profile") == "cloud-optimized" else None
+        else:
+            name = _ACCEPTED_MEDIA_TYPES.get(media_type)
+        try:
+            weight = float(params.get("q", 1))
+        except ValueError:
+            weight = 0
+        if name is not None and weight > 0:
+            weights[name] = max(weight, weights.get(name, 0))
+    return tuple(
+        sorted(weights, key=lambda n: (-weights[n], NEGOTIATED_FORMATS.index(n))),
+    )
+
+
+def _format_flag(operation: str) -> str:
+    return "-f" if operation == "ogr2ogr" else "-of"
+
+
+def _output_driver(operation: str, options: list[str], output_name: str) -> str:
+    """Return the driver an operation writes with, as far as it can be told."""
+    flags = (
+        {"-f", "-of"} if operation == "gdal_translate" else {_format_flag(operation)}
+    )
+    for index, option in enumerate(options[:-1]):
+        if option in flags:
+            return options[index + 1]
+    if operation != "ogr2ogr":
+        return "GTiff"
+    # ogr2ogr guesses the driver from the extension.
+    return "GeoJSON" if Path(output_name).suffix.lower() == ".geojson" else ""
+
+
+def with_output_format(
+    operation: str,
+    options: list[str],
+    output_name: str,
+    name: str,
+) -> tuple[list[str], str]:
+    """Rewrite the options and output name of a request to write ``name``.
+
+    Replaces the driver flag, or adds one, adds the creation options of the
+    format and gives the output the extension of the format.
+
+    Raises:
+        ValueError: If the format is unknown or ``operation`` cannot write it
+
+    """
+    output_format = OUTPUT_FORMATS.get(name)
+    if output_format is None:
+        raise ValueError(
+            f"Unsupported output format: {name}. Allowed: {sorted(OUTPUT_FORMATS)}",
+        )
+    if operation not in output_format.operations:
+        raise ValueError(f"{operation} cannot write {name}")
+
+    flags = (
+        {"-f", "-of"} if operation == "gdal_translate" else {_format_flag(operation)}
+    )
+    options = list(options)
+    index = next(
+        (i for i, option in enumerate(options[:-1]) if option in flags),
+        None,
+    )
+    if index is None:
+        options[:0] = [_format_flag(operation), output_format.driver]
+        index = 0
+    else:
+        options[index + 1] = output_format.driver
+    creation_flag = "-lco" if output_format.vector else "-co"
+    for creation_option in reversed(output_format.creation_options):
+        options[index + 2 : index + 2] = [creation_flag, creation_option]
+
+    output_name = str(Path(output_name).with_suffix(output_format.extension))
+    return options, output_name
+
+
+class ProcessingOutput:
+    """The output file of a GDAL run, in a temporary directory of its own.
+
+    The directory is removed by ``close``, so that the file can be streamed
+    to the client after the run rather than held in memory.
+    """
+
+    def __init__(self, tmpdir: tempfile.TemporaryDirectory, name: str) -> None:
+        self._tmpdir = tmpdir
+        self.name = name
+        self.path = os.path.join(tmpdir.name, name)
+        # Whether the output comes from the result cache.
+        self.cached = False
+
+    @property
+    def media_type(self) -> str:
+        """The media type of the output, guessed from its extension."""
+        return _MEDIA_TYPES.get(
+            Path(self.name).suffix.lower(),
+            "application/octet-stream",
+        )
+
+    @property
+    def size(self) -> int:
+        """The size of the output file in bytes."""
+        return Path(self.path).stat().st_size
+
+    def read(self) -> tuple[str, str]:
+        """Return (content, format) where format is "text" or "base64"."""
+        # Determine output format based on file extension
+        if Path(self.name).suffix.lower() in _BINARY_EXTENSIONS:
+            with open(self.path, "rb") as f:
+                return b64encode(f.read()).decode("ascii"), "base64"
+        else:
+            with open(self.path) as f:
+                return f.read(), "text"
+
+    def iter_chunks(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Read the output in blocks, keeping memory use constant."""
+        with open(self.path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def close(self) -> None:
+        """Delete the output and its directory."""
+        self._tmpdir.cleanup()
+
+
+def _check_output(output: ProcessingOutput) -> ProcessingOutput:
+    if not os.path.exists(output.path):
+        output.close()
+        raise FileNotFoundError(
+            f"GDAL operation did not produce expected output: {output.name}",
+        )
+    return output
+
+
 def run_gdal(
     operation: str,
     options: list[str],
     geojson: str,
     output_name: str,
-) -> tuple[str, str]:
+    *,
+    engine: GdalEngine | None = None,
+    progress: Callable[[float], bool] | None = None,
+    steps: list[str] | None = None,
+) -> ProcessingOutput:
     """Execute a GDAL CLI command in a temp directory.
 
-    Returns (content, format) where format is "text" or "base64".
+    Returns the output, which the caller must close.
+    """
+    with tempfile.TemporaryDirectory() as input_dir:
+        input_path = os.path.join(input_dir, "data.geojson")
+        with open(input_path, "w") as f:
+            f.write(geojson)
+
+        return run_gdal_file(
+            operation,
+            options,
+            input_path,
+            output_name,
+            engine=engine,
+            progress=progress,
+            steps=steps,
+        )
+
+
+def run_gdal_file(
+    operation: str,
+    options: list[str],
+    input_path: str,
+    output_name: str,
+    *,
+    timeout: float = 120,
+    engine: GdalEngine | None = None,
+    progress: Callable[[float], bool] | None = None,
+    steps: list[str] | None = None,
+    tiles: TileSettings | None = None,
+) -> ProcessingOutput:
+    """Execute a GDAL CLI command on a dataset stored on the server.
+
+    Returns the output, which the caller must close.
     """
     safe_output_name = Path(output_name).name
     if not safe_output_name:
         raise ValueError(f"Invalid output_name: {output_name!r}")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        input_path = os.path.join(tmpdir, "data.geojson")
+    output_dir = tempfile.TemporaryDirectory()
+    tmpdir = output_dir.name
+    try:
         output_path = os.path.join(tmpdir, safe_output_name)
 
-        with open(input_path, "w") as f:
-            f.write(geojson)
-
         # Substitute the {outputName} placeholder in options with the actual path.
         # Callers should template the output filename in `options` rather than
         # hardcoding it, so we know unambiguously where the output will land.
         resolved_options = [o.replace("{outputName}", output_path) for o in options]
 
-        # ogr2ogr embeds the output path inside options (via {outputName}).
-        # gdal_rasterize, gdalwarp, and gdal_translate require the destination
-        # dataset as a separate trailing positional argument.
-        cmd = [operation, *resolved_options, input_path]
-        if operation in {"gdal_rasterize", "gdalwarp", "gdal_translate"}:
-            cmd.append(output_path)
+        logger.info("Running GDAL: %s %s", operation, " ".join(resolved_options))
 
-        logger.info("Running GDAL: %s", " ".join(cmd))
+        _execute(
+            operation,
+            resolved_options,
+            input_path,
+            output_path,
+            cwd=tmpdir,
+            timeout=timeout,
+            engine=engine,
+            progress=progress,
+            steps=steps,
+            tiles=tiles,
+        )
+    except BaseException:
+        output_dir.cleanup()
+        raise
+    return _check_output(ProcessingOutput(output_dir, safe_output_name))
 
-        result = subprocess.run(
+
+# A layer in the output of ``ogrinfo -q``: "1: name (Geometry Type)".
+_OGRINFO_LAYER = re.compile(r"^\d+: (.+?)(?: \([^()]*\))?$", re.MULTILINE)
+
+
+def vector_layer_names(path: str, *, engine: GdalEngine | None = None) -> list[str]:
+    """Return the names of the vector layers of a dataset, in order."""
+    if engine is not None:
+        return engine.layer_names(path)
+    cmd = ["ogrinfo", "-ro", "-q", path]
+    result = subprocess.run(
+        cmd,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env=_gdal_env(),
+        check=False,
+    )
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(
+            result.returncode,
             cmd,
-            capture_output=True,
-            text=True,
-            timeout=120,
-            cwd=tmpdir,
-            check=False,
+            result.stdout,
+            result.stderr,
         )
+    return _OGRINFO_LAYER.findall(result.stdout)
 
-        if result.returncode != 0:
-            raise subprocess.CalledProcessError(
-                result.returncode,
-                cmd,
-                result.stdout,
-                result.stderr,
-            )
 
-        if not os.path.exists(output_path):
-            raise FileNotFoundError(
-                f"GDAL operation did not produce expected output: {safe_output_name}",
-            )
+def raster_info(path: str, *, engine: GdalEngine | None = None) -> dict[str, Any]:
+    """Return the description of a raster, as ``gdalinfo -json`` prints it."""
+    if engine is not None:
+        return engine.info(path)
+    cmd = ["gdalinfo", "-json", path]
+    result = subprocess.run(
+        cmd,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        env=_gdal_env(),
+        check=False,
+    )
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(
+            result.returncode,
+            cmd,
+            result.stdout,
+            result.stderr,
+        )
+    return json.loads(result.stdout)
 
-        # Determine output format based on file extension
-        ext = Path(safe_output_name).suffix
-        is_binary = ext.lower() in {".tif", ".tiff", ".gpkg", ".shp"}
 
-        if is_binary:
-            with open(output_path, "rb") as f:
-                return b64encode(f.read()).decode("ascii"), "base64"
-        else:
-            with open(output_path) as f:
-                return f.read(), "text"
+# Cutline simplification tolerance, in degrees, when it cannot be derived
+# from the raster. 5e-4 deg ≈ 50 m, invisible at typical COG resolutions.
+DEFAULT_CUTLINE_TOLERANCE = 0.0005
+
+# Metres per degree of longitude at the equator.
+_METRES_PER_DEGREE = 111_320
+
+# The unit of a projected CRS: 'LENGTHUNIT["metre",1' (WKT2) or
+# 'UNIT["metre",1' (WKT1).
+_WKT_LENGTH_UNIT = re.compile(r'(?:LENGTH)?UNIT\["[^"]*",\s*([0-9.eE+-]+)')
+
+
+def cutline_tolerance(info: dict[str, Any]) -> float:
+    """Return the simplification tolerance of a cutline, in degrees.
+
+    Half a pixel of the raster it clips: the cutline is burnt into a pixel
+    mask, so detail below that cannot show in the output. The cutline is
+    GeoJSON, so in degrees; for a projected raster the pixel size is
+    converted from the unit of its CRS, with a degree taken as long as at
+    the equator, its longest, so the tolerance errs small.
+    """
+    transform = info.get("geoTransform") or []
+    wkt = (info.get("coordinateSystem") or {}).get("wkt", "")
+    if len(transform) != 6 or not wkt:
+        return DEFAULT_CUTLINE_TOLERANCE
+    pixel_size = min(abs(transform[1]), abs(transform[5]))
+    if not pixel_size:
+        return DEFAULT_CUTLINE_TOLERANCE
+    if not wkt.startswith(("GEOGCRS", "GEOGCS", "GEODCRS")):
+        units = _WKT_LENGTH_UNIT.findall(wkt)
+        metres = pixel_size * (float(units[-1]) if units else 1.0)
+        pixel_size = metres / _METRES_PER_DEGREE
+    return pixel_size / 2
+
+
+@functools.lru_cache(maxsize=256)
+def _source_tolerance(source: str, engine: GdalEngine | None) -> float:
+    # Probed once per source: the grid of a published raster does not change.
+    try:
+        return cutline_tolerance(raster_info(source, engine=engine))
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        logger.warning("Cannot read the pixel size of %s: %s", source, e)
+        return DEFAULT_CUTLINE_TOLERANCE
+
+
+# Simplified cutlines by content and tolerance, least recently used first.
+_CUTLINES: OrderedDict[str, str] = OrderedDict()
+_CUTLINES_LOCK = threading.Lock()
+# Total size of the cached cutlines, in characters.
+MAX_CUTLINE_CACHE_SIZE = 64 * 1024 * 1024
+
+
+def _cache_cutline(key: str, cutline: str) -> None:
+    with _CUTLINES_LOCK:
+        _CUTLINES[key] = cutline
+        size = sum(len(c) for c in _CUTLINES.values())
+        while size > MAX_CUTLINE_CACHE_SIZE:
+            _, evicted = _CUTLINES.popitem(last=False)
+            size -= len(evicted)
+
+
+def prepare_cutline(
+    cutline_geojson: str,
+    source: str,
+    directory: str,
+    *,
+    engine: GdalEngine | None = None,
+) -> str:
+    """Write the cutline for clipping ``source`` to ``directory``.
+
+    gdalwarp tests every output pixel against each vertex of the cutline
+    polygon, so dense boundaries (e.g. GADM admin regions with thousands of
+    vertices) can dominate runtime. The cutline is simplified with a
+    tolerance derived from the pixel size of ``source``; the result is
+    kept in memory, so clipping against the same boundary again runs no
+    GDAL command. Returns the path of the cutline file.
+    """
+    tolerance = _source_tolerance(source, engine)
+    material = f"{tolerance!r}\n{cutline_geojson}".encode()
+    key = hashlib.sha256(material).hexdigest()
+    simplified_path = os.path.join(directory, "cutline_simplified.geojson")
+    with _CUTLINES_LOCK:
+        cached = _CUTLINES.get(key)
+        if cached is not None:
+            _CUTLINES.move_to_end(key)
+    if cached is not None:
+        with open(simplified_path, "w") as f:
+            f.write(cached)
+        return simplified_path
+
+    cutline_path = os.path.join(directory, "cutline.geojson")
+    with open(cutline_path, "w") as f:
+        f.write(cutline_geojson)
+    try:
+        _execute(
+            "ogr2ogr",
+            ["-f", "GeoJSON", "-simplify", f"{tolerance:.10g}", simplified_path],
+            cutline_path,
+            simplified_path,
+            cwd=directory,
+            timeout=30,
+            engine=engine,
+        )
+        with open(simplified_path) as f:
+            simplified = f.read()
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning("Cutline simplification failed, using it as is: %s", e)
+        return cutline_path
+    _cache_cutline(key, simplified)
+    return simplified_path
+
+
+def run_gdal_source(
+    operation: str,
+    options: list[str],
+    path: str,
+    output_name: str,
+    *,
+    layer: str | None = None,
+    engine: GdalEngine | None = None,
+    progress: Callable[[float], bool] | None = None,
+    steps: list[str] | None = None,
+    tiles: TileSettings | None = None,
+) -> ProcessingOutput:
+    """Execute a GDAL CLI command on a dataset the server can read directly.
+
+    A vector dataset is wrapped in a VRT that exposes ``layer`` (by default
+    its first layer) as ``data``, the name inline GeoJSON gets, so the same
+    SQL works whatever the format of the source.
+
+    Returns the output, which the caller must close.
+    """
+    if operation not in VECTOR_OPERATIONS:
+        return run_gdal_file(
+            operation,
+            options,
+            path,
+            output_name,
+            timeout=900,
+            engine=engine,
+            progress=progress,
+            tiles=tiles,
+        )
+
+    if layer is None:
+        layers = vector_layer_names(path, engine=engine)
+        if not layers:
+            raise SourceError(f"No vector layer in {Path(path).name}")
+        layer = layers[0]
+
+    with tempfile.TemporaryDirectory() as input_dir:
+        vrt_path = os.path.join(input_dir, "data.vrt")
+        _write_vrt(vrt_path, path, f"<SrcLayer>{xml_escape(layer)}</SrcLayer>")
+        return run_gdal_file(
+            operation,
+            options,
+            vrt_path,
+            output_name,
+            timeout=900,
+            engine=engine,
+            progress=progress,
+            steps=steps,
+        )
+
+
+def _write_vrt(vrt_path: str, source: str, selection: str) -> None:
+    """Write a VRT exposing what ``selection`` picks from ``source`` as ``data``."""
+    with open(vrt_path, "w") as f:
+        f.write(
+            "<OGRVRTDataSource>\n"
+            '  <OGRVRTLayer name="data">\n'
+            '    <SrcDataSource relativeToVRT="0">'
+            f"{xml_escape(source)}</SrcDataSource>\n"
+            f"    {selection}\n"
+            "  </OGRVRTLayer>\n"
+            "</OGRVRTDataSource>\n",
+        )
+
+
+def _write_pipeline(input_path: str, steps: list[str], directory: str) -> str:
+    """Chain SQL statements as VRT stages over ``input_path``.
+
+    Stage ``n`` exposes the result of ``steps[n]``, run on the previous
+    stage, as the layer ``data``. The operation then reads the last stage,
+    returned here, so the whole chain runs in a single GDAL invocation and
+    intermediate results are never written out.
+    """
+    for index, sql in enumerate(steps):
+        stage_path = os.path.join(directory, f"stage{index}.vrt")
+        _write_vrt(
+            stage_path,
+            input_path,
+            f'<SrcSQL dialect="sqlite">{xml_escape(sql)}</SrcSQL>',
+        )
+        input_path = stage_path
+    return input_path
 
 
 def run_gdal_url_with_cutline(
@@ -93,14 +1145,18 @@ def run_gdal_url_with_cutline(
     url: str,
     cutline_geojson: str,
     output_name: str,
-) -> tuple[str, str]:
+    *,
+    engine: GdalEngine | None = None,
+    progress: Callable[[float], bool] | None = None,
+    tiles: TileSettings | None = None,
+) -> ProcessingOutput:
     """Execute a GDAL CLI command on a remote raster URL with a vector cutline.
 
-    Writes the cutline GeoJSON to a temp file and substitutes ``{cutlinePath}``
-    in ``options`` with that file's path. Reads the raster via ``/vsicurl/``
+    Writes the cutline GeoJSON, simplified by ``prepare_cutline``, to a temp
+    file and substitutes ``{cutlinePath}`` in ``options`` with that file's path. Reads the raster via ``/vsicurl/``
     so GDAL can issue HTTP range requests (efficient for COGs).
 
-    Returns (content, format) where format is "text" or "base64".
+    Returns the output, which the caller must close.
     """
     safe_output_name = Path(output_name).name
     if not safe_output_name:
@@ -112,33 +1168,15 @@ def run_gdal_url_with_cutline(
 
     vsicurl_input = f"/vsicurl/{url}"
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        cutline_path = os.path.join(tmpdir, "cutline.geojson")
-        with open(cutline_path, "w") as f:
-            f.write(cutline_geojson)
-
-        # Pre-simplify the cutline. gdalwarp tests every output pixel against
-        # each vertex of the cutline polygon, so dense boundaries (e.g. GADM
-        # admin regions with thousands of vertices) can dominate runtime.
-        # 5e-4 deg ≈ 50 m, invisible at typical COG resolutions ≥100 m.
-        simplified_path = os.path.join(tmpdir, "cutline_simplified.geojson")
-        simpl = subprocess.run(
-            [
-                "ogr2ogr",
-                "-f",
-                "GeoJSON",
-                "-simplify",
-                "0.0005",
-                simplified_path,
-                cutline_path,
-            ],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            check=False,
+    output_dir = tempfile.TemporaryDirectory()
+    tmpdir = output_dir.name
+    try:
+        cutline_path = prepare_cutline(
+            cutline_geojson,
+            vsicurl_input,
+            tmpdir,
+            engine=engine,
         )
-        if simpl.returncode == 0 and os.path.exists(simplified_path):
-            cutline_path = simplified_path
 
         output_path = os.path.join(tmpdir, safe_output_name)
         resolved_options = [
@@ -149,10 +1187,6 @@ def run_gdal_url_with_cutline(
             for o in options
         ]
 
-        cmd = [operation, *resolved_options, vsicurl_input]
-        if operation in {"gdal_rasterize", "gdalwarp", "gdal_translate"}:
-            cmd.append(output_path)
-
         logger.info(
             "Running GDAL (vsicurl+cutline): %s -> %s",
             operation,
@@ -161,37 +1195,21 @@ def run_gdal_url_with_cutline(
 
         # gdalwarp on a remote COG with a vector cutline can take several
         # minutes for large rasters. Give it a generous ceiling.
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=900,
+        _execute(
+            operation,
+            resolved_options,
+            vsicurl_input,
+            output_path,
             cwd=tmpdir,
-            check=False,
+            timeout=900,
+            engine=engine,
+            progress=progress,
+            tiles=tiles,
         )
-
-        if result.returncode != 0:
-            raise subprocess.CalledProcessError(
-                result.returncode,
-                cmd,
-                result.stdout,
-                result.stderr,
-            )
-
-        if not os.path.exists(output_path):
-            raise FileNotFoundError(
-                f"GDAL operation did not produce expected output: {safe_output_name}",
-            )
-
-        ext = Path(safe_output_name).suffix
-        is_binary = ext.lower() in {".tif", ".tiff", ".gpkg", ".shp"}
-
-        if is_binary:
-            with open(output_path, "rb") as f:
-                return b64encode(f.read()).decode("ascii"), "base64"
-        else:
-            with open(output_path) as f:
-                return f.read(), "text"
+    except BaseException:
+        output_dir.cleanup()
+        raise
+    return _check_output(ProcessingOutput(output_dir, safe_output_name))
 
 
 def run_gdal_url(
@@ -199,14 +1217,20 @@ def run_gdal_url(
     options: list[str],
     url: str,
     output_name: str,
-) -> tuple[str, str]:
+    *,
+    engine: GdalEngine | None = None,
+    progress: Callable[[float], bool] | None = None,
+    steps: list[str] | None = None,
+    tiles: TileSettings | None = None,
+) -> ProcessingOutput:
     """Execute a GDAL CLI command on a remote URL via /vsicurl/.
 
     Uses GDAL's /vsicurl/ virtual filesystem driver so GDAL can issue
     HTTP range requests rather than downloading the entire file — essential
-    for Cloud-Optimized GeoTIFFs (COGs).
+    for Cloud-Optimized GeoTIFFs (COGs). With ``tiles``, raster outputs are
+    computed tile by tile in parallel.
 
-    Returns (content, format) where format is "text" or "base64".
+    Returns the output, which the caller must close.
     """
     safe_output_name = Path(output_name).name
     if not safe_output_name:
@@ -218,44 +1242,382 @@ def run_gdal_url(
 
     vsicurl_input = f"/vsicurl/{url}"
 
-    with tempfile.TemporaryDirectory() as tmpdir:
+    output_dir = tempfile.TemporaryDirectory()
+    tmpdir = output_dir.name
+    try:
         output_path = os.path.join(tmpdir, safe_output_name)
         resolved_options = [o.replace("{outputName}", output_path) for o in options]
 
-        cmd = [operation, *resolved_options, vsicurl_input]
-        if operation in {"gdal_rasterize", "gdalwarp", "gdal_translate"}:
-            cmd.append(output_path)
-
         logger.info("Running GDAL (vsicurl): %s -> %s", operation, safe_output_name)
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300,
+        _execute(
+            operation,
+            resolved_options,
+            vsicurl_input,
+            output_path,
             cwd=tmpdir,
-            check=False,
+            timeout=300,
+            engine=engine,
+            progress=progress,
+            steps=steps,
+            tiles=tiles,
         )
+    except BaseException:
+        output_dir.cleanup()
+        raise
+    return _check_output(ProcessingOutput(output_dir, safe_output_name))
+
+
+@dataclass
+class ProcessingRequest:
+    """A validated processing request, as posted by the frontend."""
 
-        if result.returncode != 0:
-            raise subprocess.CalledProcessError(
-                result.returncode,
-                cmd,
-                result.stdout,
-                result.stderr,
+    operation: str
+    options: list[str]
+    output_name: str
+    geojson: str | None = None
+    url: str | None = None
+    cutline_geojson: str | None = None
+    # A dataset uploaded to the server, never taken from the request body.
+    input_path: str | None = None
+    # Reference to data already on the server: {"path": ...} or
+    # {"document": ..., "sourceId": ...}, optionally with a "layer".
+    source: dict[str, str] | None = None
+    # The dataset a ``source`` resolved to, and the layer to read from it.
+    source_path: str | None = None
+    source_layer: str | None = None
+    # Identifies the content of an uploaded or referenced dataset, for the
+    # result cache.
+    input_digest: str | None = None
+    # SQL statements applied in order before the operation; each reads the
+    # result of the previous one as the layer "data".
+    steps: list[str] | None = None
+    # Format asked for with "outputFormat", already applied to the options.
+    output_format: str | None = None
+    # Formats the client can read, preferred first; see ``negotiate``.
+    accepted_formats: tuple[str, ...] = ()
+
+    @classmethod
+    def from_json(
+        cls,
+        body: dict[str, Any],
+        input_path: str | None = None,
+    ) -> "ProcessingRequest":
+        """Validate a decoded JSON request body.
+
+        Args:
+            body: The request body
+            input_path: An uploaded dataset to process, instead of the
+                ``geojson`` or ``url`` of the body
+
+        Raises:
+            ValueError: With a message for the client if the body is invalid
+
+        """
+        operation = body.get("operation")
+        options = body.get("options", [])
+        geojson = body.get("geojson")
+        url = body.get("url")
+        source = body.get("source")
+        cutline_geojson = body.get("cutlineGeojson")
+        output_name = body.get("outputName", "output.geojson")
+
+        if operation not in ALLOWED_OPERATIONS:
+            raise ValueError(
+                f"Unsupported operation: {operation}. "
+                f"Allowed: {sorted(ALLOWED_OPERATIONS)}",
             )
+        inputs = [
+            name
+            for name, value in (("geojson", geojson), ("url", url), ("source", source))
+            if value
+        ]
+        if input_path is not None and inputs:
+            raise ValueError(f"Uploaded data cannot be combined with '{inputs[0]}'")
+        if len(inputs) > 1:
+            raise ValueError("Provide only one of 'geojson', 'url' or 'source'")
+        if not inputs and input_path is None:
+            raise ValueError("Missing 'geojson', 'url' or 'source' field")
+        if url is not None and not isinstance(url, str):
+            raise ValueError("'url' must be a string")
+        if source is not None:
+            _check_source(source)
+        if cutline_geojson is not None and not isinstance(cutline_geojson, str):
+            raise ValueError("'cutlineGeojson' must be a string")
+        # A cutline only makes sense alongside a raster URL (gdalwarp -cutline).
+        if cutline_geojson and not (url or source):
+            raise ValueError("'cutlineGeojson' requires a raster 'url' or 'source'")
+        if not isinstance(options, list) or not all(
+            isinstance(o, str) for o in options
+        ):
+            raise ValueError("'options' must be a list of strings")
+        steps = _parse_steps(body, operation)
+        if steps and cutline_geojson:
+            raise ValueError("'steps' cannot be combined with 'cutlineGeojson'")
+        output_format = body.get("outputFormat")
+        if output_format is not None:
+            if not isinstance(output_format, str):
+                raise ValueError("'outputFormat' must be a string")
+            options, output_name = with_output_format(
+                operation,
+                options,
+                output_name,
+                output_format,
+            )
+
+        return cls(
+            operation=operation,
+            options=options,
+            output_name=output_name,
+            geojson=geojson or None,
+            url=url or None,
+            cutline_geojson=cutline_geojson or None,
+            input_path=input_path,
+            source=source or None,
+            steps=steps,
+            output_format=output_format,
+        )
+
+    def negotiate(self, drivers: frozenset[str]) -> "ProcessingRequest":
+        """Switch the output to the first accepted format GDAL can write.
 
-        if not os.path.exists(output_path):
-            raise FileNotFoundError(
-                f"GDAL operation did not produce expected output: {safe_output_name}",
+        Only GeoJSON vector outputs and GeoTIFF raster outputs are switched,
+        and only if the request did not ask for a format itself: a client
+        asking for e.g. CSV gets CSV whatever it accepts.
+        """
+        if self.output_format is not None:
+            return self
+        driver = _output_driver(self.operation, self.options, self.output_name)
+        if driver.lower() not in {"geojson", "gtiff"}:
+            return self
+        for name in self.accepted_formats:
+            output_format = OUTPUT_FORMATS[name]
+            if (
+                self.operation in output_format.operations
+                and output_format.driver in drivers
+            ):
+                options, output_name = with_output_format(
+                    self.operation,
+                    self.options,
+                    self.output_name,
+                    name,
+                )
+                return replace(
+                    self,
+                    options=options,
+                    output_name=output_name,
+                    output_format=name,
+                )
+        return self
+
+    def run(
+        self,
+        *,
+        engine: GdalEngine | None = None,
+        progress: Callable[[float], bool] | None = None,
+        tiles: TileSettings | None = None,
+    ) -> ProcessingOutput:
+        """Run the request with the matching ``run_gdal*`` function.
+
+        ``tiles`` enables tiled execution of raster operations.
+
+        A ``source`` must have been resolved first, see
+        ``processing_sources.resolve_source``.
+        """
+        if self.source_path is not None:
+            return run_gdal_source(
+                self.operation,
+                self.options,
+                self.source_path,
+                self.output_name,
+                layer=self.source_layer,
+                engine=engine,
+                progress=progress,
+                tiles=tiles,
+                steps=self.steps,
+            )
+        if self.input_path is not None:
+            # Uploads can be far larger than inline GeoJSON.
+            return run_gdal_file(
+                self.operation,
+                self.options,
+                self.input_path,
+                self.output_name,
+                timeout=900,
+                engine=engine,
+                progress=progress,
+                tiles=tiles,
+                steps=self.steps,
+            )
+        if self.url and self.cutline_geojson:
+            return run_gdal_url_with_cutline(
+                self.operation,
+                self.options,
+                self.url,
+                self.cutline_geojson,
+                self.output_name,
+                engine=engine,
+                progress=progress,
+                tiles=tiles,
             )
+        if self.url:
+            return run_gdal_url(
+                self.operation,
+                self.options,
+                self.url,
+                self.output_name,
+                engine=engine,
+                progress=progress,
+                tiles=tiles,
+                steps=self.steps,
+            )
+        return run_gdal(
+            self.operation,
+            self.options,
+            self.geojson,
+            self.output_name,
+            engine=engine,
+            progress=progress,
+            steps=self.steps,
+        )
 
-        ext = Path(safe_output_name).suffix
-        is_binary = ext.lower() in {".tif", ".tiff", ".gpkg", ".shp"}
 
-        if is_binary:
-            with open(output_path, "rb") as f:
-                return b64encode(f.read()).decode("ascii"), "base64"
-        else:
-            with open(output_path) as f:
-                return f.read(), "text"
+@dataclass(frozen=True)
+class PipelineOperation:
+    """A vector processing operation that a pipeline step can name."""
+
+    # The SQL of the operation, as in its processing config
+    # (packages/schema/src/processing/config).
+    sql: str
+    # The kind ("number", "boolean" or "field") and default of each
+    # parameter; a parameter without a default (None) is required.
+    params: dict[str, tuple[str, Any]] = field(default_factory=dict)
+
+    def to_sql(self, params: Any, layer_name: str) -> str:
+        """Return the SQL of the operation reading ``layer_name``."""
+        if params is None:
+            params = {}
+        if not isinstance(params, dict) or not set(params) <= set(self.params):
+            raise ValueError(
+                f"Unknown parameters, expected {', '.join(self.params) or 'none'}",
+            )
+        values = {"layerName": layer_name}
+        for name, (kind, default) in self.params.items():
+            value = params.get(name, default)
+            if value is None:
+                raise ValueError(f"Missing parameter '{name}'")
+            values[name] = _sql_value(name, kind, value)
+        return self.sql.format(**values)
+
+
+def _sql_value(name: str, kind: str, value: Any) -> str:
+    if kind == "boolean":
+        if not isinstance(value, bool):
+            raise ValueError(f"'{name}' must be a boolean")
+        return "TRUE" if value else "FALSE"
+    if kind == "number":
+        if (
+            isinstance(value, bool)
+            or not isinstance(value, int | float)
+            or not math.isfinite(value)
+        ):
+            raise ValueError(f"'{name}' must be a finite number")
+        return repr(value)
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"'{name}' must be a non-empty field name")
+    return '"' + value.replace('"', '""') + '"'
+
+
+# The processing operations a pipeline step can name instead of giving SQL.
+PIPELINE_OPERATIONS = {
+    "boundingBoxes": PipelineOperation(
+        'SELECT ST_Envelope(geometry) AS geometry, * FROM "{layerName}"',
+    ),
+    "buffer": PipelineOperation(
+        "SELECT ST_Union(ST_Buffer(geometry, {bufferDistance})) AS geometry, *"
+        ' FROM "{layerName}"',
+        {"bufferDistance": ("number", 10)},
+    ),
+    "centroids": PipelineOperation(
+        'SELECT ST_Centroid(geometry) AS geometry, * FROM "{layerName}"',
+    ),
+    "concaveHull": PipelineOperation(
+        "SELECT ST_ConcaveHull(geometry, {pctconvex}, {allowHoles}) AS geometry, *"
+        ' FROM "{layerName}"',
+        {"pctconvex": ("number", 0.5), "allowHoles": ("boolean", False)},
+    ),
+    "convexHull": PipelineOperation(
+        'SELECT ST_ConvexHull(geometry) AS geometry, * FROM "{layerName}"',
+    ),
+    "dissolve": PipelineOperation(
+        "SELECT ST_Union(geometry) AS geometry, {dissolveField}"
+        ' FROM "{layerName}" GROUP BY {dissolveField}',
+        {"dissolveField": ("field", None)},
+    ),
+}
+
+
+def _step_sql(step: Any, layer_name: str) -> str:
+    if isinstance(step, str) and step.strip():
+        return step.replace("{layerName}", layer_name)
+    name = step.get("name") if isinstance(step, dict) else None
+    operation = PIPELINE_OPERATIONS.get(name) if isinstance(name, str) else None
+    if operation is None:
+        raise ValueError(
+            "Each step must be an SQL statement or name one of "
+            + ", ".join(PIPELINE_OPERATIONS),
+        )
+    try:
+        return operation.to_sql(step.get("params"), layer_name)
+    except ValueError as e:
+        raise ValueError(f"Step '{name}': {e}") from None
+
+
+def _parse_steps(body: dict[str, Any], operation: str) -> list[str] | None:
+    """Validate the pipeline ``steps`` of a request body and return their SQL.
+
+    A step is an SQL statement, or names one of the ``PIPELINE_OPERATIONS``
+    with its parameters, e.g. ``{"name": "buffer", "params":
+    {"bufferDistance": 5}}``. ``{layerName}`` in a step stands for the layer
+    it reads: the input layer (``layerName`` in the body, by default "data")
+    for the first step, the result of the previous step afterwards.
+    """
+    steps = body.get("steps")
+    if steps is None:
+        return None
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("'steps' must be a non-empty list")
+    if len(steps) > MAX_PIPELINE_STEPS:
+        raise ValueError(f"Too many steps (limit {MAX_PIPELINE_STEPS})")
+    if operation not in VECTOR_OPERATIONS:
+        raise ValueError(f"'steps' require a vector operation, not {operation}")
+    layer_name = body.get("layerName", "data")
+    if not isinstance(layer_name, str) or not layer_name:
+        raise ValueError("'layerName' must be a non-empty string")
+    return [
+        _step_sql(step, layer_name if index == 0 else "data")
+        for index, step in enumerate(steps)
+    ]
+
+
+def _check_source(source: Any) -> None:
+    if not isinstance(source, dict) or not all(
+        isinstance(value, str) for value in source.values()
+    ):
+        raise ValueError("'source' must be an object of strings")
+    if "path" in source:
+        if "document" in source or "sourceId" in source:
+            raise ValueError("'source' needs a 'path' or a 'document', not both")
+    elif "document" not in source or "sourceId" not in source:
+        raise ValueError("'source' needs a 'path', or a 'document' and a 'sourceId'")
+
+
+def describe_error(error: Exception) -> tuple[int, str]:
+    """Return the HTTP status and client message for a failed operation."""
+    if isinstance(error, SourceError):
+        return error.status, str(error)
+    if isinstance(error, subprocess.TimeoutExpired):
+        return 504, "GDAL operation timed out"
+    if isinstance(error, subprocess.CalledProcessError):
+        return 500, f"GDAL error: {(error.stderr or '').strip()}"
+    return 500, str(error)
@@ -0,0 +1,298 @@
+"""Content-addressed on-disk cache for processing results.
+
+Users iterating in a notebook often rerun the same buffer, dissolve or
+centroid operation on the same layer. Results are stored under a hash of
+everything that determines them: the operation, its options, the output
+name and the input, which is the GeoJSON itself (or the digest of an
+uploaded dataset) or a remote URL together with the validator (ETag or
+Last-Modified) the server currently reports.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .processing import ProcessingOutput, ProcessingRequest
+
+logger = logging.getLogger(__name__)
+
+# Part of every key; bumped when the stored representation changes.
+FORMAT_VERSION = 1
+
+
+# How long the version of a remote dataset is trusted before asking again.
+SOURCE_VERSION_TTL = 60.0
+MAX_SOURCE_VERSIONS = 256
+
+# URL -> (time it was looked up, version), least recently used first.
+_SOURCE_VERSIONS: OrderedDict[str, tuple[float, str | None]] = OrderedDict()
+_SOURCE_VERSIONS_LOCK = threading.Lock()
+
+
+def source_version(url: str, timeout: float = 10) -> str | None:
+    """Return the validator of a remote dataset, or None if it has none.
+
+    A dataset without an ETag or Last-Modified header can change without
+    notice, so results computed from it are not cached. The answer is
+    remembered for ``SOURCE_VERSION_TTL`` seconds, so that reruns on the
+    same dataset do not each wait for a HEAD request.
+    """
+    now = time.monotonic()
+    with _SOURCE_VERSIONS_LOCK:
+        cached = _SOURCE_VERSIONS.get(url)
+        if cached is not None and now - cached[0] < SOURCE_VERSION_TTL:
+            _SOURCE_VERSIONS.move_to_end(url)
+            return cached[1]
+
+    request = urllib.request.Request(url, method="HEAD")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            headers = response.headers
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        # Not remembered: the next run asks again.
+        logger.debug("Could not get the version of %s: %s", url, e)
+        return None
+    validator = headers.get("ETag") or headers.get("Last-Modified")
+    version = None
+    if validator is not None:
+        version = f"{validator}|{headers.get('Content-Length', '')}"
+
+    with _SOURCE_VERSIONS_LOCK:
+        _SOURCE_VERSIONS[url] = (now, version)
+        _SOURCE_VERSIONS.move_to_end(url)
+        while len(_SOURCE_VERSIONS) > MAX_SOURCE_VERSIONS:
+            _SOURCE_VERSIONS.popitem(last=False)
+    return version
+
+
+def _digest(text: str | None) -> str | None:
+    if text is None:
+        return None
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ProcessingCacheEntry:
+    """A stored processing result."""
+
+    key: str
+    name: str
+    size: int
+    path: str
+
+
+class ProcessingCache:
+    """Bounded on-disk LRU cache for processing outputs.
+
+    Each entry is stored as a ``<key>.out`` file plus a ``<key>.json``
+    metadata file. The LRU order is kept in memory and rebuilt from file
+    modification times when the server restarts. Safe to use from the
+    threads that run processing operations.
+
+    Args:
+        directory: Where cache files are written (created if missing)
+        max_size: Maximum total size of stored outputs, in bytes
+        max_entries: Maximum number of stored outputs
+
+    """
+
+    def __init__(self, directory: str, max_size: int, max_entries: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, ProcessingCacheEntry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Outputs handed out on hits; on the same filesystem as the entries so
+        # that they can be hard links rather than copies.
+        self._outputs_dir = os.path.join(directory, "outputs")
+        shutil.rmtree(self._outputs_dir, ignore_errors=True)
+        os.makedirs(self._outputs_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(request: ProcessingRequest) -> str | None:
+        """Derive the key of a request, or None if its result must not be cached.
+
+        Looks up the version of a remote input, so this may block.
+        """
+        if request.input_path is not None and request.input_digest is None:
+            return None
+        version = None
+        if request.url is not None:
+            version = source_version(request.url)
+            if version is None:
+                return None
+        material = json.dumps(
+            [
+                FORMAT_VERSION,
+                request.operation,
+                request.options,
+                Path(request.output_name).name,
+                request.input_digest or _digest(request.geojson),
+                request.url,
+                version,
+                _digest(request.cutline_geojson),
+                request.steps,
+            ],
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "size": self._size,
+            }
+
+    def get(self, key: str) -> ProcessingOutput | None:
+        """Return a copy of a stored output, marking it as most recently used.
+
+        The copy belongs to the caller, who must close it; eviction of the
+        entry does not affect it.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            output_dir = tempfile.TemporaryDirectory(dir=self._outputs_dir)
+            output_path = os.path.join(output_dir.name, entry.name)
+            try:
+                try:
+                    os.link(entry.path, output_path)
+                except OSError:
+                    shutil.copyfile(entry.path, output_path)
+                os.utime(self._meta_path(key))
+            except OSError:
+                # Evicted behind our back (e.g. the directory was cleaned up).
+                output_dir.cleanup()
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        output = ProcessingOutput(output_dir, entry.name)
+        output.cached = True
+        return output
+
+    def put(self, key: str, output: ProcessingOutput) -> None:
+        """Store a copy of ``output``, evicting least recently used entries."""
+        size = output.size
+        if size > self.max_size:
+            return
+        entry = ProcessingCacheEntry(
+            key=key,
+            name=output.name,
+            size=size,
+            path=os.path.join(self.directory, f"{key}.out"),
+        )
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(output.path, tmp_path)
+        except OSError as e:
+            logger.warning("Could not store processing result %s: %s", key, e)
+            return
+
+        with self._lock:
+            self._drop(key)
+            try:
+                Path(tmp_path).replace(entry.path)
+                self._write_meta(entry)
+            except OSError as e:
+                logger.warning("Could not store processing result %s: %s", key, e)
+                Path(tmp_path).unlink(missing_ok=True)
+                self._remove_files(key)
+                return
+            self._entries[key] = entry
+            self._size += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (
+            self._size > self.max_size or len(self._entries) > self.max_entries
+        ):
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+        self._remove_files(key)
+
+    def _remove_files(self, key: str) -> None:
+        for path in (self._meta_path(key), self._output_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Could not remove processing cache file %s: %s", path, e)
+
+    def _output_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.out")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _write_meta(self, entry: ProcessingCacheEntry) -> None:
+        tmp_path = f"{self._meta_path(entry.key)}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"name": entry.name, "size": entry.size}, f)
+        Path(tmp_path).replace(self._meta_path(entry.key))
+
+    def _load_index(self) -> None:
+        """Rebuild the in-memory index from a previous server run."""
+        found: list[tuple[float, ProcessingCacheEntry]] = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                # Left behind by a server that stopped while storing.
+                Path(self.directory, name).unlink(missing_ok=True)
+                continue
+            if not name.endswith(".json"):
+                continue
+            key = name[: -len(".json")]
+            meta_path = self._meta_path(key)
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                mtime = Path(meta_path).stat().st_mtime
+                if not os.path.exists(self._output_path(key)):
+                    raise FileNotFoundError(self._output_path(key))
+                entry = ProcessingCacheEntry(
+                    key=key,
+                    name=meta["name"],
+                    size=meta["size"],
+                    path=self._output_path(key),
+                )
+            except (OSError, ValueError, KeyError, TypeError):
+                self._remove_files(key)
+                continue
+            found.append((mtime, entry))
+
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._entries[entry.key] = entry
+            self._size += entry.size
+        self._evict()
@@ -0,0 +1,240 @@
+"""Asynchronous jobs for long-running processing operations.
+
+A synchronous processing request holds its HTTP connection, and an executor
+thread, for as long as GDAL runs: up to 15 minutes for a warp of a large
+remote raster. Jobs instead return an id immediately. They run on a
+dedicated, bounded thread pool, with a limit on how many jobs each user can
+run at once, so that one user's large warps cannot starve everyone else.
+Finished jobs keep their output until it expires.
+"""
+
+import asyncio
+import logging
+import subprocess
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from . import metrics
+from .gdal_engine import OperationCancelledError
+from .processing import ProcessingOutput, SourceError, describe_error
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = {SUCCEEDED, FAILED, CANCELLED}
+
+# Runs the operation, given a progress callback that returns False to cancel.
+JobFunction = Callable[[Callable[[float], bool]], ProcessingOutput]
+
+
+class JobLimitError(Exception):
+    """Raised when a user already has too many jobs waiting."""
+
+
+@dataclass(eq=False)
+class Job:
+    """A processing operation and its state."""
+
+    user: str
+    operation: str
+    func: JobFunction
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    progress: float = 0.0
+    # HTTP status and message describing a failure.
+    error_code: int | None = None
+    error: str | None = None
+    output: ProcessingOutput | None = None
+    # Releases the inputs of the job, such as an uploaded dataset.
+    cleanup: Callable[[], None] | None = None
+    cancel_requested: bool = False
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+
+    def to_json(self) -> dict[str, Any]:
+        """Return the job state as sent to the client."""
+        return {
+            "id": self.id,
+            "operation": self.operation,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobQueue:
+    """Run processing jobs with global and per-user concurrency limits.
+
+    All methods must be called from the IOLoop thread; only the job
+    functions themselves run on the worker threads.
+    """
+
+    def __init__(
+        self,
+        max_running: int,
+        max_running_per_user: int,
+        max_queued_per_user: int,
+        result_ttl: float,
+    ) -> None:
+        self.max_running = max(1, max_running)
+        self.max_running_per_user = max(1, max_running_per_user)
+        self.max_queued_per_user = max_queued_per_user
+        self.result_ttl = result_ttl
+        self._jobs: dict[str, Job] = {}
+        self._queue: deque[Job] = deque()
+        self._running: dict[str, int] = {}
+        # Keeps the tasks of running jobs from being garbage-collected.
+        self._tasks: set[asyncio.Task] = set()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_running,
+            thread_name_prefix="jupytergis-job",
+        )
+
+    def submit(
+        self,
+        user: str,
+        operation: str,
+        func: JobFunction,
+        cleanup: Callable[[], None] | None = None,
+    ) -> Job:
+        """Queue a job and start it as soon as the limits allow.
+
+        ``cleanup`` is called once the job has finished, whatever its outcome.
+
+        Raises:
+            JobLimitError: If the user already has too many queued jobs
+
+        """
+        queued = sum(1 for job in self._queue if job.user == user)
+        if queued >= self.max_queued_per_user:
+            raise JobLimitError(
+                f"Too many queued processing jobs (limit {self.max_queued_per_user})",
+            )
+        job = Job(user=user, operation=operation, func=func, cleanup=cleanup)
+        self._jobs[job.id] = job
+        self._queue.append(job)
+        self._schedule()
+        return job
+
+    def get(self, job_id: str, user: str) -> Job | None:
+        """Return a job of ``user``; other users' jobs are not visible."""
+        job = self._jobs.get(job_id)
+        if job is None or job.user != user:
+            return None
+        return job
+
+    def jobs(self, user: str) -> list[Job]:
+        """Return the jobs of ``user``, oldest first."""
+        return [job for job in self._jobs.values() if job.user == user]
+
+    def cancel(self, job: Job) -> None:
+        """Cancel a job; a running one stops at its next progress report."""
+        if job.status == QUEUED:
+            self._queue.remove(job)
+            self._finish(job, CANCELLED)
+        elif job.status == RUNNING:
+            job.cancel_requested = True
+
+    def remove(self, job: Job) -> None:
+        """Forget a finished job and delete its output."""
+        if self._jobs.pop(job.id, None) is not None and job.output is not None:
+            job.output.close()
+            job.output = None
+
+    def close(self) -> None:
+        """Cancel all jobs and delete their outputs."""
+        for job in list(self._jobs.values()):
+            job.cancel_requested = True
+            self.remove(job)
+        for job in self._queue:
+            self._release(job)
+        self._queue.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule(self) -> None:
+        for job in list(self._queue):
+            if sum(self._running.values()) >= self.max_running:
+                return
+            if self._running.get(job.user, 0) >= self.max_running_per_user:
+                continue
+            self._queue.remove(job)
+            self._running[job.user] = self._running.get(job.user, 0) + 1
+            task = asyncio.ensure_future(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        job.started = time.time()
+        metrics.QUEUE_WAIT.observe(job.started - job.created)
+
+        def progress(fraction: float) -> bool:
+            job.progress = fraction
+            return not job.cancel_requested
+
+        try:
+            output = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                job.func,
+                progress,
+            )
+        except OperationCancelledError:
+            self._finish(job, CANCELLED)
+        except (
+            subprocess.CalledProcessError,
+            subprocess.TimeoutExpired,
+            SourceError,
+        ) as e:
+            logger.error("Processing job %s (%s) failed: %s", job.id, job.operation, e)
+            job.error_code, job.error = describe_error(e)
+            self._finish(job, FAILED)
+        except Exception as e:
+            logger.exception("Processing job %s (%s) failed", job.id, job.operation)
+            job.error_code, job.error = describe_error(e)
+            self._finish(job, FAILED)
+        else:
+            job.output = output
+            job.progress = 1.0
+            self._finish(job, SUCCEEDED)
+        finally:
+            metrics.GDAL_DURATION.labels(job.operation).observe(
+                time.time() - job.started,
+            )
+            self._running[job.user] -= 1
+            if not self._running[job.user]:
+                del self._running[job.user]
+            self._schedule()
+
+    def _release(self, job: Job) -> None:
+        cleanup, job.cleanup = job.cleanup, None
+        if cleanup is None:
+            return
+        try:
+            cleanup()
+        except Exception:
+            logger.exception("Could not clean up processing job %s", job.id)
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished = time.time()
+        self._release(job)
+        if job.id not in self._jobs:
+            # Removed while running, e.g. on shutdown.
+            if job.output is not None:
+                job.output.close()
+            return
+        asyncio.get_running_loop().call_later(self.result_ttl, self.remove, job)
@@ -0,0 +1,151 @@
+"""Resolve references to data that is already on the server.
+
+Instead of serializing a layer to GeoJSON and posting it with every
+processing request, the frontend can name the data: a file under the server
+root, or a source of a ``.jGIS`` document. GDAL then reads the file
+directly, with the driver matching its format.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import posixpath
+from dataclasses import replace
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+from .blobs import is_blob_path
+from .jgisz import JGISArchive
+from .processing import ProcessingRequest, SourceError
+
+# Source types whose data is a file named by their ``path`` parameter.
+PATH_SOURCE_TYPES = {
+    "GeoJSONSource",
+    "GeoPackageRasterSource",
+    "GeoPackageVectorSource",
+    "GeoParquetSource",
+    "ShapefileSource",
+}
+
+
+def resolve_path(root_dir: str, path: str) -> str:
+    """Return the absolute path of a file below ``root_dir``.
+
+    Raises:
+        SourceError: If the path leaves ``root_dir`` or is not a file
+
+    """
+    root = os.path.realpath(root_dir)
+    resolved = os.path.realpath(os.path.join(root, path.lstrip("/")))
+    if os.path.commonpath([root, resolved]) != root:
+        raise SourceError(f"Path is outside the server root: {path}", status=403)
+    if not Path(resolved).is_file():
+        raise SourceError(f"No such file: {path}", status=404)
+    return resolved
+
+
+def file_digest(path: str, layer: str | None = None) -> str:
+    """Identify the content of a dataset without reading it.
+
+    Combines the size and modification time of the file and of its
+    sidecars, such as the ``.dbf`` of a shapefile or the ``-wal`` of a
+    GeoPackage.
+    """
+    dataset = Path(path)
+    files = []
+    for file in sorted(dataset.parent.glob(f"{glob.escape(dataset.stem)}.*")):
+        stat = file.stat()
+        files.append([file.name, stat.st_size, stat.st_mtime_ns])
+    material = json.dumps([path, layer, files])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _document_source(root_dir: str, document: str, source_id: str) -> dict[str, Any]:
+    document_path = resolve_path(root_dir, document)
+    try:
+        if document_path.lower().endswith(".jgisz"):
+            # Only the requested source is decoded.
+            archive = JGISArchive(Path(document_path).read_bytes())
+            found = source_id in archive.source_ids
+            source = archive.source(source_id) if found else None
+        else:
+            with open(document_path) as f:
+                content = json.load(f)
+            sources = content.get("sources") if isinstance(content, dict) else None
+            source = sources.get(source_id) if isinstance(sources, dict) else None
+    except (OSError, ValueError) as e:
+        raise SourceError(f"Cannot read {document}: {e}") from e
+    if not isinstance(source, dict):
+        raise SourceError(f"No source {source_id} in {document}", status=404)
+    return source
+
+
+def _source_location(source: dict[str, Any]) -> tuple[str | None, str | None]:
+    """Return the path or URL of a document source, and the layer to read."""
+    source_type = source.get("type")
+    parameters = source.get("parameters") or {}
+    if source_type == "GeoTiffSource":
+        urls = parameters.get("urls") or [{}]
+        return urls[0].get("url"), None
+    if source_type not in PATH_SOURCE_TYPES:
+        raise SourceError(f"{source_type} sources cannot be processed on the server")
+    blob = parameters.get("blob")
+    if source_type == "GeoJSONSource" and isinstance(blob, dict):
+        if not is_blob_path(blob.get("path", "")):
+            raise SourceError(f"Invalid blob reference: {blob.get('path')}")
+        return blob["path"], None
+    layer = None
+    if source_type == "GeoPackageVectorSource":
+        # Comma-separated; an empty list stands for all tables.
+        tables = [t.strip() for t in parameters.get("tables", "").split(",")]
+        layer = next((t for t in tables if t), None)
+    return parameters.get("path"), layer
+
+
+def resolve_source(request: ProcessingRequest, root_dir: str) -> ProcessingRequest:
+    """Turn the ``source`` of a request into the data GDAL reads.
+
+    Paths are relative to ``root_dir``, and paths in a document to the
+    directory of the document, as in the frontend. A document source may
+    also resolve to a remote URL or to its inline GeoJSON. Reads the
+    document, so this blocks.
+
+    Raises:
+        SourceError: If the reference cannot be resolved
+
+    """
+    reference = request.source
+    if reference is None:
+        return request
+    layer = reference.get("layer")
+
+    if "path" in reference:
+        path = resolve_path(root_dir, reference["path"])
+    else:
+        document = reference["document"]
+        source = _document_source(root_dir, document, reference["sourceId"])
+        location, source_layer = _source_location(source)
+        layer = layer or source_layer
+        if not location:
+            data = (source.get("parameters") or {}).get("data")
+            if source.get("type") == "GeoJSONSource" and data:
+                return replace(request, geojson=json.dumps(data))
+            raise SourceError(f"Source {reference['sourceId']} has no data")
+        if urlparse(location).scheme in {"http", "https"}:
+            return replace(request, url=location)
+        path = resolve_path(
+            root_dir,
+            posixpath.join(posixpath.dirname(document.lstrip("/")), location),
+        )
+
+    if request.cutline_geojson:
+        raise SourceError("'cutlineGeojson' requires a remote raster source")
+    digest = file_digest(path, layer)
+    if path.lower().endswith(".zip"):
+        # A zipped shapefile.
+        path = f"/vsizip/{path}"
+    elif is_blob_path(path):
+        path = f"/vsigzip/{path}"
+    return replace(request, source_path=path, source_layer=layer, input_digest=digest)
@@ -0,0 +1,488 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from tornado.httputil import HTTPHeaders
+
+logger = logging.getLogger(__name__)
+
+# Responses we are willing to store (RFC 9110 "heuristically cacheable" codes
+# minus redirects, which the upstream client already follows).
+CACHEABLE_STATUS_CODES = {200, 203}
+
+# Upper bound for heuristic freshness when the upstream only sends
+# Last-Modified (RFC 9111 §4.2.2 suggests 10% of the document's age).
+MAX_HEURISTIC_LIFETIME = 24 * 60 * 60
+
+# Part of every key; bumped when the stored representation changes so that
+# older entries are never matched and age out through eviction. Version 2
+# stores bodies with their upstream Content-Encoding instead of decoded.
+FORMAT_VERSION = 2
+
+
+def parse_cache_control(value: str | None) -> dict[str, str | None]:
+    """Parse a Cache-Control header into a directive → argument mapping.
+
+    Directive names are lower-cased; directives without an argument map to
+    ``None``.
+    """
+    directives: dict[str, str | None] = {}
+    if not value:
+        return directives
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip().strip('"') if arg else None
+    return directives
+
+
+def _parse_http_date(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _parse_seconds(value: str | None) -> int | None:
+    try:
+        return max(0, int(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def freshness_lifetime(headers: HTTPHeaders, now: float) -> float:
+    """Compute how long a response may be served without revalidation.
+
+    Follows RFC 9111 §4.2.1 for a shared cache: ``s-maxage`` wins over
+    ``max-age``, which wins over ``Expires``; otherwise a heuristic based on
+    ``Last-Modified`` is used.
+    """
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    for name in ("s-maxage", "max-age"):
+        seconds = _parse_seconds(directives.get(name))
+        if seconds is not None:
+            return seconds
+
+    date = _parse_http_date(headers.get("Date")) or now
+    expires = headers.get("Expires")
+    if expires is not None:
+        expires_at = _parse_http_date(expires)
+        # An invalid Expires value (e.g. "0") means "already expired".
+        return max(0.0, expires_at - date) if expires_at is not None else 0.0
+
+    last_modified = _parse_http_date(headers.get("Last-Modified"))
+    if last_modified is not None and last_modified < date:
+        return min((date - last_modified) / 10, MAX_HEURISTIC_LIFETIME)
+
+    return 0.0
+
+
+def is_storable(
+    status: int,
+    headers: HTTPHeaders,
+    request_headers: dict[str, str] | None = None,
+) -> bool:
+    """Whether a shared cache may store this response (RFC 9111 §3)."""
+    if status not in CACHEABLE_STATUS_CODES:
+        return False
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-store" in directives or "private" in directives:
+        return False
+    if headers.get("Vary", "").strip() == "*":
+        return False
+    has_authorization = any(
+        k.lower() == "authorization" for k in (request_headers or {})
+    )
+    if has_authorization and not (
+        {"public", "s-maxage", "must-revalidate"} & directives.keys()
+    ):
+        return False
+    # Without a validator or an explicit lifetime the entry would be stale on
+    # arrival and could never be revalidated, so storing it is pointless.
+    return bool(
+        headers.get("ETag")
+        or headers.get("Last-Modified")
+        or freshness_lifetime(headers, time.time()) > 0,
+    )
+
+
+@dataclass
+class CacheEntry:
+    """A stored upstream response."""
+
+    key: str
+    url: str
+    status: int
+    header_pairs: list[tuple[str, str]]
+    stored_at: float
+    lifetime: float
+    initial_age: float
+    size: int
+    body_path: str = field(repr=False)
+
+    @property
+    def headers(self) -> HTTPHeaders:
+        headers = HTTPHeaders()
+        for name, value in self.header_pairs:
+            headers.add(name, value)
+        return headers
+
+    def age(self, now: float | None = None) -> float:
+        return self.initial_age + ((now or time.time()) - self.stored_at)
+
+    def is_fresh(self, now: float | None = None) -> bool:
+        directives = parse_cache_control(self.headers.get("Cache-Control"))
+        if "no-cache" in directives:
+            return False
+        return self.age(now) < self.lifetime
+
+    def conditional_headers(self) -> dict[str, str]:
+        """Headers turning the next upstream fetch into a revalidation."""
+        conditional = {}
+        headers = self.headers
+        if "ETag" in headers:
+            conditional["If-None-Match"] = headers["ETag"]
+        if "Last-Modified" in headers:
+            conditional["If-Modified-Since"] = headers["Last-Modified"]
+        return conditional
+
+    def read_body(self) -> bytes:
+        with open(self.body_path, "rb") as f:
+            return f.read()
+
+    def iter_body(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Read the stored body in blocks, keeping memory use constant."""
+        with open(self.body_path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+
+class ProxyCache:
+    """Bounded on-disk LRU cache for upstream proxy responses.
+
+    Each entry is stored as a ``<key>.body`` file plus a ``<key>.json``
+    metadata file. The LRU order is kept in memory and rebuilt from file
+    modification times when the server restarts.
+
+    The methods touch the disk; callers on the IOLoop run them on
+    ``executor``, whose single thread also keeps them from racing on the
+    index.
+
+    Args:
+        directory: Where cache files are written (created if missing)
+        max_size: Maximum total size of stored bodies, in bytes
+        max_entries: Maximum number of stored responses
+
+    """
+
+    def __init__(self, directory: str, max_size: int, max_entries: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+        self.executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="jupytergis-proxy-cache",
+        )
+
+    def close(self) -> None:
+        """Finish the pending file operations."""
+        self.executor.shutdown(wait=True)
+
+    @staticmethod
+    def make_key(
+        method: str,
+        url: str,
+        headers: dict[str, str] | None = None,
+    ) -> str:
+        """Derive the cache key from the request method, URL and forwarded headers."""
+        normalized = sorted((k.lower(), v) for k, v in (headers or {}).items())
+        material = json.dumps([FORMAT_VERSION, method.upper(), url, normalized])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "size": self._size,
+        }
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Look up an entry, marking it as most recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        try:
+            os.utime(self._meta_path(key))
+        except OSError:
+            # Evicted behind our back (e.g. the directory was cleaned up).
+            self._drop(key)
+            return None
+        return entry
+
+    def record_hit(self) -> None:
+        self.hits += 1
+
+    def record_miss(self) -> None:
+        self.misses += 1
+
+    def open_writer(self, key: str, url: str) -> "CacheWriter":
+        """Start storing a response whose body arrives in chunks."""
+        return CacheWriter(self, key, url)
+
+    def put(
+        self,
+        key: str,
+        url: str,
+        status: int,
+        headers: HTTPHeaders,
+        body: bytes,
+    ) -> CacheEntry | None:
+        """Store a response, evicting least recently used entries as needed.
+
+        Returns the new entry, or None if the body does not fit in the cache.
+        """
+        writer = self.open_writer(key, url)
+        writer.write(body)
+        return writer.commit(status, headers)
+
+    def _commit(
+        self,
+        writer: "CacheWriter",
+        status: int,
+        headers: HTTPHeaders,
+        tmp_path: str,
+    ) -> CacheEntry | None:
+        now = time.time()
+        entry = CacheEntry(
+            key=writer.key,
+            url=writer.url,
+            status=status,
+            header_pairs=list(headers.get_all()),
+            stored_at=now,
+            lifetime=freshness_lifetime(headers, now),
+            initial_age=float(_parse_seconds(headers.get("Age")) or 0),
+            size=writer.size,
+            body_path=self._body_path(writer.key),
+        )
+        self._drop(entry.key)
+        try:
+            Path(tmp_path).replace(entry.body_path)
+            self._write_meta(entry)
+        except OSError as e:
+            logger.warning(
+                "Could not write proxy cache entry for %s: %s",
+                entry.url,
+                e,
+            )
+            self._remove_files(entry.key)
+            return None
+        self._entries[entry.key] = entry
+        self._size += entry.size
+        self._evict()
+        return entry
+
+    def refresh(self, key: str, headers: HTTPHeaders) -> CacheEntry | None:
+        """Update a stored entry after a ``304 Not Modified`` revalidation."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.revalidations += 1
+        merged = entry.headers
+        for name in ("Cache-Control", "Expires", "Date", "ETag", "Last-Modified"):
+            if name in headers:
+                merged[name] = headers[name]
+        now = time.time()
+        entry.header_pairs = list(merged.get_all())
+        entry.stored_at = now
+        entry.lifetime = freshness_lifetime(merged, now)
+        entry.initial_age = float(_parse_seconds(headers.get("Age")) or 0)
+        try:
+            self._write_meta(entry)
+        except OSError as e:
+            logger.warning("Could not refresh proxy cache entry %s: %s", key, e)
+        return entry
+
+    def invalidate(self, key: str) -> None:
+        self._drop(key)
+
+    def _evict(self) -> None:
+        while self._entries and (
+            self._size > self.max_size or len(self._entries) > self.max_entries
+        ):
+            key = next(iter(self._entries))
+            self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+        self._remove_files(key)
+
+    def _remove_files(self, key: str) -> None:
+        for path in (self._meta_path(key), self._body_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Could not remove proxy cache file %s: %s", path, e)
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.body")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        Path(tmp_path).replace(path)
+
+    def _write_meta(self, entry: CacheEntry) -> None:
+        meta = {
+            "url": entry.url,
+            "status": entry.status,
+            "headers": entry.header_pairs,
+            "stored_at": entry.stored_at,
+            "lifetime": entry.lifetime,
+            "initial_age": entry.initial_age,
+            "size": entry.size,
+        }
+        self._write_atomic(self._meta_path(entry.key), json.dumps(meta).encode())
+
+    def _load_index(self) -> None:
+        """Rebuild the in-memory index from a previous server run."""
+        found: list[tuple[float, CacheEntry]] = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                # Left behind by a server that stopped mid-download.
+                Path(self.directory, name).unlink(missing_ok=True)
+                continue
+            if not name.endswith(".json"):
+                continue
+            key = name[: -len(".json")]
+            meta_path = self._meta_path(key)
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                mtime = Path(meta_path).stat().st_mtime
+                if not os.path.exists(self._body_path(key)):
+                    raise FileNotFoundError(self._body_path(key))
+                entry = CacheEntry(
+                    key=key,
+                    url=meta["url"],
+                    status=meta["status"],
+                    header_pairs=[tuple(pair) for pair in meta["headers"]],
+                    stored_at=meta["stored_at"],
+                    lifetime=meta["lifetime"],
+                    initial_age=meta["initial_age"],
+                    size=meta["size"],
+                    body_path=self._body_path(key),
+                )
+            except (OSError, ValueError, KeyError, TypeError):
+                self._remove_files(key)
+                continue
+            found.append((mtime, entry))
+
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._entries[entry.key] = entry
+            self._size += entry.size
+        self._evict()
+
+
+class CacheWriter:
+    """Write a response body into the cache chunk by chunk.
+
+    Used while a response is streamed to the client so that the body is
+    never held in memory. Nothing is visible to cache readers until
+    ``commit`` is called; bodies outgrowing the cache are dropped. The
+    temporary file is only created by the first write or the commit, so that
+    creating a writer does not touch the disk.
+    """
+
+    def __init__(self, cache: ProxyCache, key: str, url: str) -> None:
+        self.cache = cache
+        self.key = key
+        self.url = url
+        self.size = 0
+        self._file: BinaryIO | None = None
+        self._tmp_path = ""
+        self._closed = False
+
+    def _open(self) -> bool:
+        if self._file is None and not self._closed:
+            try:
+                fd, self._tmp_path = tempfile.mkstemp(
+                    dir=self.cache.directory,
+                    suffix=".tmp",
+                )
+                self._file = os.fdopen(fd, "wb")
+            except OSError as e:
+                logger.warning(
+                    "Could not create proxy cache entry for %s: %s",
+                    self.url,
+                    e,
+                )
+                self._closed = True
+        return self._file is not None
+
+    def write(self, chunk: bytes) -> None:
+        if not self._open():
+            return
+        self.size += len(chunk)
+        if self.size > self.cache.max_size:
+            self.abort()
+            return
+        try:
+            self._file.write(chunk)
+        except OSError as e:
+            logger.warning("Could not write proxy cache entry for %s: %s", self.url, e)
+            self.abort()
+
+    def commit(self, status: int, headers: HTTPHeaders) -> CacheEntry | None:
+        """Publish the written body as a cache entry."""
+        if not self._open():
+            return None
+        self._file.close()
+        self._file = None
+        self._closed = True
+        return self.cache._commit(self, status, headers, self._tmp_path)
+
+    def abort(self) -> None:
+        """Discard everything written so far."""
+        self._closed = True
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        Path(self._tmp_path).unlink(missing_ok=True)
@@ -0,0 +1,243 @@
+"""Content-Encoding negotiation for the proxy endpoint.
+
+Upstream bodies are fetched and cached as the upstream server sent them.
+When they reach a client, a body whose encoding the client accepts is
+passed through untouched; otherwise it is decoded on the fly. Optionally,
+uncompressed text payloads are compressed with the best encoding the
+client accepts.
+
+gzip and deflate are always available; br and zstd are used when the
+``brotli`` and ``zstandard`` packages are installed.
+"""
+
+import zlib
+from collections.abc import Callable
+from dataclasses import dataclass
+
+# Preferred first when compressing for a client.
+_PREFERENCE = ("zstd", "br", "gzip")
+
+_COMPRESSIBLE_TYPES = {
+    "application/geo+json",
+    "application/javascript",
+    "application/json",
+    "application/vnd.mapbox-vector-tile",
+    "application/x-protobuf",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+@dataclass
+class _Stage:
+    """One streaming encode or decode step."""
+
+    process: Callable[[bytes], bytes]
+    flush: Callable[[], bytes]
+
+
+def _zlib_decoder(wbits: int) -> Callable[[], _Stage]:
+    def make() -> _Stage:
+        decompressor = zlib.decompressobj(wbits)
+        return _Stage(decompressor.decompress, decompressor.flush)
+
+    return make
+
+
+class _DeflateDecoder:
+    """Decode a zlib-wrapped deflate body, or the raw deflate some servers send."""
+
+    def __init__(self) -> None:
+        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS)
+        # The input so far, until the two bytes of the zlib header are seen.
+        self._head: bytes | None = b""
+
+    def process(self, chunk: bytes) -> bytes:
+        if self._head is None:
+            return self._decompressor.decompress(chunk)
+        self._head += chunk
+        try:
+            data = self._decompressor.decompress(chunk)
+        except zlib.error:
+            # No zlib header: start over as raw deflate.
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            head, self._head = self._head, None
+            return self._decompressor.decompress(head)
+        if len(self._head) >= 2:
+            self._head = None
+        return data
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+
+def _deflate_decoder() -> _Stage:
+    decoder = _DeflateDecoder()
+    return _Stage(decoder.process, decoder.flush)
+
+
+def _gzip_encoder() -> _Stage:
+    compressor = zlib.compressobj(5, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return _Stage(compressor.compress, compressor.flush)
+
+
+_DECODERS: dict[str, Callable[[], _Stage]] = {
+    "gzip": _zlib_decoder(16 + zlib.MAX_WBITS),
+    "x-gzip": _zlib_decoder(16 + zlib.MAX_WBITS),
+    "deflate": _deflate_decoder,
+}
+_ENCODERS: dict[str, Callable[[], _Stage]] = {"gzip": _gzip_encoder}
+
+try:
+    import brotli
+except ImportError:
+    pass
+else:
+
+    def _brotli_decoder() -> _Stage:
+        decompressor = brotli.Decompressor()
+        return _Stage(decompressor.process, lambda: b"")
+
+    def _brotli_encoder() -> _Stage:
+        compressor = brotli.Compressor(quality=4)
+        return _Stage(compressor.process, compressor.finish)
+
+    _DECODERS["br"] = _brotli_decoder
+    _ENCODERS["br"] = _brotli_encoder
+
+try:
+    import zstandard
+except ImportError:
+    pass
+else:
+
+    def _zstd_decoder() -> _Stage:
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        return _Stage(decompressor.decompress, lambda: b"")
+
+    def _zstd_encoder() -> _Stage:
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        return _Stage(compressor.compress, compressor.flush)
+
+    _DECODERS["zstd"] = _zstd_decoder
+    _ENCODERS["zstd"] = _zstd_encoder
+
+# Sent upstream: every encoding the proxy can decode for a client that
+# does not accept it.
+UPSTREAM_ACCEPT_ENCODING = ", ".join(
+    encoding for encoding in _DECODERS if not encoding.startswith("x-")
+)
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Return the content codings a client accepts.
+
+    Args:
+        accept_encoding: The client's ``Accept-Encoding`` header value
+
+    """
+    accepted = {"identity"}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        qvalue = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                qvalue = float(value)
+            except ValueError:
+                continue
+        if coding == "*":
+            if qvalue > 0:
+                accepted.update(_DECODERS)
+        elif qvalue > 0:
+            accepted.add(coding)
+        else:
+            accepted.discard(coding)
+    return accepted
+
+
+def is_compressible(content_type: str) -> bool:
+    """Whether a payload of this media type is worth compressing."""
+    media_type = content_type.partition(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in _COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+class BodyTranscoder:
+    """Re-encode a body chunk by chunk through a chain of stages."""
+
+    def __init__(self, stages: list[_Stage]) -> None:
+        self._stages = stages
+
+    def process(self, chunk: bytes) -> bytes:
+        """Transcode the next chunk; the output may be empty."""
+        for stage in self._stages:
+            chunk = stage.process(chunk)
+        return chunk
+
+    def flush(self) -> bytes:
+        """Return whatever the stages still hold, at the end of the body."""
+        data = b""
+        for stage in self._stages:
+            data = (stage.process(data) if data else b"") + stage.flush()
+        return data
+
+    def transcode(self, body: bytes) -> bytes:
+        """Transcode a complete body."""
+        return self.process(body) + self.flush()
+
+
+@dataclass
+class Negotiation:
+    """How a body is sent to a client."""
+
+    # Content-Encoding of the body sent to the client, None for identity.
+    content_encoding: str | None
+    # None when the body is passed through as it is.
+    transcoder: BodyTranscoder | None
+
+
+def negotiate(
+    upstream_encoding: str | None,
+    accept_encoding: str,
+    content_type: str = "",
+    content_length: int | None = None,
+    compress_min_size: int | None = None,
+) -> Negotiation:
+    """Decide how to send a body with ``upstream_encoding`` to a client.
+
+    Args:
+        upstream_encoding: The ``Content-Encoding`` of the body as stored
+        accept_encoding: The client's ``Accept-Encoding`` header value
+        content_type: The body's media type
+        content_length: The body's size as stored, if known
+        compress_min_size: Compress uncompressed compressible bodies of at
+            least this size (or of unknown size); None disables compression.
+
+    """
+    encoding = (upstream_encoding or "identity").strip().lower()
+    accepted = accepted_encodings(accept_encoding)
+    if encoding != "identity" and (encoding in accepted or encoding not in _DECODERS):
+        # Accepted, or an encoding the proxy cannot decode anyway.
+        return Negotiation(upstream_encoding, None)
+
+    stages = [] if encoding == "identity" else [_DECODERS[encoding]()]
+    target = None
+    if (
+        compress_min_size is not None
+        and is_compressible(content_type)
+        and (content_length is None or content_length >= compress_min_size)
+    ):
+        target = next(
+            (name for name in _PREFERENCE if name in _ENCODERS and name in accepted),
+            None,
+        )
+    if target is not None:
+        stages.append(_ENCODERS[target]())
+    return Negotiation(target, BodyTranscoder(stages) if stages else None)
@@ -0,0 +1,75 @@
+"""Single-flight deduplication of identical proxy requests.
+
+Collaborators opening the same document request the same tiles and files
+at the same moment. ``SingleFlight`` lets the first of several identical
+in-flight GET requests (the leader) fetch from upstream, while the others
+wait and are answered with a copy of the leader's response.
+"""
+
+import asyncio
+from dataclasses import dataclass
+
+from tornado.httputil import HTTPHeaders
+
+
+@dataclass
+class SharedResponse:
+    """A complete response recorded by a leader for its followers."""
+
+    code: int
+    headers: HTTPHeaders
+    body: bytes
+
+
+class SingleFlight:
+    """Table of in-flight requests, keyed like the response cache."""
+
+    def __init__(self) -> None:
+        self._flights: dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.deduplicated = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return counters for monitoring."""
+        return {
+            "leaders": self.leaders,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._flights),
+        }
+
+    def join(self, key: str) -> asyncio.Future | None:
+        """Return the future of an identical request in flight, if any.
+
+        The future resolves to the leader's ``SharedResponse``, or to None
+        when the leader could not record its response (too large, or its
+        client went away); followers must then fetch on their own. Errors
+        raised by the leader are raised in the followers too.
+        """
+        future = self._flights.get(key)
+        if future is None:
+            return None
+        self.deduplicated += 1
+        # Followers must not cancel the flight when they are cancelled.
+        return asyncio.shield(future)
+
+    def lead(self, key: str) -> None:
+        """Register the caller as the leader for ``key``."""
+        self.leaders += 1
+        self._flights[key] = asyncio.get_running_loop().create_future()
+
+    def land(
+        self,
+        key: str,
+        response: SharedResponse | None = None,
+        error: BaseException | None = None,
+    ) -> None:
+        """Complete the flight for ``key`` and release its followers."""
+        future = self._flights.pop(key, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+            # Not every flight has followers to retrieve the error.
+            future.exception()
+        else:
+            future.set_result(response)
@@ -0,0 +1,247 @@
+"""Byte-range support for the proxy endpoint.
+
+Cloud-Optimized GeoTIFF and GeoParquet readers fetch many small byte ranges
+of the same file at once (a header, then the tiles or row groups covering
+the view). ``RangeCoalescer`` briefly batches concurrent range requests for
+the same URL, merges those that touch or nearly touch, and answers each of
+them from a single upstream request per merged span.
+"""
+
+import asyncio
+import logging
+import re
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from tornado.httpclient import HTTPResponse
+from tornado.httputil import HTTPHeaders
+
+logger = logging.getLogger(__name__)
+
+_BYTE_RANGE_RE = re.compile(r"^\s*bytes\s*=\s*(\d+)\s*-\s*(\d+)\s*$", re.IGNORECASE)
+_CONTENT_RANGE_RE = re.compile(
+    r"^\s*bytes\s+(\d+)\s*-\s*(\d+)\s*/\s*(\d+|\*)\s*$",
+    re.IGNORECASE,
+)
+
+# Headers describing the full upstream body, not the slice sent to a client.
+_SLICE_HEADERS = ("Content-Range", "Content-Length", "Content-Encoding")
+
+
+def parse_byte_range(value: str) -> tuple[int, int] | None:
+    """Parse a single ``bytes=start-end`` range with both bounds given.
+
+    Suffix (``bytes=-500``), open-ended (``bytes=100-``) and multi-range
+    values are valid HTTP but return None: they are forwarded as they are
+    rather than coalesced.
+    """
+    match = _BYTE_RANGE_RE.match(value)
+    if match is None:
+        return None
+    start, end = int(match.group(1)), int(match.group(2))
+    if end < start:
+        return None
+    return start, end
+
+
+def parse_content_range(value: str) -> tuple[int, int, int | None] | None:
+    """Parse ``bytes start-end/total`` into (start, end, total or None)."""
+    match = _CONTENT_RANGE_RE.match(value)
+    if match is None:
+        return None
+    total = match.group(3)
+    return (
+        int(match.group(1)),
+        int(match.group(2)),
+        (None if total == "*" else int(total)),
+    )
+
+
+@dataclass
+class RangeResponse:
+    """A byte range cut out of a coalesced upstream response."""
+
+    headers: HTTPHeaders
+    content_range: str
+    body: bytes
+
+
+class RangeNotSatisfiableError(Exception):
+    """Raised when a range lies entirely beyond the end of the resource."""
+
+    def __init__(self, total: int) -> None:
+        super().__init__(f"Range not satisfiable, resource size is {total}")
+        self.total = total
+
+
+@dataclass
+class _Waiter:
+    start: int
+    end: int
+    future: asyncio.Future = field(repr=False)
+
+
+# Fetches the given inclusive byte span of the batched URL.
+SpanFetcher = Callable[[int, int], Awaitable[HTTPResponse]]
+
+
+class RangeCoalescer:
+    """Merge concurrent range requests for the same resource.
+
+    Requests arriving within ``window`` seconds of the first one for a key
+    are batched. Ranges separated by at most ``max_gap`` bytes are merged
+    into one upstream request, as long as the merged span stays within
+    ``max_span`` bytes; the bytes in the gaps are fetched and discarded,
+    which is cheaper than another round trip.
+    """
+
+    def __init__(self, window: float, max_gap: int, max_span: int) -> None:
+        self.window = window
+        self.max_gap = max_gap
+        self.max_span = max_span
+        self._batches: dict[str, list[_Waiter]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.requests = 0
+        self.upstream_requests = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return counters for monitoring."""
+        return {
+            "requests": self.requests,
+            "upstream_requests": self.upstream_requests,
+            "coalesced": self.requests - self.upstream_requests,
+        }
+
+    async def fetch(
+        self,
+        key: str,
+        start: int,
+        end: int,
+        fetch_span: SpanFetcher,
+    ) -> RangeResponse:
+        """Fetch bytes ``start`` to ``end`` (inclusive) of a resource.
+
+        Args:
+            key: Identifies the resource; only requests with the same key
+                (same URL and forwarded headers) are merged.
+            start: First byte requested
+            end: Last byte requested
+            fetch_span: Issues the upstream request for a merged span. The
+                function of the request that opened the batch is used for
+                the whole batch.
+
+        Raises:
+            RangeNotSatisfiableError: If ``start`` is past the end of the
+                resource.
+
+        """
+        self.requests += 1
+        waiter = _Waiter(start, end, asyncio.get_running_loop().create_future())
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = []
+            asyncio.get_running_loop().call_later(
+                self.window,
+                self._dispatch,
+                key,
+                fetch_span,
+            )
+        batch.append(waiter)
+        return await waiter.future
+
+    def _dispatch(self, key: str, fetch_span: SpanFetcher) -> None:
+        waiters = sorted(self._batches.pop(key), key=lambda w: w.start)
+        span = [waiters[0]]
+        span_end = waiters[0].end
+        for waiter in waiters[1:]:
+            merged_end = max(span_end, waiter.end)
+            if (
+                waiter.start <= span_end + 1 + self.max_gap
+                and merged_end - span[0].start + 1 <= self.max_span
+            ):
+                span.append(waiter)
+                span_end = merged_end
+            else:
+                self._start_span(span, span_end, fetch_span)
+                span = [waiter]
+                span_end = waiter.end
+        self._start_span(span, span_end, fetch_span)
+
+    def _start_span(
+        self,
+        waiters: list[_Waiter],
+        end: int,
+        fetch_span: SpanFetcher,
+    ) -> None:
+        self.upstream_requests += 1
+        if len(waiters) > 1:
+            logger.debug(
+                "Coalescing %d range requests into bytes=%d-%d",
+                len(waiters),
+                waiters[0].start,
+                end,
+            )
+        task = asyncio.ensure_future(
+            self._fetch_span(waiters, waiters[0].start, end, fetch_span),
+        )
+        # Keep a reference so the task is not garbage collected mid-flight.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch_span(
+        self,
+        waiters: list[_Waiter],
+        start: int,
+        end: int,
+        fetch_span: SpanFetcher,
+    ) -> None:
+        try:
+            response = await fetch_span(start, end)
+        except Exception as e:  # noqa: BLE001 - re-raised in every waiter
+            for waiter in waiters:
+                if not waiter.future.done():
+                    waiter.future.set_exception(e)
+            return
+
+        body = response.body or b""
+        body_start, total = 0, len(body)
+        if response.code == 206:
+            content_range = parse_content_range(
+                response.headers.get("Content-Range", ""),
+            )
+            if content_range is None:
+                error = ValueError("Upstream sent 206 without a valid Content-Range")
+                for waiter in waiters:
+                    if not waiter.future.done():
+                        waiter.future.set_exception(error)
+                return
+            body_start, _, total = content_range
+        # Otherwise the upstream ignored Range and sent the whole resource.
+
+        headers = HTTPHeaders()
+        for name, value in response.headers.get_all():
+            if name not in _SLICE_HEADERS:
+                headers.add(name, value)
+
+        body_end = body_start + len(body) - 1
+        for waiter in waiters:
+            if waiter.future.done():
+                continue
+            if total is not None and waiter.start >= total:
+                waiter.future.set_exception(RangeNotSatisfiableError(total))
+                continue
+            last = min(waiter.end, body_end)
+            if waiter.start < body_start or last < waiter.start:
+                waiter.future.set_exception(
+                    ValueError("Upstream returned a different range than requested"),
+                )
+                continue
+            waiter.future.set_result(
+                RangeResponse(
+                    headers=headers,
+                    content_range=(
+                        f"bytes {waiter.start}-{last}/{'*' if total is None else total}"
+                    ),
+                    body=body[waiter.start - body_start : last - body_start + 1],
+                ),
+            )
@@ -0,0 +1,62 @@
+"""Token-bucket rate limiting for the proxy endpoint."""
+
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets with constant-time checks.
+
+    Each key (for the proxy: a user and an upstream host) gets a bucket of
+    ``burst`` tokens, refilled continuously at ``rate`` tokens per second;
+    every request takes one. Buckets are kept in least-recently-used order
+    so that idle ones, which have refilled completely and are therefore
+    indistinguishable from new ones, can be dropped from the front.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        # key -> (tokens, time of last update)
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+        self._refill_time = burst / rate
+
+    def __len__(self) -> int:
+        """Return the number of buckets currently tracked."""
+        return len(self._buckets)
+
+    def acquire(self, key: Hashable, now: float | None = None) -> float:
+        """Take a token from the bucket for ``key``.
+
+        Args:
+            key: The bucket to take from
+            now: Current ``time.monotonic()`` value, for testing
+
+        Returns:
+            0 if the request is allowed, otherwise the number of seconds
+            until a token becomes available.
+
+        """
+        if now is None:
+            now = time.monotonic()
+        self._prune(now)
+
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+    def _prune(self, now: float) -> None:
+        # At most a couple of buckets go idle per request, so this stays O(1)
+        # amortized.
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < self._refill_time:
+                break
+            del self._buckets[key]
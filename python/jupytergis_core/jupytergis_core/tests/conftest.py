@@ -0,0 +1,23 @@
+import tempfile
+
+import pytest
+
+from jupytergis_core.processing import ProcessingOutput
+
+
+@pytest.fixture
+def make_output(tmp_path_factory):
+    """Return a factory of processing outputs, removed after the test."""
+    directory = tmp_path_factory.mktemp("outputs")
+    outputs = []
+
+    def make(content=b"{}", name="out.geojson"):
+        output = ProcessingOutput(tempfile.TemporaryDirectory(dir=directory), name)
+        with open(output.path, "wb") as f:
+            f.write(content)
+        outputs.append(output)
+        return output
+
+    yield make
+    for output in outputs:
+        output.close()
@@ -0,0 +1,75 @@
+import gzip
+import json
+
+from jupytergis_core.blobs import (
+    BLOB_DIR,
+    is_blob_path,
+    summarize,
+    write_blob,
+)
+from jupytergis_core.processing import ProcessingRequest
+from jupytergis_core.processing_sources import resolve_source
+
+DATA = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [3, -1]},
+            "properties": {},
+        },
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[0, 0], [10, 0], [10, 5], [0, 0]]],
+            },
+            "properties": {},
+        },
+        {"type": "Feature", "geometry": None, "properties": {}},
+    ],
+}
+
+
+def test_summarize():
+    assert summarize(DATA) == (3, [0, -1, 10, 5])
+    assert summarize({"type": "FeatureCollection", "features": []}) == (0, None)
+    assert summarize({"type": "Point", "coordinates": [1, 2, 3]}) == (1, [1, 2, 1, 2])
+
+
+def test_write_blob_is_content_addressed(tmp_path):
+    reference = write_blob(tmp_path, DATA)
+    assert reference["featureCount"] == 3
+    assert reference["bbox"] == [0, -1, 10, 5]
+    assert reference["path"] == f"{BLOB_DIR}/{reference['sha256']}.geojson.gz"
+    assert is_blob_path(reference["path"])
+
+    stored = (tmp_path / reference["path"]).read_bytes()
+    assert json.loads(gzip.decompress(stored)) == DATA
+    assert write_blob(tmp_path, json.loads(json.dumps(DATA))) == reference
+    assert (tmp_path / reference["path"]).read_bytes() == stored
+    assert [p.name for p in (tmp_path / BLOB_DIR).iterdir()] == [
+        f"{reference['sha256']}.geojson.gz",
+    ]
+
+
+def test_blob_sources_are_read_through_vsigzip(tmp_path):
+    (tmp_path / "maps").mkdir()
+    reference = write_blob(tmp_path / "maps", DATA)
+    document = {
+        "sources": {
+            "blob": {"type": "GeoJSONSource", "parameters": {"blob": reference}},
+        },
+    }
+    (tmp_path / "maps" / "map.jGIS").write_text(json.dumps(document))
+    request = resolve_source(
+        ProcessingRequest.from_json(
+            {
+                "operation": "ogr2ogr",
+                "outputName": "out.geojson",
+                "source": {"document": "maps/map.jGIS", "sourceId": "blob"},
+            },
+        ),
+        str(tmp_path),
+    )
+    assert request.source_path == f"/vsigzip/{tmp_path / 'maps' / reference['path']}"
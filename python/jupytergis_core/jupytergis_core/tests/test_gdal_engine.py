@@ -0,0 +1,108 @@
+import json
+import subprocess
+from concurrent.futures import Future
+from dataclasses import replace
+
+import pytest
+
+from jupytergis_core import gdal_engine, handler
+from jupytergis_core.gdal_engine import GdalEngine
+from jupytergis_core.handler import ProcessingContext, load_processing_config
+
+POINTS = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "properties": {"name": "a"},
+            "geometry": {"type": "Point", "coordinates": [1, 2]},
+        },
+    ],
+}
+
+
+def test_context_uses_cli_without_bindings(monkeypatch):
+    monkeypatch.setattr(handler, "bindings_available", lambda: False)
+    context = ProcessingContext(
+        replace(load_processing_config(), engine="auto", workers=2),
+    )
+    assert context.engine() is None
+
+
+def test_context_cli_engine_never_starts_workers(monkeypatch):
+    monkeypatch.setattr(handler, "bindings_available", lambda: True)
+    context = ProcessingContext(
+        replace(load_processing_config(), engine="cli", workers=2),
+    )
+    assert context.engine() is None
+
+
+class _StalledPool:
+    def __init__(self):
+        self.killed = False
+
+    def submit(self, *_args, **_kwargs):
+        return Future()
+
+    def kill_workers(self):
+        self.killed = True
+
+    def shutdown(self, **_kwargs):
+        pass
+
+
+def test_engine_kills_stalled_workers(monkeypatch, tmp_path):
+    monkeypatch.setattr(gdal_engine, "KILL_GRACE", 0)
+    engine = GdalEngine(max_workers=1)
+    pool = engine._executor = _StalledPool()
+    with pytest.raises(subprocess.TimeoutExpired):
+        engine.run(
+            "ogr2ogr",
+            [],
+            "/vsicurl/https://example.com/data.fgb",
+            str(tmp_path / "out.geojson"),
+            cwd=str(tmp_path),
+            timeout=0.1,
+        )
+    assert pool.killed
+    assert engine._executor is None
+
+
+@pytest.fixture
+def engine():
+    pytest.importorskip("osgeo")
+    engine = GdalEngine(max_workers=1)
+    yield engine
+    engine.close()
+
+
+def test_engine_runs_vector_translate(engine, tmp_path):
+    source = tmp_path / "data.geojson"
+    source.write_text(json.dumps(POINTS))
+    destination = tmp_path / "out.geojson"
+
+    engine.run(
+        "ogr2ogr",
+        ["-f", "GeoJSON", "-sql", "SELECT name FROM data"],
+        str(source),
+        str(destination),
+        cwd=str(tmp_path),
+        timeout=60,
+    )
+
+    features = json.loads(destination.read_text())["features"]
+    assert [f["properties"] for f in features] == [{"name": "a"}]
+    assert engine.version().startswith("GDAL")
+
+
+def test_engine_reports_errors_like_the_cli(engine, tmp_path):
+    with pytest.raises(subprocess.CalledProcessError) as info:
+        engine.run(
+            "ogr2ogr",
+            ["-f", "GeoJSON"],
+            str(tmp_path / "missing.geojson"),
+            str(tmp_path / "out.geojson"),
+            cwd=str(tmp_path),
+            timeout=60,
+        )
+    assert info.value.stderr
@@ -0,0 +1,244 @@
+import base64
+import copy
+import json
+
+import pytest
+from pycrdt import Doc
+
+from jupytergis_core.jgis_ydoc import YJGIS, YJGISZ
+from jupytergis_core.jgisz import JGISArchive, dumps, loads
+from jupytergis_core.schema import SCHEMA_VERSION
+from jupytergis_core.ydoc_store import get_store
+
+CONTENT = {
+    "schemaVersion": SCHEMA_VERSION,
+    "layers": {
+        "layer-1": {
+            "name": "Countries\nof the world",
+            "type": "VectorLayer",
+            "visible": True,
+            "parameters": {"source": "source-1", "opacity": 0.5},
+        },
+    },
+    "sources": {
+        "source-1": {
+            "name": "Countries",
+            "type": "GeoJSONSource",
+            "parameters": {"data": {"type": "FeatureCollection", "features": []}},
+        },
+    },
+    "layerTree": ["layer-1", {"name": "Group", "layers": []}],
+    "options": {"zoom": 3, "latitude": 46.5, "longitude": 6.6},
+    "metadata": {"author": "Émilie"},
+}
+
+
+def full_dump(doc: YJGIS) -> str:
+    """The document dumped in one go, as ``get`` did before caching."""
+    content = {name: ytype.to_py() for name, ytype in doc._sections().items()}
+    return json.dumps(
+        {"schemaVersion": SCHEMA_VERSION, **content},
+        sort_keys=True,
+        indent=2,
+    )
+
+
+@pytest.fixture
+def doc():
+    doc = YJGIS()
+    doc.set(json.dumps(CONTENT))
+    return doc
+
+
+def test_get_matches_a_full_dump(doc):
+    assert YJGIS().get() == full_dump(YJGIS())
+    assert doc.get() == full_dump(doc)
+    assert json.loads(doc.get())["layers"] == CONTENT["layers"]
+
+
+def test_get_only_reencodes_changed_sections(doc):
+    doc.get()
+    doc._yviewState["zoom"] = 4
+    doc._ylayerTree.append("layer-2")
+
+    assert "viewState" not in doc._fragments
+    assert "layerTree" not in doc._fragments
+    assert "sources" in doc._fragments
+    assert doc.get() == full_dump(doc)
+    assert json.loads(doc.get())["viewState"] == {"zoom": 4}
+
+
+def test_set_invalidates_every_section(doc):
+    doc.get()
+    doc.set(json.dumps({**CONTENT, "layers": {}, "options": {"zoom": 1}}))
+    content = json.loads(doc.get())
+    assert content["layers"] == {}
+    assert content["options"] == {"zoom": 1}
+    assert doc.get() == full_dump(doc)
+
+
+def capture_updates(doc: YJGIS) -> list[bytes]:
+    updates = []
+    doc.ydoc.observe(lambda event: updates.append(event.update))
+    return updates
+
+
+def test_set_writes_only_what_changed(doc):
+    replica = Doc()
+    replica.apply_update(doc.ydoc.get_update())
+    updates = capture_updates(doc)
+
+    doc.set(json.dumps(CONTENT))
+    assert all(update == b"\x00\x00" for update in updates)
+
+    edited = copy.deepcopy(CONTENT)
+    edited["layers"]["layer-1"]["parameters"]["opacity"] = 0.8
+    edited["layerTree"].insert(1, "layer-2")
+    edited["sources"]["source-1"]["parameters"]["data"]["features"] = [
+        {"type": "Feature", "geometry": None, "properties": {"id": i}}
+        for i in range(1000)
+    ]
+    doc.set(json.dumps(edited))
+    updates.clear()
+    edited["layers"]["layer-1"]["visible"] = False
+    doc.set(json.dumps(edited))
+
+    # Re-sending the large source would take kilobytes.
+    (update,) = updates
+    assert len(update) < 500
+    assert json.loads(doc.get())["layers"]["layer-1"]["visible"] is False
+
+    replica.apply_update(doc.ydoc.get_update(replica.get_state()))
+    synced = YJGIS(ydoc=replica)
+    assert synced.get() == doc.get()
+
+
+def test_set_edits_the_layer_tree_in_place(doc):
+    edited = copy.deepcopy(CONTENT)
+    edited["layerTree"] = ["layer-0", "layer-1", {"name": "Group", "layers": ["x"]}]
+    doc.set(json.dumps(edited))
+    assert doc._ylayerTree.to_py() == edited["layerTree"]
+    edited["layerTree"] = ["layer-1"]
+    doc.set(json.dumps(edited))
+    assert doc._ylayerTree.to_py() == ["layer-1"]
+
+
+def test_jgisz_round_trip(doc):
+    archive = YJGISZ()
+    archive.set(base64.b64encode(dumps(CONTENT)).decode())
+    assert json.loads(doc.get()) == loads(base64.b64decode(archive.get()))
+
+    empty = YJGISZ()
+    empty.set("")
+    assert loads(base64.b64decode(empty.get()))["layers"] == {}
+
+
+def test_jgisz_only_decodes_changed_members(monkeypatch):
+    doc = YJGISZ()
+    doc.set(base64.b64encode(dumps(CONTENT)).decode())
+    saved = doc.get()
+
+    edited = copy.deepcopy(CONTENT)
+    edited["sources"]["source-2"] = {"name": "Rivers", "type": "GeoJSONSource"}
+    edited["options"]["zoom"] = 5
+    decoded = []
+    read = JGISArchive.read
+    monkeypatch.setattr(
+        JGISArchive,
+        "read",
+        lambda self, member: decoded.append(member) or read(self, member),
+    )
+    doc.set(base64.b64encode(dumps(edited)).decode())
+    assert {m for m in decoded if m != "manifest.json"} == {
+        "sources/source-2.json",
+        "sections/options.json",
+    }
+    assert loads(base64.b64decode(doc.get())) == {
+        **edited,
+        "schemaVersion": SCHEMA_VERSION,
+        "stories": {},
+        "viewState": {},
+        "annotations": {},
+        "presets": {},
+    }
+
+    # Edits in the room are saved, and the edited source is loaded again.
+    doc._ysources["source-1"] = {**CONTENT["sources"]["source-1"], "name": "Borders"}
+    content = loads(base64.b64decode(doc.get()))
+    assert content["sources"]["source-1"]["name"] == "Borders"
+    decoded.clear()
+    doc.set(saved)
+    assert "sources/source-1.json" in decoded
+    assert doc._ysources["source-1"]["name"] == "Countries"
+    assert "source-2" not in doc._ysources
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("JGIS_YDOC_STORE", str(tmp_path / "store.db"))
+    get_store.cache_clear()
+    store = get_store()
+    yield store
+    store.close()
+    get_store.cache_clear()
+
+
+def open_room(content: str, cls=YJGIS) -> YJGIS:
+    # Once the writes of the previous rooms are done.
+    get_store().flush()
+    doc = cls()
+    doc.path = "maps/map.jGIS"
+    doc.set(content)
+    return doc
+
+
+def test_unchanged_documents_reopen_from_the_store(store, monkeypatch):
+    saved = open_room(json.dumps(CONTENT)).get()
+    room = open_room(saved)
+    room._ylayers["layer-2"] = {"name": "Rivers", "type": "VectorLayer"}
+    saved = room.get()
+    room._ylayers["layer-3"] = {"name": "Unsaved", "type": "VectorLayer"}
+
+    def fail(*_args):
+        raise AssertionError("The document was parsed")
+
+    monkeypatch.setattr("jupytergis_core.jgis_ydoc.migrate", fail)
+    reopened = open_room(saved)
+    assert reopened.get() == saved
+    assert "layer-3" not in reopened._ylayers
+
+    # The room carries on logging.
+    reopened._ylayers["layer-4"] = {"name": "Roads", "type": "VectorLayer"}
+    saved = reopened.get()
+    assert open_room(saved)._ylayers["layer-4"]["name"] == "Roads"
+
+
+def test_updates_are_only_buffered_until_saving(store, monkeypatch):
+    room = open_room(json.dumps(CONTENT))
+    calls = []
+    monkeypatch.setattr(store, "append", lambda *args: calls.append(args))
+    for i in range(3):
+        room._ylayers[f"layer-{i + 2}"] = {"name": str(i), "type": "VectorLayer"}
+    # No store operation on the transaction path.
+    assert calls == []
+    room.get()
+    assert [(path, len(updates)) for path, updates in calls] == [("maps/map.jGIS", 3)]
+
+
+def test_changed_documents_are_parsed(store):
+    saved = open_room(json.dumps(CONTENT)).get()
+    edited = json.loads(saved)
+    edited["layers"]["layer-1"]["name"] = "Edited elsewhere"
+    room = open_room(json.dumps(edited))
+    assert room._ylayers["layer-1"]["name"] == "Edited elsewhere"
+    # The new content is what the store now holds.
+    store.flush()
+    assert store.load("maps/map.jGIS", room._content_key(json.dumps(edited)))
+
+
+def test_archives_reopen_from_the_store(store):
+    saved = open_room(base64.b64encode(dumps(CONTENT)).decode(), YJGISZ).get()
+    # Line breaks, as the contents manager encodes base64.
+    reopened = open_room(base64.encodebytes(base64.b64decode(saved)).decode(), YJGISZ)
+    assert reopened._ylayers.to_py() == CONTENT["layers"]
+    assert loads(base64.b64decode(reopened.get())) == loads(base64.b64decode(saved))
@@ -0,0 +1,106 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from jupytergis_core.jgisz import (
+    MANIFEST,
+    JGISArchive,
+    dumps,
+    jgis_to_jgisz,
+    jgisz_to_jgis,
+    loads,
+    source_member,
+)
+from jupytergis_core.processing import ProcessingRequest
+from jupytergis_core.processing_sources import resolve_source
+
+CONTENT = {
+    "schemaVersion": "0.6.0",
+    "layers": {"layer-1": {"name": "Roads", "type": "VectorLayer"}},
+    "sources": {
+        "source-1": {
+            "type": "GeoJSONSource",
+            "parameters": {"data": {"type": "FeatureCollection", "features": []}},
+        },
+        "a/b c": {"type": "GeoJSONSource", "parameters": {"path": "x.json"}},
+    },
+    "layerTree": ["layer-1"],
+    "options": {"zoom": 3},
+    "metadata": {"author": "Émilie"},
+}
+
+
+def test_round_trip():
+    data = dumps(CONTENT)
+    assert loads(data) == CONTENT
+    # The same document gives the same archive.
+    assert dumps(json.loads(json.dumps(CONTENT))) == data
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        names = set(archive.namelist())
+        infos = archive.infolist()
+    assert MANIFEST in names
+    assert source_member("a/b c") == "sources/a%2Fb%20c.json"
+    assert source_member("a/b c") in names
+    assert all(info.compress_type == zipfile.ZIP_DEFLATED for info in infos)
+
+
+def test_archive_decodes_lazily():
+    archive = JGISArchive(dumps(CONTENT))
+    assert archive.schema_version == "0.6.0"
+    assert sorted(archive.source_ids) == ["a/b c", "source-1"]
+    assert archive.section("layerTree") == ["layer-1"]
+    assert archive.section("stories", {}) == {}
+    assert archive.source("a/b c")["parameters"]["path"] == "x.json"
+    assert archive.crc(source_member("source-1")) is not None
+    assert archive.crc(source_member("nope")) is None
+
+
+def test_invalid_archives():
+    with pytest.raises(ValueError, match="Not a jgisz archive"):
+        JGISArchive(b"{}")
+    data = dumps(CONTENT)
+    newer = io.BytesIO()
+    with (
+        zipfile.ZipFile(io.BytesIO(data)) as source,
+        zipfile.ZipFile(newer, "w") as target,
+    ):
+        for name in source.namelist():
+            if name != MANIFEST:
+                target.writestr(name, source.read(name))
+        target.writestr(MANIFEST, json.dumps({"format": "jgisz", "version": 99}))
+    with pytest.raises(ValueError, match="version 99"):
+        JGISArchive(newer.getvalue())
+
+
+def test_converters(tmp_path):
+    path = tmp_path / "map.jGIS"
+    path.write_text(json.dumps(CONTENT), encoding="utf-8")
+
+    archive = jgis_to_jgisz(path)
+    assert archive == tmp_path / "map.jgisz"
+    assert loads(archive.read_bytes()) == CONTENT
+
+    back = jgisz_to_jgis(archive, tmp_path / "back.jGIS")
+    assert back.read_text(encoding="utf-8") == json.dumps(
+        CONTENT,
+        sort_keys=True,
+        indent=2,
+    )
+
+
+def test_processing_reads_sources_of_archives(tmp_path):
+    (tmp_path / "map.jgisz").write_bytes(dumps(CONTENT))
+    request = resolve_source(
+        ProcessingRequest.from_json(
+            {
+                "operation": "ogr2ogr",
+                "outputName": "out.geojson",
+                "source": {"document": "map.jgisz", "sourceId": "source-1"},
+            },
+        ),
+        str(tmp_path),
+    )
+    assert json.loads(request.geojson)["type"] == "FeatureCollection"
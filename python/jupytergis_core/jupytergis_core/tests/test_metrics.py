@@ -0,0 +1,19 @@
+from prometheus_client import generate_latest
+
+from jupytergis_core import metrics
+from jupytergis_core.handler import ProxyContext, load_config
+
+
+def test_proxy_context_statistics(monkeypatch, tmp_path):
+    monkeypatch.setenv("JGIS_PROXY_CACHE_DIR", str(tmp_path))
+    context = ProxyContext(load_config())
+    context.cache.record_hit()
+    context.cache.record_miss()
+    metrics.register_proxy_context(context)
+    # Registering a new context replaces the previous one.
+    metrics.register_proxy_context(context)
+
+    output = generate_latest(metrics.REGISTRY).decode()
+    assert 'jupytergis_proxy_cache_lookups_total{result="hit"} 1.0' in output
+    assert 'jupytergis_proxy_cache_lookups_total{result="miss"} 1.0' in output
+    assert "jupytergis_proxy_deduplicated_requests_total 0.0" in output
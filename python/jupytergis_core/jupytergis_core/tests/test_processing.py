@@ -0,0 +1,498 @@
+import os
+import subprocess
+import sys
+from base64 import b64decode
+from collections import OrderedDict
+
+import pytest
+
+from jupytergis_core import processing
+from jupytergis_core.gdal_engine import OperationCancelledError
+from jupytergis_core.processing import (
+    GdalProgressParser,
+    ProcessingRequest,
+    TileSettings,
+    _run_tiled,
+    _run_with_progress,
+    accepted_output_formats,
+    cutline_tolerance,
+    gdal_config,
+    prepare_cutline,
+    run_gdal_source,
+    vector_layer_names,
+)
+
+
+@pytest.mark.parametrize(
+    "name,media_type",
+    [
+        ("out.tif", "image/tiff"),
+        ("out.fgb", "application/flatgeobuf"),
+        ("out.parquet", "application/vnd.apache.parquet"),
+    ],
+)
+def test_binary_output_is_read_as_base64(make_output, name, media_type):
+    output = make_output(b"\x00\xff" * 10, name)
+    assert output.media_type == media_type
+    assert output.size == 20
+    content, fmt = output.read()
+    assert fmt == "base64"
+    assert b64decode(content) == b"\x00\xff" * 10
+    output.close()
+
+
+def test_text_output_streams_in_chunks_and_is_removed_on_close(make_output):
+    output = make_output(b'{"type": "FeatureCollection"}')
+    assert output.media_type == "application/geo+json"
+    assert output.read() == ('{"type": "FeatureCollection"}', "text")
+    assert (
+        b"".join(output.iter_chunks(chunk_size=4)) == b'{"type": "FeatureCollection"}'
+    )
+    output.close()
+    assert not os.path.exists(output.path)
+
+
+def test_progress_parser():
+    parser = GdalProgressParser()
+    parser.feed("Input file size is 1000, 1000\n0...10..")
+    assert parser.fraction == pytest.approx(0.15)
+    parser.feed(".20...30")
+    assert parser.fraction == pytest.approx(0.3)
+    parser.feed("...40...50...60...70...80...90...100 - done.\n")
+    assert parser.fraction == 1.0
+
+
+# Prints GDAL-style progress, then waits to be killed.
+PROGRESS_SCRIPT = """
+import sys, time
+sys.stdout.write("0...10...20"); sys.stdout.flush()
+time.sleep(30)
+"""
+
+
+def test_cli_progress_and_cancellation(tmp_path):
+    seen = []
+
+    def progress(fraction):
+        seen.append(fraction)
+        return fraction < 0.2
+
+    with pytest.raises(OperationCancelledError):
+        _run_with_progress(
+            [sys.executable, "-c", PROGRESS_SCRIPT],
+            cwd=str(tmp_path),
+            timeout=30,
+            progress=progress,
+        )
+    assert seen[-1] == pytest.approx(0.2)
+
+
+def test_gdal_config_reaches_cli_tools_only(tmp_path, monkeypatch):
+    monkeypatch.setenv("GDAL_HTTP_VERSION", "1.1")
+    config = gdal_config(vsicurl_cache_size=1024, vsi_cache_size=512)
+    # Options set in the server environment take precedence.
+    assert "GDAL_HTTP_VERSION" not in config
+    assert config["CPL_VSIL_CURL_CACHE_SIZE"] == "1024"
+
+    monkeypatch.setattr(processing, "_GDAL_CONFIG", {})
+    processing.set_gdal_config(config)
+    assert "GDAL_HTTP_MULTIPLEX" not in os.environ
+    _run_with_progress(
+        [
+            sys.executable,
+            "-c",
+            "import os, sys; sys.exit(os.environ['GDAL_HTTP_MULTIPLEX'] != 'YES')",
+        ],
+        cwd=str(tmp_path),
+        timeout=30,
+        progress=lambda _: True,
+    )
+
+
+def test_cli_failure_reports_stderr(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError) as info:
+        _run_with_progress(
+            [sys.executable, "-c", "import sys; sys.exit('ERROR 1: no such file')"],
+            cwd=str(tmp_path),
+            timeout=30,
+            progress=lambda _fraction: True,
+        )
+    assert "no such file" in info.value.stderr
+
+
+@pytest.mark.parametrize(
+    "body,message",
+    [
+        pytest.param({"operation": "rm"}, "Unsupported operation", id="operation"),
+        pytest.param({"operation": "ogr2ogr"}, "Missing", id="input"),
+        pytest.param(
+            {"operation": "ogr2ogr", "geojson": "{}", "cutlineGeojson": "{}"},
+            "requires a raster",
+            id="cutline",
+        ),
+        pytest.param(
+            {"operation": "ogr2ogr", "geojson": "{}", "options": [1]},
+            "list of strings",
+            id="options",
+        ),
+    ],
+)
+def test_invalid_requests(body, message):
+    with pytest.raises(ValueError, match=message):
+        ProcessingRequest.from_json(body)
+
+
+def test_uploaded_input_replaces_inline_data():
+    body = {"operation": "ogr2ogr", "outputName": "out.fgb"}
+    request = ProcessingRequest.from_json(body, input_path="/uploads/data.fgb")
+    assert request.input_path == "/uploads/data.fgb"
+    with pytest.raises(ValueError, match="cannot be combined"):
+        ProcessingRequest.from_json(
+            {**body, "geojson": "{}"},
+            input_path="/uploads/data.fgb",
+        )
+
+
+def test_source_vectors_are_exposed_as_data(monkeypatch):
+    listing = "1: roads (Line String)\n2: land use (Multi Polygon, Point)\n"
+    monkeypatch.setattr(
+        subprocess,
+        "run",
+        lambda cmd, **_kwargs: subprocess.CompletedProcess(cmd, 0, listing, ""),
+    )
+    assert vector_layer_names("/data/map.gpkg") == ["roads", "land use"]
+
+    def run_gdal_file(operation, options, input_path, output_name, **_kwargs):
+        with open(input_path) as f:
+            return f.read()
+
+    monkeypatch.setattr(processing, "run_gdal_file", run_gdal_file)
+    vrt = run_gdal_source("ogr2ogr", [], "/data/a&b.gpkg", "out.geojson")
+    assert '<OGRVRTLayer name="data">' in vrt
+    assert "/data/a&amp;b.gpkg</SrcDataSource>" in vrt
+    assert "<SrcLayer>roads</SrcLayer>" in vrt
+
+
+def test_pipeline_steps_become_chained_vrt_stages(tmp_path):
+    request = ProcessingRequest.from_json(
+        {
+            "operation": "ogr2ogr",
+            "geojson": "{}",
+            "layerName": "roads",
+            "steps": [
+                'SELECT ST_Buffer(geometry, 1) AS geometry FROM "{layerName}"',
+                'SELECT ST_Union(geometry) AS geometry FROM "{layerName}"',
+            ],
+        },
+    )
+    assert request.steps[0].endswith('FROM "roads"')
+    assert request.steps[1].endswith('FROM "data"')
+
+    last = processing._write_pipeline("/in/a.geojson", request.steps, str(tmp_path))
+    first = (tmp_path / "stage0.vrt").read_text()
+    assert "/in/a.geojson</SrcDataSource>" in first
+    assert 'FROM "roads"</SrcSQL>' in first
+    with open(last) as f:
+        second = f.read()
+    assert f"{tmp_path / 'stage0.vrt'}</SrcDataSource>" in second
+    assert '<SrcSQL dialect="sqlite">' in second
+
+
+def test_named_pipeline_steps_become_sql():
+    request = ProcessingRequest.from_json(
+        {
+            "operation": "ogr2ogr",
+            "geojson": "{}",
+            "layerName": "roads",
+            "steps": [
+                {"name": "buffer", "params": {"bufferDistance": 2.5}},
+                {"name": "concaveHull", "params": {"allowHoles": True}},
+                {"name": "dissolve", "params": {"dissolveField": 'ty"pe'}},
+            ],
+        },
+    )
+    assert request.steps == [
+        'SELECT ST_Union(ST_Buffer(geometry, 2.5)) AS geometry, * FROM "roads"',
+        'SELECT ST_ConcaveHull(geometry, 0.5, TRUE) AS geometry, * FROM "data"',
+        (
+            'SELECT ST_Union(geometry) AS geometry, "ty""pe" FROM "data"'
+            ' GROUP BY "ty""pe"'
+        ),
+    ]
+
+
+@pytest.mark.parametrize(
+    "body,message",
+    [
+        pytest.param({"steps": []}, "non-empty", id="empty"),
+        pytest.param({"steps": [{"name": "explode"}]}, "name one of", id="unknown"),
+        pytest.param({"steps": [{"name": "dissolve"}]}, "Missing", id="missing"),
+        pytest.param(
+            {"steps": [{"name": "buffer", "params": {"bufferDistance": "1); --"}}]},
+            "finite number",
+            id="injection",
+        ),
+        pytest.param(
+            {"steps": [{"name": "buffer", "params": {"distance": 1}}]},
+            "Unknown parameters",
+            id="unknown-param",
+        ),
+        pytest.param({"steps": ["SELECT 1"] * 17}, "Too many", id="too-many"),
+        pytest.param(
+            {"operation": "gdalwarp", "steps": ["SELECT 1"]},
+            "vector operation",
+            id="raster",
+        ),
+    ],
+)
+def test_invalid_pipelines(body, message):
+    with pytest.raises(ValueError, match=message):
+        ProcessingRequest.from_json({"operation": "ogr2ogr", "geojson": "{}", **body})
+
+
+def test_output_format_rewrites_driver_and_extension():
+    request = ProcessingRequest.from_json(
+        {
+            "operation": "ogr2ogr",
+            "options": ["-f", "GeoJSON", "-sql", "SELECT 1", "{outputName}"],
+            "geojson": "{}",
+            "outputName": "buffered.geojson",
+            "outputFormat": "FlatGeobuf",
+        },
+    )
+    assert request.options == [
+        "-f",
+        "FlatGeobuf",
+        "-lco",
+        "SPATIAL_INDEX=YES",
+        "-sql",
+        "SELECT 1",
+        "{outputName}",
+    ]
+    assert request.output_name == "buffered.fgb"
+
+    request = ProcessingRequest.from_json(
+        {
+            "operation": "gdalwarp",
+            "options": ["-cutline", "{cutlinePath}"],
+            "url": "https://example.com/dem.tif",
+            "outputName": "clipped.tif",
+            "outputFormat": "COG",
+        },
+    )
+    assert request.options[:2] == ["-of", "COG"]
+
+
+@pytest.mark.parametrize(
+    "operation,output_format,message",
+    [
+        ("ogr2ogr", "Shapefile", "Unsupported output format"),
+        ("ogr2ogr", "COG", "cannot write"),
+        ("gdal_rasterize", "COG", "cannot write"),
+    ],
+)
+def test_invalid_output_formats(operation, output_format, message):
+    with pytest.raises(ValueError, match=message):
+        ProcessingRequest.from_json(
+            {"operation": operation, "geojson": "{}", "outputFormat": output_format},
+        )
+
+
+def test_accept_header_lists_formats_by_preference():
+    assert accepted_output_formats("application/octet-stream") == ()
+    assert accepted_output_formats(
+        "application/vnd.apache.parquet, application/flatgeobuf",
+    ) == ("FlatGeobuf", "GeoParquet")
+    assert accepted_output_formats(
+        "application/flatgeobuf;q=0.5, application/x-parquet",
+    ) == ("GeoParquet", "FlatGeobuf")
+    assert accepted_output_formats("image/tiff, application/flatgeobuf;q=0") == ()
+    assert accepted_output_formats('image/tiff; profile="cloud-optimized"') == ("COG",)
+
+
+def test_negotiation_picks_an_available_driver():
+    request = ProcessingRequest.from_json(
+        {"operation": "ogr2ogr", "options": ["{outputName}"], "geojson": "{}"},
+    )
+    request.accepted_formats = ("FlatGeobuf", "GeoParquet")
+
+    negotiated = request.negotiate(frozenset({"GeoJSON", "Parquet"}))
+    assert negotiated.output_format == "GeoParquet"
+    assert negotiated.options == ["-f", "Parquet", "{outputName}"]
+    assert negotiated.output_name == "output.parquet"
+    assert request.negotiate(frozenset({"GeoJSON"})) is request
+
+    # Outputs in another format than GeoJSON are left alone.
+    request.options = ["-f", "CSV", "{outputName}"]
+    request.output_name = "output.csv"
+    assert request.negotiate(frozenset({"FlatGeobuf"})) is request
+
+
+def test_gdal_drivers_parses_formats(monkeypatch):
+    formats = (
+        "Supported Formats:\n"
+        "  FlatGeobuf -vector- (rw+v): FlatGeobuf\n"
+        "  ESRI Shapefile -vector- (rw+v): ESRI Shapefile\n"
+        "  GTiff -raster- (rw+vs): GeoTIFF\n"
+        "  netCDF -raster,multidimensional raster,vector- (rw+vs): netCDF\n"
+    )
+    monkeypatch.setattr(processing, "gdal_available", lambda: True)
+    monkeypatch.setattr(
+        subprocess,
+        "run",
+        lambda cmd, **_: subprocess.CompletedProcess(cmd, 0, formats, ""),
+    )
+    processing.gdal_drivers.cache_clear()
+    try:
+        drivers = processing.gdal_drivers()
+    finally:
+        processing.gdal_drivers.cache_clear()
+    assert drivers == {"FlatGeobuf", "ESRI Shapefile", "GTiff", "netCDF"}
+
+
+PLAN_VRT = """<VRTDataset rasterXSize="5000" rasterYSize="3000" subClass="VRTWarpedDataset">
+  <SRS>EPSG:3857</SRS>
+  <GeoTransform>0, 10, 0, 0, 0, -10</GeoTransform>
+  <VRTRasterBand dataType="Int16" band="1" subClass="VRTWarpedRasterBand">
+    <NoDataValue>-9999</NoDataValue>
+  </VRTRasterBand>
+  <GDALWarpOptions />
+</VRTDataset>
+"""
+
+
+def test_tiled_run_computes_windows_and_mosaics_a_cog(tmp_path, monkeypatch):
+    calls = []
+    mosaics = []
+
+    def fake_execute(operation, options, input_path, output_path, **kwargs):
+        calls.append((operation, options, input_path, output_path, kwargs))
+        if output_path.endswith("plan.vrt"):
+            with open(output_path, "w") as f:
+                f.write(PLAN_VRT)
+        if input_path.endswith("mosaic.vrt"):
+            with open(input_path) as f:
+                mosaics.append(f.read())
+
+    monkeypatch.setattr(processing, "_execute", fake_execute)
+    _run_tiled(
+        "gdalwarp",
+        ["-of", "GTiff", "-co", "COMPRESS=DEFLATE", "-cutline", "cut.geojson"],
+        "/vsicurl/https://example.com/dem.tif",
+        str(tmp_path / "out.tif"),
+        cwd=str(tmp_path),
+        timeout=60,
+        engine=None,
+        progress=None,
+        tiles=TileSettings(workers=2, size=4096),
+    )
+
+    plan, *tiles, final = calls
+    assert plan[1][:3] == ["-cutline", "cut.geojson", "-of"]
+    assert "-co" not in plan[1]
+    windows = sorted(call[1][5:9] for call in tiles)
+    assert windows == [
+        ["0", "0", "4096", "3000"],
+        ["4096", "0", "904", "3000"],
+    ]
+    assert final[1] == ["-of", "COG", "-co", "COMPRESS=DEFLATE"]
+
+    # The tiles are removed once the COG is written.
+    assert not (tmp_path / "tiles").exists()
+    (mosaic,) = mosaics
+    assert "GDALWarpOptions" not in mosaic
+    assert "<NoDataValue>-9999</NoDataValue>" in mosaic
+    assert mosaic.count("<SimpleSource>") == 2
+    assert '<DstRect xOff="4096" yOff="0" xSize="904" ySize="3000" />' in mosaic
+
+
+def test_small_outputs_are_not_tiled(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_execute(operation, options, input_path, output_path, **kwargs):
+        calls.append(options)
+        if output_path.endswith("plan.vrt"):
+            with open(output_path, "w") as f:
+                f.write(PLAN_VRT)
+
+    monkeypatch.setattr(processing, "_execute", fake_execute)
+    _run_tiled(
+        "gdal_translate",
+        ["-projwin", "0", "1", "1", "0"],
+        "input.tif",
+        str(tmp_path / "out.tif"),
+        cwd=str(tmp_path),
+        timeout=60,
+        engine=None,
+        progress=None,
+        tiles=TileSettings(workers=2, size=8192),
+    )
+    assert calls == [
+        ["-projwin", "0", "1", "1", "0", "-of", "VRT"],
+        ["-projwin", "0", "1", "1", "0"],
+    ]
+
+
+UTM_WKT = (
+    'PROJCRS["WGS 84 / UTM zone 32N",BASEGEOGCRS["WGS 84",'
+    'ANGLEUNIT["degree",0.0174532925199433]],'
+    'CS[Cartesian,2],LENGTHUNIT["metre",1]]'
+)
+
+
+@pytest.mark.parametrize(
+    "info,tolerance",
+    [
+        pytest.param(
+            {
+                "geoTransform": [0, 0.001, 0, 0, 0, -0.001],
+                "coordinateSystem": {"wkt": 'GEOGCRS["WGS 84"]'},
+            },
+            0.0005,
+            id="geographic",
+        ),
+        pytest.param(
+            {
+                "geoTransform": [0, 30, 0, 0, 0, -30],
+                "coordinateSystem": {"wkt": UTM_WKT},
+            },
+            15 / 111_320,
+            id="projected",
+        ),
+        pytest.param({}, processing.DEFAULT_CUTLINE_TOLERANCE, id="unknown"),
+    ],
+)
+def test_cutline_tolerance_is_half_a_pixel(info, tolerance):
+    assert cutline_tolerance(info) == pytest.approx(tolerance)
+
+
+def test_simplified_cutlines_are_cached(tmp_path, monkeypatch):
+    runs = []
+
+    def fake_execute(operation, options, input_path, output_path, **kwargs):
+        runs.append(options)
+        with open(output_path, "w") as f:
+            f.write('{"simplified": true}')
+
+    monkeypatch.setattr(processing, "_execute", fake_execute)
+    monkeypatch.setattr(processing, "_CUTLINES", OrderedDict())
+    monkeypatch.setattr(
+        processing,
+        "raster_info",
+        lambda *_, **__: {
+            "geoTransform": [0, 0.01, 0, 0, 0, -0.01],
+            "coordinateSystem": {"wkt": 'GEOGCRS["WGS 84"]'},
+        },
+    )
+    processing._source_tolerance.cache_clear()
+    source = "/vsicurl/https://example.com/dem.tif"
+    cutline = '{"type": "FeatureCollection", "features": []}'
+
+    for directory in (tmp_path / "first", tmp_path / "second"):
+        directory.mkdir()
+        path = prepare_cutline(cutline, source, str(directory))
+        with open(path) as f:
+            assert f.read() == '{"simplified": true}'
+    processing._source_tolerance.cache_clear()
+
+    assert runs == [["-f", "GeoJSON", "-simplify", "0.005", runs[0][-1]]]
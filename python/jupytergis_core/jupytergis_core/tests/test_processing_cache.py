@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from dataclasses import replace
+
+from jupytergis_core import processing_cache
+from jupytergis_core.processing import ProcessingRequest
+from jupytergis_core.processing_cache import ProcessingCache
+
+REQUEST = ProcessingRequest(
+    operation="ogr2ogr",
+    options=["-f", "GeoJSON", "{outputName}"],
+    output_name="output.geojson",
+    geojson='{"type": "FeatureCollection", "features": []}',
+)
+
+
+def test_key_depends_on_every_input():
+    key = ProcessingCache.make_key(REQUEST)
+    assert key == ProcessingCache.make_key(replace(REQUEST))
+    assert key != ProcessingCache.make_key(replace(REQUEST, geojson="{}"))
+    assert key != ProcessingCache.make_key(replace(REQUEST, options=["-f", "CSV"]))
+    assert key != ProcessingCache.make_key(replace(REQUEST, operation="gdalwarp"))
+
+
+def test_uploads_are_keyed_by_digest():
+    upload = replace(REQUEST, geojson=None, input_path="/uploads/data.fgb")
+    assert ProcessingCache.make_key(upload) is None
+    key = ProcessingCache.make_key(replace(upload, input_digest=".fgb:1"))
+    assert key is not None
+    assert key == ProcessingCache.make_key(
+        replace(upload, input_path="/other/data.fgb", input_digest=".fgb:1"),
+    )
+    assert key != ProcessingCache.make_key(replace(upload, input_digest=".fgb:2"))
+
+
+def test_source_versions_are_remembered(monkeypatch):
+    heads = []
+
+    class Response:
+        headers = {"ETag": '"v1"', "Content-Length": "10"}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+    def urlopen(request, timeout):
+        heads.append(request.full_url)
+        return Response()
+
+    monkeypatch.setattr(processing_cache.urllib.request, "urlopen", urlopen)
+    monkeypatch.setattr(processing_cache, "_SOURCE_VERSIONS", OrderedDict())
+    url = "https://example.com/data.fgb"
+    request = replace(REQUEST, geojson=None, url=url)
+    key = ProcessingCache.make_key(request)
+    assert key is not None
+    assert ProcessingCache.make_key(request) == key
+    assert heads == [url]
+
+    monkeypatch.setattr(processing_cache, "SOURCE_VERSION_TTL", 0)
+    assert processing_cache.source_version(url) == '"v1"|10'
+    assert heads == [url, url]
+
+
+def test_hits_survive_eviction_and_restart(tmp_path, make_output):
+    cache = ProcessingCache(str(tmp_path), max_size=1024, max_entries=10)
+    key = ProcessingCache.make_key(REQUEST)
+    assert cache.get(key) is None
+
+    output = make_output(b"result")
+    cache.put(key, output)
+    output.close()
+
+    hit = cache.get(key)
+    assert hit.cached
+    with open(hit.path, "rb") as f:
+        assert f.read() == b"result"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    # A result handed out stays readable when its entry is evicted.
+    other = make_output(b"x" * 1020)
+    cache.put("other", other)
+    other.close()
+    assert cache.get(key) is None
+    with open(hit.path, "rb") as f:
+        assert f.read() == b"result"
+    hit.close()
+
+    restarted = ProcessingCache(str(tmp_path), max_size=1024, max_entries=10)
+    assert restarted.stats()["entries"] == 1
+    restarted.get("other").close()
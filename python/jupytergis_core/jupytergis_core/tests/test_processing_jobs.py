@@ -0,0 +1,134 @@
+import asyncio
+import os
+import threading
+import time
+
+from jupytergis_core.gdal_engine import OperationCancelledError
+from jupytergis_core.processing_jobs import (
+    CANCELLED,
+    FAILED,
+    QUEUED,
+    RUNNING,
+    SUCCEEDED,
+    JobQueue,
+)
+
+
+async def wait_for(job, statuses):
+    for _ in range(500):
+        if job.status in statuses:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job still {job.status}")
+
+
+def test_per_user_concurrency_limit(make_output):
+    async def check():
+        queue = JobQueue(
+            4,
+            max_running_per_user=1,
+            max_queued_per_user=10,
+            result_ttl=60,
+        )
+        release = threading.Event()
+
+        def blocked(progress):
+            release.wait(5)
+            return make_output()
+
+        first = queue.submit("alice", "gdalwarp", blocked)
+        second = queue.submit("alice", "gdalwarp", blocked)
+        other = queue.submit("bob", "gdalwarp", blocked)
+        await asyncio.sleep(0.05)
+        assert (first.status, second.status, other.status) == (RUNNING, QUEUED, RUNNING)
+
+        release.set()
+        await wait_for(second, {SUCCEEDED})
+        assert first.status == SUCCEEDED
+        assert queue.get(first.id, "bob") is None
+        assert [job.id for job in queue.jobs("alice")] == [first.id, second.id]
+        path = first.output.path
+        queue.close()
+        return path
+
+    assert not os.path.exists(asyncio.run(check()))
+
+
+def test_running_job_is_cancelled_through_progress():
+    async def check():
+        queue = JobQueue(
+            1,
+            max_running_per_user=1,
+            max_queued_per_user=10,
+            result_ttl=60,
+        )
+
+        def slow(progress):
+            while progress(0.5):
+                time.sleep(0.01)
+            raise OperationCancelledError
+
+        job = queue.submit("alice", "gdalwarp", slow)
+        await wait_for(job, {RUNNING})
+        await asyncio.sleep(0.05)
+        assert job.progress == 0.5
+        queue.cancel(job)
+        await wait_for(job, {CANCELLED})
+        queue.close()
+
+    asyncio.run(check())
+
+
+def test_failure_and_expiry(make_output):
+    async def check():
+        queue = JobQueue(
+            1,
+            max_running_per_user=1,
+            max_queued_per_user=10,
+            result_ttl=0.05,
+        )
+
+        def failing(progress):
+            raise ValueError("bad input")
+
+        failed = queue.submit("alice", "ogr2ogr", failing)
+        done = queue.submit("alice", "ogr2ogr", lambda _progress: make_output())
+        await wait_for(done, {SUCCEEDED})
+        assert failed.status == FAILED
+        assert (failed.error_code, failed.error) == (500, "bad input")
+
+        path = done.output.path
+        await asyncio.sleep(0.1)
+        assert queue.jobs("alice") == []
+        queue.close()
+        return path
+
+    assert not os.path.exists(asyncio.run(check()))
+
+
+def test_cleanup_runs_whatever_the_outcome(make_output):
+    async def check():
+        queue = JobQueue(
+            1,
+            max_running_per_user=1,
+            max_queued_per_user=10,
+            result_ttl=60,
+        )
+        cleaned = []
+
+        def failing(progress):
+            raise ValueError("bad input")
+
+        failed = queue.submit("alice", "ogr2ogr", failing, lambda: cleaned.append(1))
+        queued = queue.submit(
+            "alice",
+            "ogr2ogr",
+            lambda _progress: make_output(),
+            lambda: cleaned.append(2),
+        )
+        queue.cancel(queued)
+        await wait_for(failed, {FAILED})
+        assert sorted(cleaned) == [1, 2]
+        queue.close()
+
+    asyncio.run(check())
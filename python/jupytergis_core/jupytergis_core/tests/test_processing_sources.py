@@ -0,0 +1,109 @@
+import json
+import os
+
+import pytest
+
+from jupytergis_core.processing import ProcessingRequest, SourceError, describe_error
+from jupytergis_core.processing_sources import resolve_source
+
+
+def make_request(source, **kwargs):
+    return ProcessingRequest.from_json(
+        {"operation": "ogr2ogr", "outputName": "out.geojson", "source": source},
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "maps" / "data").mkdir(parents=True)
+    (tmp_path / "maps" / "data" / "roads.gpkg").write_bytes(b"gpkg")
+    (tmp_path / "maps" / "data" / "rivers.shp").write_bytes(b"shp")
+    (tmp_path / "maps" / "data" / "rivers.dbf").write_bytes(b"dbf")
+    document = {
+        "sources": {
+            "roads": {
+                "type": "GeoPackageVectorSource",
+                "parameters": {"path": "data/roads.gpkg", "tables": " main, other"},
+            },
+            "rivers": {
+                "type": "ShapefileSource",
+                "parameters": {"path": "data/rivers.shp"},
+            },
+            "inline": {
+                "type": "GeoJSONSource",
+                "parameters": {"data": {"type": "FeatureCollection", "features": []}},
+            },
+            "remote": {
+                "type": "GeoTiffSource",
+                "parameters": {"urls": [{"url": "https://example.com/a.tif"}]},
+            },
+            "tiles": {"type": "RasterSource", "parameters": {"url": "https://x"}},
+        },
+    }
+    (tmp_path / "maps" / "map.jGIS").write_text(json.dumps(document))
+    return tmp_path
+
+
+def test_document_sources_resolve_relative_to_the_document(root):
+    request = resolve_source(
+        make_request({"document": "maps/map.jGIS", "sourceId": "roads"}),
+        str(root),
+    )
+    assert request.source_path == str(root / "maps" / "data" / "roads.gpkg")
+    assert request.source_layer == "main"
+
+    request = resolve_source(
+        make_request({"document": "maps/map.jGIS", "sourceId": "inline"}),
+        str(root),
+    )
+    assert request.source_path is None
+    assert json.loads(request.geojson)["type"] == "FeatureCollection"
+
+    request = resolve_source(
+        make_request({"document": "maps/map.jGIS", "sourceId": "remote"}),
+        str(root),
+    )
+    assert request.url == "https://example.com/a.tif"
+
+
+def test_digest_follows_sidecar_files(root):
+    request = make_request({"path": "maps/data/rivers.shp", "layer": "rivers"})
+    digest = resolve_source(request, str(root)).input_digest
+    assert digest == resolve_source(request, str(root)).input_digest
+    dbf = root / "maps" / "data" / "rivers.dbf"
+    dbf.write_bytes(b"changed")
+    os.utime(dbf, ns=(0, 0))
+    assert digest != resolve_source(request, str(root)).input_digest
+
+
+@pytest.mark.parametrize(
+    "source,status",
+    [
+        pytest.param({"path": "../secret.gpkg"}, 403, id="outside-root"),
+        pytest.param({"path": "maps/missing.gpkg"}, 404, id="missing"),
+        pytest.param(
+            {"document": "maps/map.jGIS", "sourceId": "nope"},
+            404,
+            id="unknown-source",
+        ),
+        pytest.param(
+            {"document": "maps/map.jGIS", "sourceId": "tiles"},
+            400,
+            id="unsupported-type",
+        ),
+    ],
+)
+def test_invalid_references(root, source, status):
+    with pytest.raises(SourceError) as info:
+        resolve_source(make_request(source), str(root))
+    assert describe_error(info.value)[0] == status
+
+
+def test_references_are_validated():
+    with pytest.raises(ValueError, match="only one of"):
+        ProcessingRequest.from_json(
+            {"operation": "ogr2ogr", "geojson": "{}", "source": {"path": "a"}},
+        )
+    with pytest.raises(ValueError, match="'sourceId'"):
+        make_request({"document": "map.jGIS"})
@@ -0,0 +1,168 @@
+import asyncio
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+from tornado.httputil import HTTPHeaders
+
+from jupytergis_core.handler import (
+    ProcessingContext,
+    ProxyContext,
+    ProxyHandler,
+    _UpstreamStream,
+    create_http_client,
+    load_config,
+    setup_handlers,
+    teardown_handlers,
+)
+from jupytergis_core.proxy_cache import ProxyCache
+
+
+@pytest.fixture
+def proxy_config(monkeypatch):
+    monkeypatch.setenv("JGIS_PROXY_MAX_CLIENTS", "7")
+    monkeypatch.setenv("JGIS_PROXY_MAX_CONNECTIONS_PER_HOST", "3")
+    return load_config()
+
+
+def test_load_config_pool_settings(proxy_config):
+    assert proxy_config.max_clients == 7
+    assert proxy_config.max_connections_per_host == 3
+    assert proxy_config.http2 is False
+
+
+def test_create_http_client_is_dedicated(proxy_config):
+    async def check():
+        first = create_http_client(proxy_config)
+        second = create_http_client(proxy_config)
+        try:
+            assert first is not second
+            assert first.defaults["request_timeout"] == proxy_config.default_timeout
+        finally:
+            first.close()
+            second.close()
+
+    asyncio.run(check())
+
+
+def test_context_shares_one_client(proxy_config):
+    async def check():
+        context = ProxyContext(proxy_config)
+        try:
+            assert context.http_client is context.http_client
+        finally:
+            context.close()
+        assert context._http_client is None
+
+    asyncio.run(check())
+
+
+def test_teardown_closes_the_contexts(monkeypatch):
+    monkeypatch.setenv("JGIS_PROXY_CACHE_SIZE", "0")
+    monkeypatch.setenv("JGIS_PROCESSING_CACHE_SIZE", "0")
+    closed = []
+    monkeypatch.setattr(ProxyContext, "close", lambda _self: closed.append("proxy"))
+    monkeypatch.setattr(
+        ProcessingContext,
+        "close",
+        lambda _self: closed.append("processing"),
+    )
+    web_app = SimpleNamespace(
+        settings={"base_url": "/"},
+        add_handlers=lambda *_args: None,
+    )
+    setup_handlers(web_app)
+    teardown_handlers(web_app)
+    teardown_handlers(web_app)
+    assert sorted(closed) == ["processing", "proxy"]
+
+
+class _FakeHandler:
+    def __init__(self):
+        self.headers = {}
+        self.body = b""
+
+    def _set_response_headers(self, headers):
+        self.headers.update(headers)
+
+    def set_header(self, name, value):
+        self.headers[name] = value
+
+    def _negotiate_encoding(self, headers, code):
+        return None
+
+    def write(self, chunk):
+        self.body += chunk
+
+    def flush(self):
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+def test_stream_holds_chunks_until_headers_complete():
+    handler = _FakeHandler()
+    stream = _UpstreamStream(handler, high_water_mark=1024)
+
+    stream.on_chunk(b"early")
+    assert handler.body == b""
+
+    for line in ("HTTP/2 200\r\n", "Content-Type: text/plain\r\n", "\r\n"):
+        stream.on_header_line(line)
+    assert handler.body == b"early"
+    assert handler.headers["Content-Type"] == "text/plain"
+
+
+class _CachedGetHandler:
+    _handle_cached_get = ProxyHandler._handle_cached_get
+    _cache_io = ProxyHandler._cache_io
+
+    def __init__(self, cache, *responses):
+        self.context = SimpleNamespace(cache=cache)
+        self.responses = list(responses)
+        self.requests = []
+        self.answer = None
+
+    def set_header(self, name, value):
+        pass
+
+    async def _forward_upstream(self, url, method, body, headers, writer=None):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+    async def _finish_from_cache(self, entry, status):
+        self.answer = status
+
+    def _relay_not_modified(self, headers):
+        self.answer = 304
+
+
+def test_cached_get_refetches_entries_dropped_while_revalidating(
+    tmp_path,
+    monkeypatch,
+):
+    cache = ProxyCache(str(tmp_path), max_size=1024, max_entries=10)
+    url = "https://example.com/data.json"
+    stale = HTTPHeaders({"ETag": '"v1"', "Cache-Control": "no-cache"})
+    cache.put(cache.make_key("GET", url, {}), url, 200, stale, b"{}")
+    monkeypatch.setattr(cache, "refresh", lambda *_args: None)
+    handler = _CachedGetHandler(cache, (304, HTTPHeaders()), (200, HTTPHeaders()))
+
+    asyncio.run(handler._handle_cached_get(url, {}))
+    assert handler.requests == [{"If-None-Match": '"v1"'}, {}]
+    assert handler.answer is None
+    cache.close()
+
+
+def test_cached_get_relays_not_modified_without_an_entry(tmp_path):
+    cache = ProxyCache(str(tmp_path), max_size=1024, max_entries=10)
+    handler = _CachedGetHandler(cache, (304, HTTPHeaders({"ETag": '"v1"'})))
+
+    asyncio.run(
+        handler._handle_cached_get(
+            "https://example.com/data.json",
+            {"If-None-Match": '"v1"'},
+        ),
+    )
+    assert handler.answer == 304
+    cache.close()
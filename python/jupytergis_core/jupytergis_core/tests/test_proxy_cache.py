@@ -0,0 +1,152 @@
+import pytest
+from tornado.httputil import HTTPHeaders
+
+from jupytergis_core.proxy_cache import (
+    ProxyCache,
+    freshness_lifetime,
+    is_storable,
+)
+
+
+def _headers(**kwargs) -> HTTPHeaders:
+    headers = HTTPHeaders()
+    for name, value in kwargs.items():
+        headers[name.replace("_", "-")] = value
+    return headers
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ProxyCache(str(tmp_path / "cache"), max_size=100, max_entries=3)
+
+
+@pytest.mark.parametrize(
+    "headers,expected",
+    [
+        pytest.param(_headers(Cache_Control="max-age=60"), 60, id="max-age"),
+        pytest.param(
+            _headers(Cache_Control="max-age=60, s-maxage=120"),
+            120,
+            id="s-maxage",
+        ),
+        pytest.param(
+            _headers(
+                Date="Mon, 01 Jan 2024 00:00:00 GMT",
+                Expires="Mon, 01 Jan 2024 00:10:00 GMT",
+            ),
+            600,
+            id="expires",
+        ),
+        pytest.param(_headers(Expires="0"), 0, id="invalid-expires"),
+        pytest.param(
+            _headers(
+                Date="Mon, 11 Jan 2024 00:00:00 GMT",
+                Last_Modified="Mon, 01 Jan 2024 00:00:00 GMT",
+            ),
+            24 * 60 * 60,
+            id="heuristic",
+        ),
+        pytest.param(_headers(), 0, id="none"),
+    ],
+)
+def test_freshness_lifetime(headers, expected):
+    assert freshness_lifetime(headers, 0) == expected
+
+
+@pytest.mark.parametrize(
+    "status,headers,request_headers,expected",
+    [
+        pytest.param(200, _headers(ETag='"a"'), None, True, id="etag"),
+        pytest.param(200, _headers(), None, False, id="no-validator"),
+        pytest.param(404, _headers(ETag='"a"'), None, False, id="status"),
+        pytest.param(
+            200,
+            _headers(Cache_Control="no-store, max-age=60"),
+            None,
+            False,
+            id="no-store",
+        ),
+        pytest.param(
+            200,
+            _headers(Cache_Control="max-age=60"),
+            {"Authorization": "Bearer x"},
+            False,
+            id="authorized",
+        ),
+        pytest.param(
+            200,
+            _headers(Cache_Control="public, max-age=60"),
+            {"Authorization": "Bearer x"},
+            True,
+            id="authorized-public",
+        ),
+    ],
+)
+def test_is_storable(status, headers, request_headers, expected):
+    assert is_storable(status, headers, request_headers) is expected
+
+
+def test_key_depends_on_headers():
+    url = "https://example.com/tile.png"
+    assert ProxyCache.make_key("GET", url, {"A": "1"}) == ProxyCache.make_key(
+        "get",
+        url,
+        {"a": "1"},
+    )
+    assert ProxyCache.make_key("GET", url) != ProxyCache.make_key(
+        "GET",
+        url,
+        {"X-Api-Key": "k"},
+    )
+
+
+def test_put_and_get(cache):
+    headers = _headers(Cache_Control="max-age=60", Content_Type="image/png")
+    cache.put("k", "https://example.com", 200, headers, b"data")
+
+    entry = cache.get("k")
+    assert entry.is_fresh()
+    assert entry.read_body() == b"data"
+    assert entry.headers["Content-Type"] == "image/png"
+
+
+def test_lru_eviction_by_count(cache):
+    headers = _headers(Cache_Control="max-age=60")
+    for key in "abc":
+        cache.put(key, key, 200, headers, b"x")
+    cache.get("a")
+    cache.put("d", "d", 200, headers, b"x")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["entries"] == 3
+
+
+def test_lru_eviction_by_size(cache):
+    headers = _headers(Cache_Control="max-age=60")
+    cache.put("a", "a", 200, headers, b"x" * 60)
+    cache.put("b", "b", 200, headers, b"x" * 60)
+
+    assert cache.get("a") is None
+    assert cache.size == 60
+    assert cache.put("c", "c", 200, headers, b"x" * 101) is None
+
+
+def test_refresh_after_not_modified(cache):
+    cache.put("k", "k", 200, _headers(ETag='"v1"', Cache_Control="no-cache"), b"x")
+    entry = cache.get("k")
+    assert not entry.is_fresh()
+    assert entry.conditional_headers() == {"If-None-Match": '"v1"'}
+
+    entry = cache.refresh("k", _headers(Cache_Control="max-age=60"))
+    assert entry.is_fresh()
+    assert entry.headers["ETag"] == '"v1"'
+    assert cache.stats()["revalidations"] == 1
+
+
+def test_index_survives_restart(cache):
+    cache.put("k", "k", 200, _headers(Cache_Control="max-age=60"), b"data")
+
+    reloaded = ProxyCache(cache.directory, max_size=100, max_entries=3)
+    assert reloaded.get("k").read_body() == b"data"
+    assert reloaded.size == 4
@@ -0,0 +1,69 @@
+import gzip
+import zlib
+
+import pytest
+
+from jupytergis_core.proxy_encoding import accepted_encodings, negotiate
+
+BODY = b'{"type": "FeatureCollection", "features": []}' * 100
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, br;q=0.5, zstd;q=0") == {
+        "identity",
+        "gzip",
+        "br",
+    }
+    assert accepted_encodings("") == {"identity"}
+
+
+def test_pass_through_accepted_encoding():
+    negotiation = negotiate("gzip", "gzip, deflate")
+    assert negotiation.content_encoding == "gzip"
+    assert negotiation.transcoder is None
+
+
+def test_decode_for_client_without_encoding():
+    negotiation = negotiate("gzip", "identity")
+    assert negotiation.content_encoding is None
+    assert negotiation.transcoder.transcode(gzip.compress(BODY)) == BODY
+
+
+@pytest.mark.parametrize(
+    "wbits",
+    [zlib.MAX_WBITS, -zlib.MAX_WBITS],
+    ids=["zlib", "raw"],
+)
+@pytest.mark.parametrize("chunk_size", [1, 1024])
+def test_decode_deflate(wbits, chunk_size):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+    compressed = compressor.compress(BODY) + compressor.flush()
+    transcoder = negotiate("deflate", "identity").transcoder
+    chunks = [
+        compressed[i : i + chunk_size] for i in range(0, len(compressed), chunk_size)
+    ]
+    decoded = b"".join(transcoder.process(c) for c in chunks) + transcoder.flush()
+    assert decoded == BODY
+
+
+@pytest.mark.parametrize(
+    "content_type,length,expected",
+    [
+        pytest.param("application/geo+json", len(BODY), "gzip", id="compressed"),
+        pytest.param("application/geo+json", 10, None, id="too-small"),
+        pytest.param("image/png", len(BODY), None, id="binary"),
+    ],
+)
+def test_compress_text_payloads(content_type, length, expected):
+    negotiation = negotiate(None, "gzip", content_type, length, 1024)
+    assert negotiation.content_encoding == expected
+    if expected is not None:
+        assert gzip.decompress(negotiation.transcoder.transcode(BODY)) == BODY
+
+
+def test_streamed_transcoding_matches_whole_body():
+    transcoder = negotiate("gzip", "identity").transcoder
+    compressed = gzip.compress(BODY)
+    chunks = [compressed[i : i + 7] for i in range(0, len(compressed), 7)]
+    decoded = b"".join(transcoder.process(c) for c in chunks) + transcoder.flush()
+    assert decoded == BODY
@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+from tornado.httputil import HTTPHeaders
+
+from jupytergis_core.proxy_flight import SharedResponse, SingleFlight
+
+
+def test_followers_share_leader_response():
+    async def check():
+        flights = SingleFlight()
+        assert flights.join("k") is None
+        flights.lead("k")
+        followers = [flights.join("k") for _ in range(3)]
+
+        shared = SharedResponse(200, HTTPHeaders({"Content-Type": "image/png"}), b"x")
+        flights.land("k", shared)
+        assert await asyncio.gather(*followers) == [shared] * 3
+        assert flights.join("k") is None
+        assert flights.stats() == {"leaders": 1, "deduplicated": 3, "in_flight": 0}
+
+    asyncio.run(check())
+
+
+def test_followers_receive_leader_error():
+    async def check():
+        flights = SingleFlight()
+        flights.lead("k")
+        follower = flights.join("k")
+        flights.land("k", error=ValueError("upstream failed"))
+        with pytest.raises(ValueError, match="upstream failed"):
+            await follower
+
+    asyncio.run(check())
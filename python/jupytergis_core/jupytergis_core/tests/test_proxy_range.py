@@ -0,0 +1,86 @@
+import asyncio
+from io import BytesIO
+
+import pytest
+from tornado.httpclient import HTTPRequest, HTTPResponse
+from tornado.httputil import HTTPHeaders
+
+from jupytergis_core.proxy_range import (
+    RangeCoalescer,
+    RangeNotSatisfiableError,
+    parse_byte_range,
+    parse_content_range,
+)
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("bytes=0-99", (0, 99)),
+        ("bytes = 10 - 20", (10, 20)),
+        ("bytes=100-", None),
+        ("bytes=-500", None),
+        ("bytes=0-1,5-6", None),
+        ("bytes=9-1", None),
+        ("items=0-1", None),
+    ],
+)
+def test_parse_byte_range(value, expected):
+    assert parse_byte_range(value) == expected
+
+
+def test_parse_content_range():
+    assert parse_content_range("bytes 0-99/1024") == (0, 99, 1024)
+    assert parse_content_range("bytes 0-99/*") == (0, 99, None)
+    assert parse_content_range("bytes */1024") is None
+
+
+def _upstream(calls):
+    async def fetch_span(start, end):
+        calls.append((start, end))
+        last = min(end, len(DATA) - 1)
+        return HTTPResponse(
+            HTTPRequest("http://example.com"),
+            206,
+            headers=HTTPHeaders(
+                {"Content-Range": f"bytes {start}-{last}/{len(DATA)}"},
+            ),
+            buffer=BytesIO(DATA[start : last + 1]),
+        )
+
+    return fetch_span
+
+
+def test_coalesces_adjacent_ranges():
+    async def check():
+        calls = []
+        coalescer = RangeCoalescer(0.001, max_gap=16, max_span=1024)
+        fetch = _upstream(calls)
+        ranges = [(0, 99), (100, 199), (210, 219), (600, 609)]
+        results = await asyncio.gather(
+            *(coalescer.fetch("k", start, end, fetch) for start, end in ranges),
+        )
+        assert calls == [(0, 219), (600, 609)]
+        for (start, end), result in zip(ranges, results, strict=True):
+            assert result.body == DATA[start : end + 1]
+            assert result.content_range == f"bytes {start}-{end}/1024"
+        assert coalescer.stats()["coalesced"] == 2
+
+    asyncio.run(check())
+
+
+def test_range_beyond_end():
+    async def check():
+        coalescer = RangeCoalescer(0.001, max_gap=0, max_span=4096)
+        fetch = _upstream([])
+        tail, beyond = await asyncio.gather(
+            coalescer.fetch("k", 1000, 1099, fetch),
+            coalescer.fetch("k", 1100, 1199, fetch),
+            return_exceptions=True,
+        )
+        assert tail.content_range == "bytes 1000-1023/1024"
+        assert isinstance(beyond, RangeNotSatisfiableError)
+
+    asyncio.run(check())
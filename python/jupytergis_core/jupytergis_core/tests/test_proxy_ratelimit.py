@@ -0,0 +1,28 @@
+import pytest
+
+from jupytergis_core.proxy_ratelimit import TokenBucketLimiter
+
+
+def test_burst_then_sustained_rate():
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+    assert [limiter.acquire("k", now=0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("k", now=0) == pytest.approx(0.5)
+    assert limiter.acquire("k", now=0.5) == 0
+    assert limiter.acquire("k", now=0.5) > 0
+
+
+def test_buckets_are_independent():
+    limiter = TokenBucketLimiter(rate=1, burst=1)
+    assert limiter.acquire(("alice", "a.example.com"), now=0) == 0
+    assert limiter.acquire(("alice", "b.example.com"), now=0) == 0
+    assert limiter.acquire(("bob", "a.example.com"), now=0) == 0
+    assert limiter.acquire(("alice", "a.example.com"), now=0) > 0
+
+
+def test_idle_buckets_are_dropped():
+    limiter = TokenBucketLimiter(rate=1, burst=2)
+    limiter.acquire("a", now=0)
+    limiter.acquire("b", now=1)
+    assert len(limiter) == 2
+    limiter.acquire("c", now=2.5)
+    assert len(limiter) == 2
@@ -0,0 +1,107 @@
+import threading
+
+from pycrdt import Doc, Map
+
+from jupytergis_core.ydoc_store import YDocStore
+
+
+def make_doc():
+    doc = Doc()
+    doc["layers"] = Map()
+    return doc
+
+
+def restored(state):
+    doc = make_doc()
+    doc.apply_update(state)
+    return doc["layers"].to_py()
+
+
+def test_load_returns_the_state_saved_with_the_content(tmp_path):
+    store = YDocStore(str(tmp_path / "store.db"))
+    doc = make_doc()
+    doc["layers"]["a"] = 1
+    store.reset("map.jGIS", "hash-1", doc.get_update())
+    store.flush()
+    assert restored(store.load("map.jGIS", "hash-1")) == {"a": 1}
+    assert store.load("map.jGIS", "other") is None
+    assert store.load("other.jGIS", "hash-1") is None
+
+    updates = []
+    doc.observe(lambda event: updates.append(event.update))
+    doc["layers"]["b"] = 2
+    store.append("map.jGIS", updates[-1:])
+    store.saved("map.jGIS", "hash-2")
+    doc["layers"]["c"] = 3
+    store.append("map.jGIS", updates[-1:])
+    store.flush()
+
+    # Updates made after the save are not part of the saved state.
+    assert store.load("map.jGIS", "hash-1") is None
+    assert restored(store.load("map.jGIS", "hash-2")) == {"a": 1, "b": 2}
+    store.saved("other.jGIS", "hash-1")
+    assert store.load("other.jGIS", "hash-1") is None
+
+    # The store persists.
+    store.close()
+    store = YDocStore(str(tmp_path / "store.db"))
+    assert restored(store.load("map.jGIS", "hash-2")) == {"a": 1, "b": 2}
+    store.close()
+
+
+def test_compaction_keeps_unsaved_updates(tmp_path):
+    store = YDocStore(str(tmp_path / "store.db"), compact_every=3)
+    doc = make_doc()
+    store.reset("map.jGIS", "hash-0", doc.get_update())
+    updates = []
+    doc.observe(lambda event: updates.append(event.update))
+    for i in range(5):
+        doc["layers"][str(i)] = i
+        store.append("map.jGIS", updates[-1:])
+        if i in {1, 3}:
+            store.saved("map.jGIS", f"hash-{i}")
+
+    def logged():
+        store.flush()
+        return store._db.execute("SELECT COUNT(*) FROM updates").fetchone()[0]
+
+    # The third update folded the two saved ones into the snapshot.
+    assert logged() == 3
+    store.compact("map.jGIS")
+    assert logged() == 1
+    store.flush()
+    assert restored(store.load("map.jGIS", "hash-3")) == {str(i): i for i in range(4)}
+    store.close()
+
+
+def test_writes_happen_on_the_writer_thread(tmp_path, monkeypatch):
+    store = YDocStore(str(tmp_path / "store.db"))
+    threads = set()
+    append = store._append
+
+    def record(*args):
+        threads.add(threading.current_thread())
+        append(*args)
+
+    monkeypatch.setattr(store, "_append", record)
+    doc = make_doc()
+    store.reset("map.jGIS", "hash-0", doc.get_update())
+    store.append("map.jGIS", [doc.get_update()])
+    store.flush()
+    assert threads == {store._writer}
+    store.close()
+
+
+def test_load_does_not_wait_for_queued_writes(tmp_path):
+    store = YDocStore(str(tmp_path / "store.db"))
+    doc = make_doc()
+    doc["layers"]["a"] = 1
+    store.reset("map.jGIS", "hash-1", doc.get_update())
+    store.flush()
+    release = threading.Event()
+    store._submit(release.wait)
+    store.reset("map.jGIS", "hash-2", doc.get_update())
+    assert restored(store.load("map.jGIS", "hash-1")) == {"a": 1}
+    assert store.load("map.jGIS", "hash-2") is None
+    release.set()
+    store.close()
@@ -0,0 +1,270 @@
+"""Persisted CRDT state of JupyterGIS documents.
+
+Starting a room reads the file, migrates it and rebuilds the shared types of
+the document from its JSON, which takes long for large projects.
+``YDocStore`` keeps the CRDT state of every document in a local SQLite
+database, as a snapshot plus an append-only log of the updates made since.
+It also remembers which updates the file was last saved from, together with
+the hash of that content. If the file has not changed when its room starts
+again, the room loads that binary state instead of parsing the file.
+
+The store is enabled by setting ``JGIS_YDOC_STORE`` to the path of the
+database.
+"""
+
+import functools
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any
+
+from pycrdt import merge_updates
+
+logger = logging.getLogger(__name__)
+
+# Number of logged updates of a document that triggers a compaction.
+DEFAULT_COMPACT_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    content_hash TEXT,
+    saved_seq INTEGER NOT NULL,
+    snapshot BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS updates (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS updates_path ON updates (path, seq);
+"""
+
+
+class YDocStore:
+    """Snapshots and update logs of documents, keyed by file path.
+
+    The database is written by a writer thread, which runs the operations
+    in the order they are submitted, so that writes never block the server
+    event loop: they return at once. ``load`` reads through a read-only
+    connection of its own instead, so that opening a room does not wait for
+    the writes queued for any document.
+
+    Args:
+        path: The SQLite database (created if missing)
+        compact_every: Number of logged updates of a document after which
+            those already saved are folded into its snapshot
+
+    """
+
+    def __init__(self, path: str, compact_every: int = DEFAULT_COMPACT_EVERY) -> None:
+        self.path = path
+        self.compact_every = compact_every
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Opened here so that errors surface, then owned by the writer thread.
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._reader = sqlite3.connect(
+            f"{Path(path).resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+        self._read_lock = threading.Lock()
+        self._closed = False
+        # Updates logged per document since it was last compacted.
+        self._pending: dict[str, int] = {}
+        self._tasks: queue.SimpleQueue[tuple[Future, Callable[..., Any], tuple] | None]
+        self._tasks = queue.SimpleQueue()
+        self._writer = threading.Thread(
+            target=self._run,
+            name="jupytergis-ydoc-store",
+            daemon=True,
+        )
+        self._writer.start()
+
+    def _run(self) -> None:
+        while (task := self._tasks.get()) is not None:
+            future, func, args = task
+            try:
+                future.set_result(func(*args))
+            except Exception as e:  # noqa: BLE001 - the writer carries on
+                logger.warning("Document store operation failed: %s", e)
+                future.set_exception(e)
+
+    def _submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        future: Future = Future()
+        if self._closed:
+            # Shutting down: nothing is written any more.
+            future.set_result(None)
+        else:
+            self._tasks.put((future, func, args))
+        return future
+
+    def load(self, path: str, content_hash: str) -> bytes | None:
+        """Return the state a document was saved from with this content.
+
+        Returns None if the document was last saved with other content, or
+        never, or if its writes are still queued.
+        """
+        with self._read_lock:
+            if self._closed:
+                return None
+            try:
+                # One transaction, so that a compaction cannot run in between.
+                self._reader.execute("BEGIN")
+                try:
+                    return self._load(path, content_hash)
+                finally:
+                    self._reader.rollback()
+            except sqlite3.Error as e:
+                logger.warning("Could not read the document store: %s", e)
+                return None
+
+    def reset(self, path: str, content_hash: str, state: bytes) -> None:
+        """Replace what is stored of a document by its state for this content."""
+        self._submit(self._reset, path, content_hash, state)
+
+    def append(self, path: str, updates: list[bytes]) -> None:
+        """Log updates of a document."""
+        self._submit(self._append, path, updates)
+
+    def saved(self, path: str, content_hash: str) -> None:
+        """Record that the document was saved, with this content, as logged."""
+        self._submit(self._saved, path, content_hash)
+
+    def compact(self, path: str) -> None:
+        """Fold the saved updates of a document into its snapshot.
+
+        Updates made since the last save stay in the log, so that the
+        snapshot still matches the saved content.
+        """
+        self._submit(self._compact, path)
+
+    def flush(self) -> None:
+        """Wait until the operations submitted so far are done."""
+        self._submit(lambda: None).result()
+
+    def close(self) -> None:
+        """Finish the submitted operations and close the database."""
+        with self._read_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._reader.close()
+        self._tasks.put(None)
+        self._writer.join()
+        self._db.close()
+
+    def _load(self, path: str, content_hash: str) -> bytes | None:
+        row = self._reader.execute(
+            "SELECT content_hash, saved_seq, snapshot FROM documents WHERE path = ?",
+            (path,),
+        ).fetchone()
+        if row is None or row[0] != content_hash:
+            return None
+        updates = self._reader.execute(
+            "SELECT data FROM updates WHERE path = ? AND seq <= ? ORDER BY seq",
+            (path, row[1]),
+        ).fetchall()
+        if not updates:
+            return row[2]
+        return merge_updates(row[2], *(update for (update,) in updates))
+
+    def _reset(self, path: str, content_hash: str, state: bytes) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM updates WHERE path = ?", (path,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+                (path, content_hash, self._last_seq(), state),
+            )
+        self._pending[path] = 0
+
+    def _append(self, path: str, updates: list[bytes]) -> None:
+        with self._db:
+            known = self._db.execute(
+                "SELECT 1 FROM documents WHERE path = ?",
+                (path,),
+            ).fetchone()
+            if known is None:
+                return
+            self._db.executemany(
+                "INSERT INTO updates (path, data) VALUES (?, ?)",
+                [(path, update) for update in updates],
+            )
+        self._pending[path] = self._pending.get(path, 0) + len(updates)
+        if self._pending[path] >= self.compact_every:
+            self._compact(path)
+
+    def _saved(self, path: str, content_hash: str) -> None:
+        with self._db:
+            self._db.execute(
+                "UPDATE documents SET content_hash = ?, saved_seq = ? WHERE path = ?",
+                (content_hash, self._last_seq(), path),
+            )
+
+    def _compact(self, path: str) -> None:
+        with self._db:
+            row = self._db.execute(
+                "SELECT saved_seq, snapshot FROM documents WHERE path = ?",
+                (path,),
+            ).fetchone()
+            if row is None:
+                return
+            saved_seq, snapshot = row
+            updates = self._db.execute(
+                "SELECT data FROM updates WHERE path = ? AND seq <= ? ORDER BY seq",
+                (path, saved_seq),
+            ).fetchall()
+            if updates:
+                snapshot = merge_updates(snapshot, *(update for (update,) in updates))
+                self._db.execute(
+                    "UPDATE documents SET snapshot = ? WHERE path = ?",
+                    (snapshot, path),
+                )
+                self._db.execute(
+                    "DELETE FROM updates WHERE path = ? AND seq <= ?",
+                    (path, saved_seq),
+                )
+        self._pending[path] = 0
+
+    def _last_seq(self) -> int:
+        (seq,) = self._db.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM updates",
+        ).fetchone()
+        return seq
+
+
+@functools.cache
+def get_store() -> YDocStore | None:
+    """Return the store configured by the environment, or None if disabled."""
+    path = os.environ.get("JGIS_YDOC_STORE")
+    if not path:
+        return None
+    compact_every = int(
+        os.environ.get("JGIS_YDOC_STORE_COMPACT_EVERY", str(DEFAULT_COMPACT_EVERY)),
+    )
+    try:
+        return YDocStore(path, compact_every)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Could not open the document store %s: %s", path, e)
+        return None
+
+
+def close_store() -> None:
+    """Close the store configured by the environment, if it was opened.
+
+    Waits for the queued writes, which the writer thread would otherwise
+    drop when the server exits.
+    """
+    if get_store.cache_info().currsize:
+        store = get_store()
+        if store is not None:
+            store.close()
+        get_store.cache_clear()
@@ -94,6 +94,38 @@ export class JupyterGISModelFactory implements DocumentRegistry.IModelFactory<Ju
   private _disposed = false;
 }
 
+/**
+ * A Model factory for documents in the binary `.jgisz` format.
+ */
+export class JupyterGISZModelFactory extends JupyterGISModelFactory {
+  /**
+   * The name of the model.
+   *
+   * @returns The name
+   */
+  get name(): string {
+    return 'jupytergis-jgiszmodel';
+  }
+
+  /**
+   * The content type of the file.
+   *
+   * @returns The content type
+   */
+  get contentType(): Contents.ContentType {
+    return 'jgisz';
+  }
+
+  /**
+   * The format of the file.
+   *
+   * @returns the file format
+   */
+  get fileFormat(): Contents.FileFormat {
+    return 'base64';
+  }
+}
+
 export namespace JupyterGISModelFactory {
   export interface IOptions {
     annotationModel: IAnnotationModel;
@@ -3,6 +3,7 @@ import {
   CommandIDs,
   checkServerAvailability,
   isJupyterLite,
+  JupyterGISDocumentWidget,
   logoIcon,
   logoMiniIcon,
   resetServerAvailabilityCache,
@@ -47,10 +48,16 @@ import { ISettingRegistry } from '@jupyterlab/settingregistry';
 import { IStateDB } from '@jupyterlab/statedb';
 
 import { JupyterGISDocumentWidgetFactory } from '../factory';
-import { JupyterGISModelFactory } from './modelfactory';
+import {
+  JupyterGISModelFactory,
+  JupyterGISZModelFactory,
+} from './modelfactory';
 
 const FACTORY = 'JupyterGIS .jgis Viewer';
 const CONTENT_TYPE = 'jgis';
+const JGISZ_FACTORY = 'JupyterGIS .jgisz Viewer';
+const JGISZ_CONTENT_TYPE = 'jgisz';
+const JGISZ_MODEL_NAME = 'jupytergis-jgiszmodel';
 const PALETTE_CATEGORY = 'JupyterGIS';
 const MODEL_NAME = 'jupytergis-jgismodel';
 const SETTINGS_ID = '@jupytergis/jupytergis-core:jupytergis-settings';
@@ -164,11 +171,7 @@ const activate = async (
     console.warn(`Failed to load settings for ${SETTINGS_ID}`, error);
   }
 
-  const widgetFactory = new JupyterGISDocumentWidgetFactory({
-    name: FACTORY,
-    modelName: MODEL_NAME,
-    fileTypes: [CONTENT_TYPE],
-    defaultFor: [CONTENT_TYPE],
+  const widgetFactoryOptions = {
     tracker,
     commands: app.commands,
     externalCommandRegistry,
@@ -182,6 +185,13 @@ const activate = async (
     state: state,
     annotationModel: annotationModel,
     loggerRegistry: loggerRegistry ?? undefined,
+  };
+  const widgetFactory = new JupyterGISDocumentWidgetFactory({
+    name: FACTORY,
+    modelName: MODEL_NAME,
+    fileTypes: [CONTENT_TYPE],
+    defaultFor: [CONTENT_TYPE],
+    ...widgetFactoryOptions,
   });
 
   // Registering the widget factory
@@ -225,7 +235,10 @@ const activate = async (
     );
   }
 
-  widgetFactory.widgetCreated.connect((sender, widget) => {
+  const widgetCreatedCallback = (
+    sender: JupyterGISDocumentWidgetFactory,
+    widget: JupyterGISDocumentWidget,
+  ) => {
     widget.title.icon = logoIcon;
     widget.context.pathChanged.connect(() => {
       tracker.save(widget);
@@ -247,7 +260,37 @@ const activate = async (
       .catch(e => {
         console.error('Cannot update JupyterGIS commands', e);
       });
-  });
+  };
+  widgetFactory.widgetCreated.connect(widgetCreatedCallback);
+
+  // .jgisz archives are only converted to and from the shared model by the
+  // server, so they cannot be opened without the collaborative drive.
+  if (collaborativeContentProvider) {
+    collaborativeContentProvider.sharedModelFactory.registerDocumentFactory(
+      JGISZ_CONTENT_TYPE,
+      jGISSharedModelFactory,
+    );
+    const jgiszWidgetFactory = new JupyterGISDocumentWidgetFactory({
+      name: JGISZ_FACTORY,
+      modelName: JGISZ_MODEL_NAME,
+      fileTypes: [JGISZ_CONTENT_TYPE],
+      defaultFor: [JGISZ_CONTENT_TYPE],
+      ...widgetFactoryOptions,
+    });
+    jgiszWidgetFactory.widgetCreated.connect(widgetCreatedCallback);
+    app.docRegistry.addWidgetFactory(jgiszWidgetFactory);
+    app.docRegistry.addModelFactory(
+      new JupyterGISZModelFactory({ annotationModel, settingRegistry }),
+    );
+    app.docRegistry.addFileType({
+      name: JGISZ_CONTENT_TYPE,
+      displayName: 'JGISZ',
+      mimeTypes: ['application/zip'],
+      extensions: ['.jgisz', '.JGISZ'],
+      fileFormat: 'base64',
+      icon: logoMiniIcon,
+    });
+  }
 
   app.commands.addCommand(CommandIDs.createNew, {
     label: args => (args['label'] as string) ?? 'GIS Project',
@@ -15,6 +15,7 @@ from uuid import uuid4
 import requests
 from IPython import get_ipython
 from IPython.display import display
+from jupytergis_core.blobs import write_blob
 from jupytergis_core.schema import (
     IGeoJSONSource,
     IGeoPackageRasterSource,
@@ -446,6 +447,7 @@ class GISDocument(CommWidget):
         opacity: float = 1,
         symbology: SymbologyInput | None = None,
         zoom_to: bool = False,
+        store_as_blob: bool = False,
     ):
         """Add a GeoJSON Layer to the document.
 
@@ -455,6 +457,9 @@ class GISDocument(CommWidget):
         :param opacity: The opacity, between 0 and 1.
         :param symbology: The symbology configuration to persist with the layer.
         :param zoom_to: When True, zoom the map to the layer once it is added.
+        :param store_as_blob: When True, store the data in a compressed file beside
+            the document instead of embedding it; the document only keeps a
+            reference with the feature count and bounding box of the data.
         """
         self._assert_is_ready()
 
@@ -484,6 +489,14 @@ class GISDocument(CommWidget):
         if data is not None:
             parameters["data"] = data
 
+        if store_as_blob and "data" in parameters:
+            if self._path is None:
+                raise ValueError("Cannot store GeoJSON data of an untitled document")
+            parameters["blob"] = write_blob(
+                Path(self._path).parent,
+                parameters.pop("data"),
+            )
+
         # Extract name from path if not provided
         if name is None and path is not None:
             name = _extract_layer_name(path)
@@ -311,6 +311,24 @@ class TestQgisUnsupportedFeatures(TestDocument):
         assert self.doc.layers[layer_id]
 
 
+class TestGeoJSONBlob(TestDocument):
+    def test_store_as_blob(self, tmp_path):
+        self.doc._is_ready = True
+        self.doc._path = str(tmp_path / "map.jGIS")
+        self.doc.add_geojson_layer(data=SAMPLE_GEOJSON, store_as_blob=True)
+        (source,) = self.doc._sources.to_py().values()
+        blob = source["parameters"]["blob"]
+        assert "data" not in source["parameters"]
+        assert blob["featureCount"] == 3
+        assert blob["bbox"] == [0, 0, 2, 2]
+        assert (tmp_path / blob["path"]).is_file()
+
+    def test_store_as_blob_requires_a_saved_document(self):
+        self.doc._is_ready = True
+        with pytest.raises(ValueError, match="untitled"):
+            self.doc.add_geojson_layer(data=SAMPLE_GEOJSON, store_as_blob=True)
+
+
 class TestLayerManipulation(TestDocument):
     def test_add_and_remove_layer_and_source(self):
         self.doc._is_ready = True